@@ -1,7 +1,7 @@
-import sqlite3
+from database import get_db_connection
 from werkzeug.security import generate_password_hash
 
-conn = sqlite3.connect('timetable.db')
+conn = get_db_connection(row_factory=None)
 cursor = conn.cursor()
 
 cursor.execute('''
@@ -1,5 +1,8 @@
 
-import sqlite3
+from database import get_db_connection
+from staff_preferences import SOURCE_SELECTION, department_preferences
+from timetable_store import save_timetable
+from timetable_model import DAY_INDEX, PERIOD_INDEX
 import json
 import random
 from typing import Dict, List, Tuple
@@ -19,64 +22,64 @@ class TimetableGenerator:
     def generate_timetable(self, department_id: int) -> Dict:
         """Generate optimized timetable for a department"""
         try:
-            conn = sqlite3.connect('timetable.db')
-            cursor = conn.cursor()
-            
-            # Get department data
-            cursor.execute('SELECT name FROM departments WHERE id = ?', (department_id,))
-            dept_data = cursor.fetchone()
-            if not dept_data:
-                return {'error': 'Department not found'}
-            
-            # Get staff and their subjects
-            cursor.execute('''
-                SELECT u.id, u.name, u.staff_role, u.subjects_selected
-                FROM users u
-                WHERE u.department_id = ? AND u.role = 'staff' AND u.subjects_locked = 1
-            ''', (department_id,))
-            staff_data = cursor.fetchall()
-            
-            # Get subjects
-            cursor.execute('SELECT id, name, code FROM subjects WHERE department_id = ?', 
-                          (department_id,))
-            subjects_data = cursor.fetchall()
-            
-            # Get classrooms
-            cursor.execute('SELECT id, name, capacity FROM classrooms WHERE department_id = ?', 
-                          (department_id,))
-            classrooms_data = cursor.fetchall()
-            
-            conn.close()
-            
-            if not staff_data or not subjects_data or not classrooms_data:
-                return {'error': 'Insufficient data for timetable generation'}
-            
-            # Process data
-            staff_subjects = {}
-            for staff in staff_data:
-                if staff[3]:  # subjects_selected
-                    subject_ids = [int(s) for s in staff[3].split(',')]
-                    staff_subjects[staff[0]] = {
-                        'name': staff[1],
-                        'role': staff[2],
-                        'subjects': subject_ids
-                    }
-            
-            subjects_dict = {s[0]: {'name': s[1], 'code': s[2]} for s in subjects_data}
-            classrooms_dict = {c[0]: {'name': c[1], 'capacity': c[2]} for c in classrooms_data}
-            
-            # Generate timetable using AI optimization
-            timetable = self._optimize_timetable(staff_subjects, subjects_dict, classrooms_dict)
-            
-            # Save timetable to database
-            self._save_timetable(department_id, timetable)
-            
-            return {
-                'success': True,
-                'timetable': timetable,
-                'department': dept_data[0],
-                'generated_at': datetime.now().isoformat()
-            }
+            with get_db_connection(row_factory=None) as conn:
+                cursor = conn.cursor()
+                
+                # Get department data
+                cursor.execute('SELECT name FROM departments WHERE id = ?', (department_id,))
+                dept_data = cursor.fetchone()
+                if not dept_data:
+                    return {'error': 'Department not found'}
+                
+                # Get staff and their subjects
+                cursor.execute('''
+                    SELECT u.id, u.name, u.staff_role
+                    FROM users u
+                    WHERE u.department_id = ? AND u.role = 'staff' AND u.subjects_locked = 1
+                ''', (department_id,))
+                staff_data = cursor.fetchall()
+                preferences = department_preferences(cursor, department_id, SOURCE_SELECTION)
+                
+                # Get subjects
+                cursor.execute('SELECT id, name, code FROM subjects WHERE department_id = ?', 
+                              (department_id,))
+                subjects_data = cursor.fetchall()
+                
+                # Get classrooms
+                cursor.execute('SELECT id, name, capacity FROM classrooms WHERE department_id = ?', 
+                              (department_id,))
+                classrooms_data = cursor.fetchall()
+                
+                conn.close()
+                
+                if not staff_data or not subjects_data or not classrooms_data:
+                    return {'error': 'Insufficient data for timetable generation'}
+                
+                # Process data
+                staff_subjects = {}
+                for staff in staff_data:
+                    if staff[0] in preferences:
+                        staff_subjects[staff[0]] = {
+                            'name': staff[1],
+                            'role': staff[2],
+                            'subjects': preferences[staff[0]]
+                        }
+                
+                subjects_dict = {s[0]: {'name': s[1], 'code': s[2]} for s in subjects_data}
+                classrooms_dict = {c[0]: {'name': c[1], 'capacity': c[2]} for c in classrooms_data}
+                
+                # Generate timetable using AI optimization
+                timetable = self._optimize_timetable(staff_subjects, subjects_dict, classrooms_dict)
+                
+                # Save timetable to database
+                self._save_timetable(department_id, timetable)
+                
+                return {
+                    'success': True,
+                    'timetable': timetable,
+                    'department': dept_data[0],
+                    'generated_at': datetime.now().isoformat()
+                }
             
         except Exception as e:
             return {'error': str(e)}
@@ -147,32 +150,11 @@ class TimetableGenerator:
             if not assigned:
                 print(f"Could not assign: {assignment['subject_name']} to {assignment['staff_name']}")
         
-        return sorted(timetable, key=lambda x: (self.days.index(x['day']), self.time_slots.index(x['time_slot'])))
+        return sorted(timetable, key=lambda x: (DAY_INDEX[x['day']], PERIOD_INDEX[x['time_slot']]))
     
-    def _save_timetable(self, department_id: int, timetable: List):
-        """Save generated timetable to database"""
-        conn = sqlite3.connect('timetable.db')
-        cursor = conn.cursor()
-        
-        # Clear existing timetable for department
-        cursor.execute('DELETE FROM timetables WHERE department_id = ?', (department_id,))
-        
-        # Insert new timetable
-        for entry in timetable:
-            cursor.execute('''
-                INSERT INTO timetables (department_id, day, time_slot, subject_id, staff_id, classroom_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                department_id,
-                entry['day'],
-                entry['time_slot'],
-                entry['subject_id'],
-                entry['staff_id'],
-                entry['classroom_id']
-            ))
-        
-        conn.commit()
-        conn.close()
+    def _save_timetable(self, department_id: int, timetable: List) -> Dict:
+        """Save generated timetable to database, touching only changed rows"""
+        return save_timetable(department_id, timetable)
     
     def export_to_excel(self, department_id: int, file_path: str):
         """Export timetable to Excel format"""
@@ -180,7 +162,7 @@ class TimetableGenerator:
             import openpyxl
             from openpyxl.styles import Font, Alignment, PatternFill
             
-            conn = sqlite3.connect('timetable.db')
+            conn = get_db_connection(row_factory=None)
             cursor = conn.cursor()
             
             # Get timetable data
@@ -192,7 +174,7 @@ class TimetableGenerator:
                 JOIN users u ON t.staff_id = u.id
                 JOIN classrooms c ON t.classroom_id = c.id
                 WHERE t.department_id = ?
-                ORDER BY t.day, t.time_slot
+                ORDER BY t.day_idx, t.period_idx
             ''', (department_id,))
             
             timetable_data = cursor.fetchall()
@@ -1,36 +1,34 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import sqlite3
+from database import get_db_connection
+from auth_claims import current_user, role_required
+from principals import principal_cache
+from queries import CLASSROOMS_BY_DEPARTMENT, DEPARTMENT_TIMETABLE, STAFF_BY_DEPARTMENT, SUBJECTS_BY_DEPARTMENT
 from ai_timetable import TimetableGenerator
+from timetable_generator import AITimetableGenerator
+from pareto import MAX_TIME_BUDGET, MIN_TIME_BUDGET, OBJECTIVES, generate_pareto_front
+from what_if import WhatIfError, model_cache, simulate
+from timetable_store import save_timetable
+from staff_preferences import SOURCE_SELECTION, replace_preferences
 import os
 
 api = Blueprint('api', __name__)
 
 # Staff management routes
 @api.route('/api/staff', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_staff():
     try:
-        current_user_id = get_jwt_identity()
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department
-        cursor.execute('SELECT department_id, role FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        department_id = user_data[0]
+        department_id = user_data['department_id']
         
         # Get staff in the same department
-        cursor.execute('''
-            SELECT u.id, u.name, u.email, u.staff_role, u.subjects_selected, u.subjects_locked
-            FROM users u
-            WHERE u.department_id = ? AND u.role = 'staff'
-            ORDER BY u.name
-        ''', (department_id,))
+        cursor.execute(STAFF_BY_DEPARTMENT, (department_id,))
         
         staff_data = cursor.fetchall()
         conn.close()
@@ -52,29 +50,19 @@ def get_staff():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/subjects', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_subjects():
     try:
-        current_user_id = get_jwt_identity()
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        department_id = user_data[0]
+        department_id = user_data['department_id']
         
         # Get subjects for the department
-        cursor.execute('''
-            SELECT id, name, code, credits
-            FROM subjects
-            WHERE department_id = ?
-            ORDER BY name
-        ''', (department_id,))
+        cursor.execute(SUBJECTS_BY_DEPARTMENT, (department_id,))
         
         subjects_data = cursor.fetchall()
         conn.close()
@@ -94,26 +82,21 @@ def get_subjects():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/subjects', methods=['POST'])
-@jwt_required()
+@role_required()
 def create_subject():
     try:
         data = request.get_json()
-        current_user_id = get_jwt_identity()
         
         if not data.get('name') or not data.get('code'):
             return jsonify({'error': 'Name and code are required'}), 400
         
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        department_id = user_data[0]
+        department_id = user_data['department_id']
         
         cursor.execute('''
             INSERT INTO subjects (name, code, department_id, credits)
@@ -123,6 +106,7 @@ def create_subject():
         subject_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        model_cache.invalidate(department_id=department_id)
         
         return jsonify({
             'id': str(subject_id),
@@ -144,37 +128,39 @@ def select_subjects():
         if not data.get('subject_ids'):
             return jsonify({'error': 'Subject IDs are required'}), 400
         
-        conn = sqlite3.connect('timetable.db')
-        cursor = conn.cursor()
-        
-        # Get current user data
-        cursor.execute('SELECT staff_role, subjects_locked FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        if user_data[1]:  # subjects_locked
-            return jsonify({'error': 'Subjects are already locked'}), 400
-        
-        staff_role = user_data[0]
-        max_subjects = 2 if staff_role == 'assistant_professor' else 1
-        
-        if len(data['subject_ids']) > max_subjects:
-            return jsonify({'error': f'Maximum {max_subjects} subjects allowed for {staff_role}'}), 400
-        
-        # Update user's subjects
-        subjects_str = ','.join(map(str, data['subject_ids']))
-        cursor.execute('''
-            UPDATE users 
-            SET subjects_selected = ?, subjects_locked = 1
-            WHERE id = ?
-        ''', (subjects_str, current_user_id))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'message': 'Subjects selected and locked successfully'}), 200
+        with get_db_connection(row_factory=None) as conn:
+            cursor = conn.cursor()
+            
+            # Get current user data
+            cursor.execute('SELECT staff_role, subjects_locked FROM users WHERE id = ?', (current_user_id,))
+            user_data = cursor.fetchone()
+            
+            if not user_data:
+                return jsonify({'error': 'User not found'}), 404
+            
+            if user_data[1]:  # subjects_locked
+                return jsonify({'error': 'Subjects are already locked'}), 400
+            
+            staff_role = user_data[0]
+            max_subjects = 2 if staff_role == 'assistant_professor' else 1
+            
+            if len(data['subject_ids']) > max_subjects:
+                return jsonify({'error': f'Maximum {max_subjects} subjects allowed for {staff_role}'}), 400
+            
+            # Update user's subjects
+            subjects_str = ','.join(map(str, data['subject_ids']))
+            cursor.execute('''
+                UPDATE users 
+                SET subjects_selected = ?, subjects_locked = 1
+                WHERE id = ?
+            ''', (subjects_str, current_user_id))
+            replace_preferences(cursor, current_user_id, SOURCE_SELECTION, data['subject_ids'])
+            
+            conn.commit()
+            conn.close()
+            principal_cache.invalidate(int(current_user_id))
+            
+            return jsonify({'message': 'Subjects selected and locked successfully'}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -200,6 +186,82 @@ def generate_timetable():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/timetable/pareto', methods=['POST'])
+@role_required('dept_admin', 'main_admin')
+def generate_pareto_timetables():
+    """Generate a small Pareto front of timetables without saving any of them"""
+    try:
+        data = request.get_json()
+        
+        user_data = current_user()
+        department_id = data.get('department_id') if user_data['role'] == 'main_admin' else user_data['department_id']
+        
+        if not department_id:
+            return jsonify({'error': 'Department ID is required'}), 400
+        
+        try:
+            time_budget = float(data.get('time_budget', 10))
+            workers = min(max(int(data.get('workers', os.cpu_count() or 1)), 1), os.cpu_count() or 1)
+            seed = data.get('seed')
+            seed = None if seed is None else int(seed)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'time_budget, workers and seed must be numbers'}), 400
+        
+        if not time_budget > 0:
+            return jsonify({'error': 'time_budget must be a positive number of seconds'}), 400
+        time_budget = min(max(time_budget, MIN_TIME_BUDGET), MAX_TIME_BUDGET)
+        
+        generator = AITimetableGenerator()
+        department_data = generator.load_department_data(int(department_id))
+        
+        if 'error' in department_data:
+            return jsonify(department_data), 400
+        
+        front = generate_pareto_front(department_data, time_budget=time_budget,
+                                      workers=workers, seed=seed)
+        
+        return jsonify({
+            'success': True,
+            'department': department_data['department'],
+            'objectives': list(OBJECTIVES),
+            'front': front
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/timetable/what-if', methods=['POST'])
+@role_required('dept_admin', 'main_admin')
+def what_if_timetable():
+    """Simulate hypothetical staff, room and subject-hour edits without saving anything"""
+    try:
+        data = request.get_json()
+        
+        user_data = current_user()
+        department_id = data.get('department_id') if user_data['role'] == 'main_admin' else user_data['department_id']
+        
+        if not department_id:
+            return jsonify({'error': 'Department ID is required'}), 400
+        
+        try:
+            department_id = int(department_id)
+            time_budget = min(max(float(data.get('time_budget', 5)), 0.0), 30.0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'department_id and time_budget must be numbers'}), 400
+        
+        result = simulate(
+            None, department_id, data.get('edits', []),
+            mode=data.get('mode', 'generate'),
+            time_budget=time_budget
+        )
+        
+        return jsonify({'success': True, **result}), 200
+        
+    except WhatIfError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api.route('/api/timetable/export', methods=['POST'])
 @jwt_required()
 def export_timetable():
@@ -227,28 +289,18 @@ def export_timetable():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/classrooms', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_classrooms():
     try:
-        current_user_id = get_jwt_identity()
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
+        department_id = user_data['department_id']
         
-        department_id = user_data[0]
-        
-        cursor.execute('''
-            SELECT id, name, capacity
-            FROM classrooms
-            WHERE department_id = ?
-            ORDER BY name
-        ''', (department_id,))
+        cursor.execute(CLASSROOMS_BY_DEPARTMENT, (department_id,))
         
         classrooms_data = cursor.fetchall()
         conn.close()
@@ -267,26 +319,21 @@ def get_classrooms():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/classrooms', methods=['POST'])
-@jwt_required()
+@role_required()
 def create_classroom():
     try:
         data = request.get_json()
-        current_user_id = get_jwt_identity()
         
         if not data.get('name') or not data.get('capacity'):
             return jsonify({'error': 'Name and capacity are required'}), 400
         
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        department_id = user_data[0]
+        department_id = user_data['department_id']
         
         cursor.execute('''
             INSERT INTO classrooms (name, capacity, department_id)
@@ -296,6 +343,7 @@ def create_classroom():
         classroom_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        model_cache.invalidate(department_id=department_id)
         
         return jsonify({
             'id': str(classroom_id),
@@ -310,7 +358,7 @@ def create_classroom():
 @jwt_required()
 def get_departments():
     try:
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         cursor.execute('SELECT id, name, code FROM departments ORDER BY name')
@@ -327,103 +375,75 @@ def get_departments():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/departments', methods=['POST'])
-@jwt_required()
+@role_required('main_admin')
 def create_department():
     try:
-        current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        # Verify main admin
-        conn = sqlite3.connect('timetable.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role[0] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        if not data.get('name') or not data.get('code'):
-            return jsonify({'error': 'Name and code are required'}), 400
-        
-        cursor.execute('INSERT INTO departments (name, code) VALUES (?, ?)', 
-                      (data['name'], data['code']))
-        dept_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'id': str(dept_id),
-            'name': data['name'],
-            'code': data['code']
-        }), 201
+        with get_db_connection(row_factory=None) as conn:
+            cursor = conn.cursor()
+            
+            if not data.get('name') or not data.get('code'):
+                return jsonify({'error': 'Name and code are required'}), 400
+            
+            cursor.execute('INSERT INTO departments (name, code) VALUES (?, ?)', 
+                          (data['name'], data['code']))
+            dept_id = cursor.lastrowid
+            conn.commit()
+            
+            return jsonify({
+                'id': str(dept_id),
+                'name': data['name'],
+                'code': data['code']
+            }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/timetables', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_timetables():
     try:
-        current_user_id = get_jwt_identity()
         department_id = request.args.get('department_id')
         
-        conn = sqlite3.connect('timetable.db')
-        cursor = conn.cursor()
-        
-        if department_id:
-            cursor.execute('''
-                SELECT t.id, t.day, t.time_slot, s.name as subject_name, s.code as subject_code,
-                       u.name as staff_name, c.name as classroom_name, t.subject_id, t.staff_id, t.classroom_id
-                FROM timetables t
-                JOIN subjects s ON t.subject_id = s.id
-                JOIN users u ON t.staff_id = u.id
-                JOIN classrooms c ON t.classroom_id = c.id
-                WHERE t.department_id = ?
-                ORDER BY t.day, t.time_slot
-            ''', (department_id,))
-        else:
-            # Get user's department
-            cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-            user_data = cursor.fetchone()
-            if not user_data or not user_data[0]:
-                return jsonify([]), 200
+        with get_db_connection(row_factory=None) as conn:
+            cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT t.id, t.day, t.time_slot, s.name as subject_name, s.code as subject_code,
-                       u.name as staff_name, c.name as classroom_name, t.subject_id, t.staff_id, t.classroom_id
-                FROM timetables t
-                JOIN subjects s ON t.subject_id = s.id
-                JOIN users u ON t.staff_id = u.id
-                JOIN classrooms c ON t.classroom_id = c.id
-                WHERE t.department_id = ?
-                ORDER BY t.day, t.time_slot
-            ''', (user_data[0],))
-        
-        timetables_data = cursor.fetchall()
-        conn.close()
-        
-        timetables_list = []
-        for timetable in timetables_data:
-            timetables_list.append({
-                'id': str(timetable[0]),
-                'day': timetable[1],
-                'time_slot': timetable[2],
-                'subjects': {
-                    'id': str(timetable[7]),
-                    'name': timetable[3],
-                    'code': timetable[4]
-                },
-                'profiles': {
-                    'id': str(timetable[8]),
-                    'name': timetable[5]
-                },
-                'classrooms': {
-                    'id': str(timetable[9]),
-                    'name': timetable[6]
-                }
-            })
-        
-        return jsonify(timetables_list), 200
+            if department_id:
+                cursor.execute(DEPARTMENT_TIMETABLE, (department_id,))
+            else:
+                # Get user's department
+                user_data = current_user()
+                if not user_data['department_id']:
+                    return jsonify([]), 200
+                
+                cursor.execute(DEPARTMENT_TIMETABLE, (user_data['department_id'],))
+            
+            timetables_data = cursor.fetchall()
+            conn.close()
+            
+            timetables_list = []
+            for timetable in timetables_data:
+                timetables_list.append({
+                    'id': str(timetable[0]),
+                    'day': timetable[1],
+                    'time_slot': timetable[2],
+                    'subjects': {
+                        'id': str(timetable[7]),
+                        'name': timetable[3],
+                        'code': timetable[4]
+                    },
+                    'profiles': {
+                        'id': str(timetable[8]),
+                        'name': timetable[5]
+                    },
+                    'classrooms': {
+                        'id': str(timetable[9]),
+                        'name': timetable[6]
+                    }
+                })
+            
+            return jsonify(timetables_list), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -439,50 +459,24 @@ def save_timetables():
         if not department_id:
             return jsonify({'error': 'Department ID is required'}), 400
         
-        conn = sqlite3.connect('timetable.db')
-        cursor = conn.cursor()
-        
-        # Delete existing timetable for this department
-        cursor.execute('DELETE FROM timetables WHERE department_id = ?', (department_id,))
-        
-        # Insert new timetable entries
-        for entry in timetable_entries:
-            cursor.execute('''
-                INSERT INTO timetables (department_id, day, time_slot, subject_id, staff_id, classroom_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                department_id,
-                entry['day'],
-                entry['time_slot'],
-                entry['subject_id'],
-                entry['staff_id'],
-                entry['classroom_id']
-            ))
-        
-        conn.commit()
-        conn.close()
+        changes = save_timetable(department_id, timetable_entries)
         
-        return jsonify({'message': 'Timetable saved successfully'}), 200
+        return jsonify({'message': 'Timetable saved successfully', 'changes': changes}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/constraints', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_constraints():
     try:
-        current_user_id = get_jwt_identity()
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department and role
-        cursor.execute('SELECT department_id, role FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        department_id, user_role = user_data
+        department_id, user_role = user_data['department_id'], user_data['role']
         
         if user_role == 'main_admin':
             # Main admin can see all constraints
@@ -534,7 +528,7 @@ def get_constraints():
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/constraints', methods=['POST'])
-@jwt_required()
+@role_required()
 def create_constraint():
     try:
         data = request.get_json()
@@ -543,17 +537,13 @@ def create_constraint():
         if not data.get('role') or not data.get('subject_type'):
             return jsonify({'error': 'Role and subject type are required'}), 400
         
-        conn = sqlite3.connect('timetable.db')
+        conn = get_db_connection(row_factory=None)
         cursor = conn.cursor()
         
         # Get current user's department and role
-        cursor.execute('SELECT department_id, role FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
+        user_data = current_user()
         
-        user_department_id, user_role = user_data
+        user_department_id, user_role = user_data['department_id'], user_data['role']
         
         # Determine department_id for the constraint
         if user_role == 'main_admin':
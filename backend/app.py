@@ -1,10 +1,7 @@
-import sqlite3
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt, get_jwt_identity
 import secrets
-import string
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
@@ -12,230 +9,47 @@ import logging
 import json
 from datetime import datetime
 import requests
+from database import get_db_connection, init_app as init_database
+from auth_claims import create_user_token, current_user, role_required
+from migrations import upgrade as upgrade_schema, warn_if_pending
+from pagination import PaginationError, fetch_page
+from password_auth import VerifierBusy, hash_password, verifier
+from principals import principal_cache
+from queries import PENDING_STAFF, UNEXPORTED_CREDENTIALS
+from revocation import revoked_tokens
+from refresh_tokens import (RefreshTokenError, issue as issue_refresh_token, revoke as revoke_refresh_token,
+                            rotate as rotate_refresh_token)
+from credentials import (ASYNC_THRESHOLD as CREDENTIALS_ASYNC_THRESHOLD, JOB_CREDENTIALS, JOB_STAFF_IMPORT,
+                         active_job, generate as generate_user_credentials, get_job, pending_users,
+                         start_background_job, start_job)
+from staff_import import (ASYNC_THRESHOLD as IMPORT_ASYNC_THRESHOLD, ImportFormatError, generate_password,
+                          generate_username, import_staff, iter_rows)
+from what_if import model_cache
 
 load_dotenv()
 
 app = Flask(__name__)
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', secrets.token_urlsafe(32))
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+# Short-lived; clients renew through POST /api/auth/refresh instead of logging in again
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('ACCESS_TOKEN_EXPIRES_MINUTES', '15')))
 
 jwt = JWTManager(app)
+
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    return revoked_tokens.is_revoked(jwt_payload['jti'])
+
+init_database(app)
 CORS(app, origins=["http://localhost:5173", "http://localhost:3000", "http://localhost:8080"])
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database initialization
-def init_db():
-    conn = sqlite3.connect('timetable.db')
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            username TEXT UNIQUE NOT NULL,
-            employee_id TEXT UNIQUE NOT NULL,
-            role TEXT NOT NULL CHECK (role IN ('main_admin', 'dept_admin', 'staff')),
-            department_id INTEGER,
-            college TEXT,
-            programme TEXT,
-            type TEXT,
-            contact_number TEXT,
-            staff_role TEXT CHECK (staff_role IN ('assistant_professor', 'associate_professor', 'professor', 'hod')),
-            subjects_selected TEXT,
-            subjects_locked BOOLEAN DEFAULT FALSE,
-            is_active BOOLEAN DEFAULT TRUE,
-            approval_status TEXT DEFAULT 'pending' CHECK (approval_status IN ('pending', 'approved', 'rejected')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id)
-        )
-    ''')
-    
-    # Departments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS departments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            code TEXT UNIQUE NOT NULL,
-            college TEXT NOT NULL,
-            programme TEXT NOT NULL CHECK (programme IN ('UG', 'PG')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Subjects table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subjects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            code TEXT NOT NULL,
-            department_id INTEGER NOT NULL,
-            credits INTEGER DEFAULT 3,
-            hours INTEGER DEFAULT 3,
-            type TEXT DEFAULT 'Core' CHECK (type IN ('Core', 'Elective', 'Skill', 'CDC')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id)
-        )
-    ''')
-    
-    # Classes table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS classes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            section TEXT NOT NULL,
-            year INTEGER NOT NULL,
-            department_id INTEGER NOT NULL,
-            strength INTEGER DEFAULT 60,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id)
-        )
-    ''')
-    
-    # Classrooms table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS classrooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            capacity INTEGER NOT NULL,
-            department_id INTEGER NOT NULL,
-            type TEXT DEFAULT 'Classroom' CHECK (type IN ('Classroom', 'Lab')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id)
-        )
-    ''')
-    
-    # Choice forms table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS choice_forms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            department_id INTEGER NOT NULL,
-            subjects_data TEXT, -- JSON array of subjects with options
-            open_date TIMESTAMP NOT NULL,
-            close_date TIMESTAMP NOT NULL,
-            status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'open', 'closed')),
-            created_by INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (created_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Choice submissions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS choice_submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            form_id INTEGER NOT NULL,
-            staff_id INTEGER NOT NULL,
-            subject_preferences TEXT, -- JSON array of selected subjects
-            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (form_id) REFERENCES choice_forms (id),
-            FOREIGN KEY (staff_id) REFERENCES users (id),
-            UNIQUE(form_id, staff_id)
-        )
-    ''')
-    
-    # Timetables table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS timetables (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            department_id INTEGER NOT NULL,
-            class_id INTEGER NOT NULL,
-            day TEXT NOT NULL,
-            time_slot TEXT NOT NULL,
-            subject_id INTEGER NOT NULL,
-            staff_id INTEGER NOT NULL,
-            classroom_id INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (class_id) REFERENCES classes (id),
-            FOREIGN KEY (subject_id) REFERENCES subjects (id),
-            FOREIGN KEY (staff_id) REFERENCES users (id),
-            FOREIGN KEY (classroom_id) REFERENCES classrooms (id)
-        )
-    ''')
-    
-    # Notifications table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            message TEXT NOT NULL,
-            sender_id INTEGER NOT NULL,
-            recipient_type TEXT NOT NULL CHECK (recipient_type IN ('staff', 'dept_admin', 'main_admin', 'all')),
-            department_id INTEGER,
-            is_read BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (sender_id) REFERENCES users (id),
-            FOREIGN KEY (department_id) REFERENCES departments (id)
-        )
-    ''')
-    
-    # Queries table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS queries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            sender_id INTEGER NOT NULL,
-            recipient_id INTEGER,
-            priority TEXT DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
-            status TEXT DEFAULT 'open' CHECK (status IN ('open', 'in_progress', 'resolved')),
-            response TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            resolved_at TIMESTAMP,
-            FOREIGN KEY (sender_id) REFERENCES users (id),
-            FOREIGN KEY (recipient_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Credentials export table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS credentials_export (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            username TEXT NOT NULL,
-            plain_password TEXT NOT NULL,
-            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            exported BOOLEAN DEFAULT FALSE,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Insert default main admin if not exists
-    cursor.execute('SELECT id FROM users WHERE email = ?', ('srmtt@srmist.edu.in',))
-    if not cursor.fetchone():
-        password_hash = generate_password_hash('mcs2024')
-        cursor.execute('''
-            INSERT INTO users (name, email, password_hash, username, employee_id, role, approval_status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', ('Main Administrator', 'srmtt@srmist.edu.in', password_hash, 'mainadmin', 'ADMIN001', 'main_admin', 'approved'))
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database
-init_db()
+# Schema changes are applied by `python -m migrations`, not at import time
+warn_if_pending()
 
 # Helper functions
-def get_db_connection():
-    conn = sqlite3.connect('timetable.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def generate_username(email):
-    return email.split('@')[0].lower()
-
-def generate_password():
-    return ''.join(secrets.choice(string.ascii_letters + string.digits + "!@#$%^&*") for _ in range(10))
-
 def query_groq_ai(query):
     """Query GROQ AI for responses"""
     try:
@@ -293,7 +107,7 @@ def login():
         cursor.execute('''
             SELECT u.id, u.name, u.email, u.password_hash, u.role, u.department_id, 
                    u.staff_role, u.subjects_selected, u.subjects_locked, u.username,
-                   u.employee_id, u.approval_status, d.name as department_name
+                   u.employee_id, u.approval_status, u.token_version, d.name as department_name
             FROM users u
             LEFT JOIN departments d ON u.department_id = d.id
             WHERE u.email = ? AND u.is_active = 1
@@ -302,9 +116,20 @@ def login():
         user_data = cursor.fetchone()
         conn.close()
         
-        if not user_data or not check_password_hash(user_data['password_hash'], password):
+        if not user_data:
+            return jsonify({'error': 'Invalid email or password'}), 401
+        
+        # Verified on the password pool so a login burst cannot occupy every request thread
+        try:
+            password_valid = verifier.verify(user_data['password_hash'], password)
+        except VerifierBusy:
+            return jsonify({'error': 'Too many logins in progress, please try again'}), 503, {'Retry-After': '1'}
+        
+        if not password_valid:
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        verifier.rehash_if_needed(user_data['id'], user_data['password_hash'], password)
+        
         if user_data['approval_status'] != 'approved':
             return jsonify({'error': 'Your account is pending approval'}), 401
         
@@ -322,7 +147,9 @@ def login():
             'department_name': user_data['department_name']
         }
         
-        access_token = create_access_token(identity=str(user_data['id']))
+        # Role and department ride in the token so routes need no user lookup
+        access_token = create_user_token(user_data)
+        refresh_token = issue_refresh_token(user_data['id'])
         
         logger.info(f"User {email} logged in successfully with role {user['role']}")
         
@@ -330,7 +157,8 @@ def login():
             'success': True,
             'data': {
                 'user': user,
-                'token': access_token
+                'token': access_token,
+                'refresh_token': refresh_token
             }
         }), 200
         
@@ -338,42 +166,41 @@ def login():
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
 
-@app.route('/api/auth/verify', methods=['GET'])
-@jwt_required()
-def verify_token():
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh_session():
     try:
-        current_user_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        data = request.get_json(silent=True) or {}
+        refresh_token = data.get('refresh_token')
         
-        cursor.execute('''
-            SELECT u.id, u.name, u.email, u.role, u.department_id, 
-                   u.staff_role, u.subjects_selected, u.subjects_locked, u.username,
-                   u.employee_id, d.name as department_name
-            FROM users u
-            LEFT JOIN departments d ON u.department_id = d.id
-            WHERE u.id = ? AND u.is_active = 1 AND u.approval_status = 'approved'
-        ''', (current_user_id,))
+        if not refresh_token:
+            return jsonify({'error': 'refresh_token is required'}), 400
         
-        user_data = cursor.fetchone()
-        conn.close()
+        # A hash lookup, not a password check; the user's current role and status go in the new token
+        try:
+            user_data, new_refresh_token = rotate_refresh_token(refresh_token)
+        except RefreshTokenError as e:
+            return jsonify({'error': str(e)}), 401
         
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
+        return jsonify({
+            'success': True,
+            'data': {
+                'token': create_user_token(user_data),
+                'refresh_token': new_refresh_token
+            }
+        }), 200
         
-        user = {
-            'id': str(user_data['id']),
-            'name': user_data['name'],
-            'email': user_data['email'],
-            'role': user_data['role'],
-            'department_id': str(user_data['department_id']) if user_data['department_id'] else None,
-            'staff_role': user_data['staff_role'],
-            'subjects_selected': user_data['subjects_selected'].split(',') if user_data['subjects_selected'] else [],
-            'subjects_locked': bool(user_data['subjects_locked']),
-            'username': user_data['username'],
-            'employee_id': user_data['employee_id'],
-            'department_name': user_data['department_name']
-        }
+    except Exception as e:
+        logger.error(f"Token refresh error: {str(e)}")
+        return jsonify({'error': 'Token refresh failed'}), 500
+
+@app.route('/api/auth/verify', methods=['GET'])
+@role_required()
+def verify_token():
+    try:
+        user = principal_cache.get(current_user()['id'])
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
         return jsonify({'success': True, 'data': {'user': user}}), 200
         
@@ -381,10 +208,24 @@ def verify_token():
         logger.error(f"Token verification error: {str(e)}")
         return jsonify({'error': 'Token verification failed'}), 401
 
+@app.route('/api/auth/metrics', methods=['GET'])
+@role_required('main_admin')
+def get_auth_metrics():
+    return jsonify({'success': True, 'data': dict(verifier.stats(), principal_cache=principal_cache.stats())}), 200
+
 @app.route('/api/auth/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    return jsonify({'success': True, 'message': 'Logged out successfully'}), 200
+    try:
+        revoked_tokens.revoke(get_jwt())
+        refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+        if refresh_token:
+            revoke_refresh_token(refresh_token)
+        return jsonify({'success': True, 'message': 'Logged out successfully'}), 200
+        
+    except Exception as e:
+        logger.error(f"Logout error: {str(e)}")
+        return jsonify({'error': 'Logout failed'}), 500
 
 # Department Management
 @app.route('/api/departments', methods=['GET'])
@@ -414,72 +255,64 @@ def get_departments():
         return jsonify({'error': 'Failed to fetch departments'}), 500
 
 @app.route('/api/departments', methods=['POST'])
-@jwt_required()
+@role_required('main_admin')
 def create_department():
     try:
-        current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        # Verify main admin
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        required_fields = ['name', 'code', 'college', 'programme']
-        if not all(data.get(field) for field in required_fields):
-            return jsonify({'error': 'All fields are required'}), 400
-        
-        # Create department admin credentials
-        dept_admin_email = f"{data['code'].lower()}.admin@srmist.edu.in"
-        username = generate_username(dept_admin_email)
-        password = generate_password()
-        password_hash = generate_password_hash(password)
-        
-        # Insert department
-        cursor.execute('''
-            INSERT INTO departments (name, code, college, programme) 
-            VALUES (?, ?, ?, ?)
-        ''', (data['name'], data['code'], data['college'], data['programme']))
-        dept_id = cursor.lastrowid
-        
-        # Create department admin user
-        cursor.execute('''
-            INSERT INTO users (name, email, password_hash, username, employee_id, role, 
-                             department_id, approval_status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (f"{data['name']} Admin", dept_admin_email, password_hash, username, 
-              f"ADMIN{dept_id:03d}", 'dept_admin', dept_id, 'approved'))
-        
-        admin_user_id = cursor.lastrowid
-        
-        # Store credentials for export
-        cursor.execute('''
-            INSERT INTO credentials_export (user_id, username, plain_password)
-            VALUES (?, ?, ?)
-        ''', (admin_user_id, username, password))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'id': str(dept_id),
-                'name': data['name'],
-                'code': data['code'],
-                'college': data['college'],
-                'programme': data['programme'],
-                'admin_credentials': {
-                    'email': dept_admin_email,
-                    'username': username,
-                    'password': password
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            required_fields = ['name', 'code', 'college', 'programme']
+            if not all(data.get(field) for field in required_fields):
+                return jsonify({'error': 'All fields are required'}), 400
+            
+            # Create department admin credentials
+            dept_admin_email = f"{data['code'].lower()}.admin@srmist.edu.in"
+            username = generate_username(dept_admin_email)
+            password = generate_password()
+            password_hash = hash_password(password)
+            
+            # Insert department
+            cursor.execute('''
+                INSERT INTO departments (name, code, college, programme) 
+                VALUES (?, ?, ?, ?)
+            ''', (data['name'], data['code'], data['college'], data['programme']))
+            dept_id = cursor.lastrowid
+            
+            # Create department admin user
+            cursor.execute('''
+                INSERT INTO users (name, email, password_hash, username, employee_id, role, 
+                                 department_id, approval_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (f"{data['name']} Admin", dept_admin_email, password_hash, username, 
+                  f"ADMIN{dept_id:03d}", 'dept_admin', dept_id, 'approved'))
+            
+            admin_user_id = cursor.lastrowid
+            
+            # Store credentials for export
+            cursor.execute('''
+                INSERT INTO credentials_export (user_id, username, plain_password)
+                VALUES (?, ?, ?)
+            ''', (admin_user_id, username, password))
+            
+            conn.commit()
+            
+            return jsonify({
+                'success': True,
+                'data': {
+                    'id': str(dept_id),
+                    'name': data['name'],
+                    'code': data['code'],
+                    'college': data['college'],
+                    'programme': data['programme'],
+                    'admin_credentials': {
+                        'email': dept_admin_email,
+                        'username': username,
+                        'password': password
+                    }
                 }
-            }
-        }), 201
+            }), 201
         
     except Exception as e:
         logger.error(f"Create department error: {str(e)}")
@@ -487,99 +320,154 @@ def create_department():
 
 # Staff Management
 @app.route('/api/staff/register', methods=['POST'])
-@jwt_required()
+@role_required('dept_admin')
 def register_staff():
     try:
         current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verify department admin
-        cursor.execute('SELECT role, department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data or user_data['role'] != 'dept_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        required_fields = ['name', 'employee_id', 'email', 'staff_role', 'contact_number']
-        if not all(data.get(field) for field in required_fields):
-            return jsonify({'error': 'All fields are required'}), 400
-        
-        # Generate credentials
-        username = generate_username(data['email'])
-        password = generate_password()
-        password_hash = generate_password_hash(password)
-        
-        # Create staff user (pending approval)
-        cursor.execute('''
-            INSERT INTO users (name, email, password_hash, username, employee_id, role,
-                             department_id, staff_role, contact_number, approval_status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (data['name'], data['email'], password_hash, username, data['employee_id'],
-              'staff', user_data['department_id'], data['staff_role'], 
-              data['contact_number'], 'pending'))
-        
-        staff_user_id = cursor.lastrowid
-        
-        # Store credentials for later export
-        cursor.execute('''
-            INSERT INTO credentials_export (user_id, username, plain_password)
-            VALUES (?, ?, ?)
-        ''', (staff_user_id, username, password))
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            user_data = current_user()
+            
+            required_fields = ['name', 'employee_id', 'email', 'staff_role', 'contact_number']
+            if not all(data.get(field) for field in required_fields):
+                return jsonify({'error': 'All fields are required'}), 400
+            
+            # Generate credentials
+            username = generate_username(data['email'])
+            password = generate_password()
+            password_hash = hash_password(password)
+            
+            # Create staff user (pending approval)
+            cursor.execute('''
+                INSERT INTO users (name, email, password_hash, username, employee_id, role,
+                                 department_id, staff_role, contact_number, approval_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (data['name'], data['email'], password_hash, username, data['employee_id'],
+                  'staff', user_data['department_id'], data['staff_role'], 
+                  data['contact_number'], 'pending'))
+            
+            staff_user_id = cursor.lastrowid
+            
+            # Store credentials for later export
+            cursor.execute('''
+                INSERT INTO credentials_export (user_id, username, plain_password)
+                VALUES (?, ?, ?)
+            ''', (staff_user_id, username, password))
+            
+            # Send notification to main admin
+            cursor.execute('''
+                INSERT INTO notifications (title, message, sender_id, recipient_type)
+                VALUES (?, ?, ?, ?)
+            ''', ('New Staff Registration Request', 
+                  f'New staff registration request from {data["name"]} ({data["email"]})',
+                  current_user_id, 'main_admin'))
+            
+            conn.commit()
+            
+            return jsonify({
+                'success': True,
+                'message': 'Staff registration request submitted for approval',
+                'data': {
+                    'id': str(staff_user_id),
+                    'name': data['name'],
+                    'email': data['email'],
+                    'status': 'pending'
+                }
+            }), 201
         
-        # Send notification to main admin
-        cursor.execute('''
-            INSERT INTO notifications (title, message, sender_id, recipient_type)
-            VALUES (?, ?, ?, ?)
-        ''', ('New Staff Registration Request', 
-              f'New staff registration request from {data["name"]} ({data["email"]})',
-              current_user_id, 'main_admin'))
+    except Exception as e:
+        logger.error(f"Staff registration error: {str(e)}")
+        return jsonify({'error': 'Failed to register staff'}), 500
+
+@app.route('/api/staff/import', methods=['POST'])
+@role_required('dept_admin', 'main_admin')
+def import_staff_file():
+    """Register every staff member in an uploaded .xlsx or .csv file
+
+    Department admins import into their own department; the main admin
+    passes department_id as a form field. Files over IMPORT_ASYNC_THRESHOLD
+    rows are imported in the background and a job handle is returned.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            user_data = current_user()
+            
+            upload = request.files.get('file')
+            if not upload or not upload.filename:
+                return jsonify({'error': 'file is required'}), 400
+            
+            department_id = user_data['department_id']
+            if user_data['role'] == 'main_admin':
+                department_id = request.form.get('department_id', type=int)
+                cursor.execute('SELECT id FROM departments WHERE id = ?', (department_id,))
+                if not cursor.fetchone():
+                    return jsonify({'error': 'Valid department_id is required'}), 400
+            
+            # Parse on the request so a malformed file is a 400, not a failed job
+            try:
+                rows = list(iter_rows(upload.stream, upload.filename))
+            except ImportFormatError as e:
+                conn.close()
+                return jsonify({'error': str(e)}), 400
+            
+            if len(rows) > IMPORT_ASYNC_THRESHOLD:
+                job = start_background_job(
+                    conn, JOB_STAFF_IMPORT, len(rows), current_user_id,
+                    lambda job_conn: _import_job(job_conn, rows, department_id, current_user_id))
+                return jsonify({
+                    'success': True,
+                    'message': f'Importing {len(rows)} staff in the background',
+                    'job': job
+                }), 202
+            
+            # Small files: hash in this thread rather than starting a process pool
+            result = import_staff(conn, iter(rows), department_id, sender_id=current_user_id, workers=1)
+            
+            return jsonify({'success': True, 'data': result}), 201 if result['imported'] else 200
+
+    except Exception as e:
+        logger.error(f"Staff import error: {str(e)}")
+        return jsonify({'error': 'Failed to import staff'}), 500
+
+def _import_job(conn, rows, department_id, sender_id):
+    result = import_staff(conn, iter(rows), department_id, sender_id=sender_id)
+    return result['imported'], result
+
+@app.route('/api/staff/import/jobs/<job_id>', methods=['GET'])
+@role_required('dept_admin', 'main_admin')
+def get_staff_import_job(job_id):
+    try:
+        conn = get_db_connection()
         
-        conn.commit()
+        job = get_job(conn, job_id)
         conn.close()
         
-        return jsonify({
-            'success': True,
-            'message': 'Staff registration request submitted for approval',
-            'data': {
-                'id': str(staff_user_id),
-                'name': data['name'],
-                'email': data['email'],
-                'status': 'pending'
-            }
-        }), 201
+        # Department admins only see their own imports
+        user_data = current_user()
+        if (not job or job['kind'] != JOB_STAFF_IMPORT
+                or (user_data['role'] != 'main_admin' and str(job['created_by']) != str(user_data['id']))):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({'success': True, 'job': job}), 200
         
     except Exception as e:
-        logger.error(f"Staff registration error: {str(e)}")
-        return jsonify({'error': 'Failed to register staff'}), 500
+        logger.error(f"Get staff import job error: {str(e)}")
+        return jsonify({'error': 'Failed to get job'}), 500
 
 @app.route('/api/staff/pending', methods=['GET'])
-@jwt_required()
+@role_required('main_admin')
 def get_pending_staff():
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Verify main admin
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        cursor.execute('''
-            SELECT u.id, u.name, u.email, u.employee_id, u.staff_role, u.contact_number,
-                   u.created_at, d.name as department_name
-            FROM users u
-            LEFT JOIN departments d ON u.department_id = d.id
-            WHERE u.role = 'staff' AND u.approval_status = 'pending'
-            ORDER BY u.created_at DESC
-        ''')
-        
-        pending_staff = cursor.fetchall()
+        pending_staff, pagination = fetch_page(cursor, PENDING_STAFF, (), request.args)
         conn.close()
         
         return jsonify({
@@ -593,110 +481,189 @@ def get_pending_staff():
                 'contact_number': staff['contact_number'],
                 'department_name': staff['department_name'],
                 'created_at': staff['created_at']
-            } for staff in pending_staff]
+            } for staff in pending_staff],
+            'pagination': pagination
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Get pending staff error: {str(e)}")
         return jsonify({'error': 'Failed to fetch pending staff'}), 500
 
 @app.route('/api/staff/approve/<int:staff_id>', methods=['POST'])
-@jwt_required()
+@role_required('main_admin')
 def approve_staff(staff_id):
     try:
         current_user_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verify main admin
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Approve staff
+            cursor.execute('''
+                UPDATE users SET approval_status = 'approved' WHERE id = ? AND role = 'staff'
+            ''', (staff_id,))
+            
+            if cursor.rowcount == 0:
+                return jsonify({'error': 'Staff not found'}), 404
+            
+            # Get staff details for notification
+            cursor.execute('SELECT name, email, department_id FROM users WHERE id = ?', (staff_id,))
+            staff_data = cursor.fetchone()
+            
+            # Send notification to department admin
+            cursor.execute('''
+                INSERT INTO notifications (title, message, sender_id, recipient_type, department_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ('Staff Approved', 
+                  f'Staff member {staff_data["name"]} has been approved and can now login',
+                  current_user_id, 'dept_admin', staff_data['department_id']))
+            
+            conn.commit()
+            conn.close()
+            principal_cache.invalidate(staff_id)
+            model_cache.invalidate(department_id=staff_data['department_id'])
+            
+            return jsonify({
+                'success': True,
+                'message': 'Staff approved successfully'
+            }), 200
         
-        # Approve staff
-        cursor.execute('''
-            UPDATE users SET approval_status = 'approved' WHERE id = ? AND role = 'staff'
-        ''', (staff_id,))
-        
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Staff not found'}), 404
+    except Exception as e:
+        logger.error(f"Approve staff error: {str(e)}")
+        return jsonify({'error': 'Failed to approve staff'}), 500
+
+# SQLite's default limit on bound parameters is 999
+APPROVE_CHUNK_SIZE = 500
+
+# Columns a bulk approval filter may match on
+APPROVE_FILTER_COLUMNS = ('department_id', 'staff_role')
+
+@app.route('/api/staff/approve/bulk', methods=['POST'])
+@role_required('main_admin')
+def approve_staff_bulk():
+    """Approve many staff members in one transaction
+
+    Body: {"staff_ids": [...]} or {"filter": {"department_id": ..., "staff_role": ...}};
+    a filter selects pending staff. Each department admin gets one notification.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'staff_ids or filter is required'}), 400
+        
+        staff_ids = data.get('staff_ids')
+        staff_filter = data.get('filter')
+        if staff_ids is None and staff_filter is None:
+            return jsonify({'error': 'staff_ids or filter is required'}), 400
+        
+        if staff_ids is not None:
+            try:
+                staff_ids = list(dict.fromkeys(int(staff_id) for staff_id in staff_ids))
+            except (TypeError, ValueError):
+                staff_ids = None
+            if not isinstance(data['staff_ids'], list) or staff_ids is None:
+                return jsonify({'error': 'staff_ids must be a list of integers'}), 400
+        elif not isinstance(staff_filter, dict) or not set(staff_filter) <= set(APPROVE_FILTER_COLUMNS) or \
+                not all(value is None or isinstance(value, (int, str)) for value in staff_filter.values()):
+            return jsonify({'error': f"filter must be an object with keys from: {', '.join(APPROVE_FILTER_COLUMNS)}"}), 400
         
-        # Get staff details for notification
-        cursor.execute('SELECT name, email, department_id FROM users WHERE id = ?', (staff_id,))
-        staff_data = cursor.fetchone()
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-        # Send notification to department admin
-        cursor.execute('''
+        # Take the write lock first so statuses cannot change between read and update
+        conn.execute('BEGIN IMMEDIATE')
+        
+        if staff_ids is not None:
+            found = {}
+            for start in range(0, len(staff_ids), APPROVE_CHUNK_SIZE):
+                chunk = staff_ids[start:start + APPROVE_CHUNK_SIZE]
+                cursor.execute(f'''
+                    SELECT id, name, department_id, approval_status FROM users
+                    WHERE role = 'staff' AND id IN ({','.join('?' * len(chunk))})
+                ''', chunk)
+                found.update((row['id'], row) for row in cursor.fetchall())
+        else:
+            conditions = ["role = 'staff'", "approval_status = 'pending'"]
+            params = []
+            for column in APPROVE_FILTER_COLUMNS:
+                if staff_filter.get(column) is not None:
+                    conditions.append(f'{column} = ?')
+                    params.append(staff_filter[column])
+            cursor.execute(f'''
+                SELECT id, name, department_id, approval_status FROM users
+                WHERE {' AND '.join(conditions)}
+            ''', params)
+            found = {row['id']: row for row in cursor.fetchall()}
+            staff_ids = list(found)
+        
+        results = []
+        approved = []
+        for staff_id in staff_ids:
+            staff = found.get(staff_id)
+            if staff is None:
+                status = 'not_found'
+            elif staff['approval_status'] == 'approved':
+                status = 'already_approved'
+            else:
+                status = 'approved'
+                approved.append(staff)
+            results.append({'id': str(staff_id), 'status': status})
+        
+        cursor.executemany("UPDATE users SET approval_status = 'approved' WHERE id = ?",
+                           [(staff['id'],) for staff in approved])
+        
+        # One notification per department instead of one per staff member
+        by_department = {}
+        for staff in approved:
+            by_department.setdefault(staff['department_id'], []).append(staff['name'])
+        cursor.executemany('''
             INSERT INTO notifications (title, message, sender_id, recipient_type, department_id)
             VALUES (?, ?, ?, ?, ?)
-        ''', ('Staff Approved', 
-              f'Staff member {staff_data["name"]} has been approved and can now login',
-              current_user_id, 'dept_admin', staff_data['department_id']))
+        ''', [('Staff Approved',
+               f'{len(names)} staff member(s) have been approved and can now login: {", ".join(names)}',
+               current_user_id, 'dept_admin', department_id)
+              for department_id, names in by_department.items()])
         
         conn.commit()
         conn.close()
+        principal_cache.invalidate_many(staff['id'] for staff in approved)
+        for department_id in by_department:
+            model_cache.invalidate(department_id=department_id)
         
         return jsonify({
             'success': True,
-            'message': 'Staff approved successfully'
+            'approved': len(approved),
+            'results': results
         }), 200
         
     except Exception as e:
-        logger.error(f"Approve staff error: {str(e)}")
+        logger.error(f"Bulk approve staff error: {str(e)}")
         return jsonify({'error': 'Failed to approve staff'}), 500
 
 # Credentials Management
 @app.route('/api/credentials/generate', methods=['POST'])
-@jwt_required()
+@role_required('main_admin')
 def generate_credentials():
     try:
         current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Verify main admin
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
+        # One query for the whole pending set; hashing is the slow part
+        users = pending_users(cursor)
         
-        # Get users without exported credentials
-        cursor.execute('''
-            SELECT u.id, u.name, u.email, u.role 
-            FROM users u 
-            LEFT JOIN credentials_export ce ON u.id = ce.user_id 
-            WHERE u.role IN ('staff', 'dept_admin') 
-            AND u.approval_status = 'approved'
-            AND (ce.user_id IS NULL OR ce.exported = FALSE)
-        ''')
-        
-        users_without_credentials = cursor.fetchall()
-        
-        generated_count = 0
-        for user in users_without_credentials:
-            # Check if credentials already exist
-            cursor.execute('SELECT id FROM credentials_export WHERE user_id = ?', (user['id'],))
-            if not cursor.fetchone():
-                username = generate_username(user['email'])
-                password = generate_password()
-                password_hash = generate_password_hash(password)
-                
-                # Update user password
-                cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', 
-                             (password_hash, user['id']))
-                
-                # Store credentials
-                cursor.execute('''
-                    INSERT INTO credentials_export (user_id, username, plain_password)
-                    VALUES (?, ?, ?)
-                ''', (user['id'], username, password))
-                
-                generated_count += 1
+        if len(users) > CREDENTIALS_ASYNC_THRESHOLD:
+            job = active_job(conn) or start_job(conn, users, current_user_id)
+            conn.close()
+            return jsonify({
+                'success': True,
+                'message': f'Generating credentials for {job["total"]} users in the background',
+                'job': job
+            }), 202
         
-        conn.commit()
+        generated_count = generate_user_credentials(conn, users)
         conn.close()
         
         return jsonify({
@@ -709,55 +676,56 @@ def generate_credentials():
         logger.error(f"Generate credentials error: {str(e)}")
         return jsonify({'error': 'Failed to generate credentials'}), 500
 
-@app.route('/api/credentials/export', methods=['GET'])
-@jwt_required()
-def export_credentials():
+@app.route('/api/credentials/jobs/<job_id>', methods=['GET'])
+@role_required('main_admin')
+def get_credentials_job(job_id):
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verify main admin
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
         
-        # Get credentials data
-        cursor.execute('''
-            SELECT ce.username, ce.plain_password, u.name, u.email, u.role, 
-                   d.name as department_name, ce.generated_at
-            FROM credentials_export ce
-            JOIN users u ON ce.user_id = u.id
-            LEFT JOIN departments d ON u.department_id = d.id
-            WHERE ce.exported = FALSE
-            ORDER BY ce.generated_at DESC
-        ''')
+        job = get_job(conn, job_id)
+        conn.close()
         
-        credentials_data = cursor.fetchall()
+        if not job or job['kind'] != JOB_CREDENTIALS:
+            return jsonify({'error': 'Job not found'}), 404
         
-        if not credentials_data:
-            return jsonify({'error': 'No new credentials to export'}), 404
+        return jsonify({'success': True, 'job': job}), 200
         
-        # Mark as exported
-        cursor.execute('UPDATE credentials_export SET exported = TRUE WHERE exported = FALSE')
-        conn.commit()
-        conn.close()
-        
-        # Return credentials data for frontend to handle Excel export
-        return jsonify({
-            'success': True,
-            'data': [{
-                'name': cred['name'],
-                'email': cred['email'],
-                'role': cred['role'],
-                'department_name': cred['department_name'],
-                'username': cred['username'],
-                'password': cred['plain_password'],
-                'generated_at': cred['generated_at']
-            } for cred in credentials_data]
-        }), 200
+    except Exception as e:
+        logger.error(f"Get credentials job error: {str(e)}")
+        return jsonify({'error': 'Failed to get job'}), 500
+
+@app.route('/api/credentials/export', methods=['GET'])
+@role_required('main_admin')
+def export_credentials():
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get credentials data
+            cursor.execute(UNEXPORTED_CREDENTIALS)
+            
+            credentials_data = cursor.fetchall()
+            
+            if not credentials_data:
+                return jsonify({'error': 'No new credentials to export'}), 404
+            
+            # Mark as exported
+            cursor.execute('UPDATE credentials_export SET exported = TRUE WHERE exported = FALSE')
+            conn.commit()
+            
+            # Return credentials data for frontend to handle Excel export
+            return jsonify({
+                'success': True,
+                'data': [{
+                    'name': cred['name'],
+                    'email': cred['email'],
+                    'role': cred['role'],
+                    'department_name': cred['department_name'],
+                    'username': cred['username'],
+                    'password': cred['plain_password'],
+                    'generated_at': cred['generated_at']
+                } for cred in credentials_data]
+            }), 200
         
     except Exception as e:
         logger.error(f"Export credentials error: {str(e)}")
@@ -765,4 +733,6 @@ def export_credentials():
 
 # Continue with more routes...
 if __name__ == '__main__':
+    # Development server: bring the local database up to date first
+    upgrade_schema()
     app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
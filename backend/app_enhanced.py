@@ -3,7 +3,7 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
+from database import get_db_connection, init_app as init_database
 import secrets
 import string
 from datetime import timedelta
@@ -19,6 +19,7 @@ app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', secrets.token_urlsafe
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 
 jwt = JWTManager(app)
+init_database(app)
 CORS(app, origins=["http://localhost:5173", "http://localhost:3000", "http://localhost:8080"])
 
 # Configure logging
@@ -27,7 +28,7 @@ logger = logging.getLogger(__name__)
 
 # Database initialization with enhanced schema
 def init_enhanced_db():
-    conn = sqlite3.connect('timetable_enhanced.db')
+    conn = get_db_connection('timetable_enhanced.db', row_factory=None)
     cursor = conn.cursor()
     
     # Users table with additional fields
@@ -91,7 +92,7 @@ def login():
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
         
-        conn = sqlite3.connect('timetable_enhanced.db')
+        conn = get_db_connection('timetable_enhanced.db', row_factory=None)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -144,7 +145,7 @@ def login():
 def verify_token():
     try:
         current_user_id = get_jwt_identity()
-        conn = sqlite3.connect('timetable_enhanced.db')
+        conn = get_db_connection('timetable_enhanced.db', row_factory=None)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -196,77 +197,77 @@ def update_user(user_id):
         data = request.get_json()
         
         # Check if user exists and user has permission to update
-        conn = sqlite3.connect('timetable_enhanced.db')
-        cursor = conn.cursor()
-        
-        # Verify current user has admin role or is updating their own profile
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        current_user_role = cursor.fetchone()
-        
-        if not current_user_role or (current_user_role[0] != 'main_admin' and str(current_user_id) != user_id):
-            return jsonify({'error': 'Permission denied'}), 403
-        
-        # Build update query dynamically based on provided fields
-        update_fields = []
-        update_values = []
-        
-        allowed_fields = ['name', 'email', 'role', 'department_id', 'staff_role', 'subjects_selected', 'subjects_locked']
-        
-        for field in allowed_fields:
-            if field in data:
-                if field == 'subjects_selected' and isinstance(data[field], list):
-                    update_fields.append(f"{field} = ?")
-                    update_values.append(','.join(data[field]))
-                else:
-                    update_fields.append(f"{field} = ?")
-                    update_values.append(data[field])
-        
-        if not update_fields:
-            return jsonify({'error': 'No valid fields to update'}), 400
-        
-        update_values.append(user_id)
-        
-        cursor.execute(f'''
-            UPDATE users 
-            SET {', '.join(update_fields)}
-            WHERE id = ? AND is_active = 1
-        ''', update_values)
-        
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'User not found or no changes made'}), 404
-        
-        # Get updated user data
-        cursor.execute('''
-            SELECT u.id, u.name, u.email, u.role, u.department_id, 
-                   u.staff_role, u.subjects_selected, u.subjects_locked, u.username,
-                   u.employee_id, d.name as department_name
-            FROM users u
-            LEFT JOIN departments d ON u.department_id = d.id
-            WHERE u.id = ?
-        ''', (user_id,))
-        
-        user_data = cursor.fetchone()
-        conn.commit()
-        conn.close()
-        
-        if user_data:
-            user = {
-                'id': str(user_data[0]),
-                'name': user_data[1],
-                'email': user_data[2],
-                'role': user_data[3],
-                'department_id': str(user_data[4]) if user_data[4] else None,
-                'staff_role': user_data[5],
-                'subjects_selected': user_data[6].split(',') if user_data[6] else [],
-                'subjects_locked': bool(user_data[7]),
-                'username': user_data[8],
-                'employee_id': user_data[9],
-                'department_name': user_data[10]
-            }
+        with get_db_connection('timetable_enhanced.db', row_factory=None) as conn:
+            cursor = conn.cursor()
             
-            return jsonify({'success': True, 'data': user}), 200
-        
-        return jsonify({'error': 'Failed to retrieve updated user'}), 500
+            # Verify current user has admin role or is updating their own profile
+            cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
+            current_user_role = cursor.fetchone()
+            
+            if not current_user_role or (current_user_role[0] != 'main_admin' and str(current_user_id) != user_id):
+                return jsonify({'error': 'Permission denied'}), 403
+            
+            # Build update query dynamically based on provided fields
+            update_fields = []
+            update_values = []
+            
+            allowed_fields = ['name', 'email', 'role', 'department_id', 'staff_role', 'subjects_selected', 'subjects_locked']
+            
+            for field in allowed_fields:
+                if field in data:
+                    if field == 'subjects_selected' and isinstance(data[field], list):
+                        update_fields.append(f"{field} = ?")
+                        update_values.append(','.join(data[field]))
+                    else:
+                        update_fields.append(f"{field} = ?")
+                        update_values.append(data[field])
+            
+            if not update_fields:
+                return jsonify({'error': 'No valid fields to update'}), 400
+            
+            update_values.append(user_id)
+            
+            cursor.execute(f'''
+                UPDATE users 
+                SET {', '.join(update_fields)}
+                WHERE id = ? AND is_active = 1
+            ''', update_values)
+            
+            if cursor.rowcount == 0:
+                return jsonify({'error': 'User not found or no changes made'}), 404
+            
+            # Get updated user data
+            cursor.execute('''
+                SELECT u.id, u.name, u.email, u.role, u.department_id, 
+                       u.staff_role, u.subjects_selected, u.subjects_locked, u.username,
+                       u.employee_id, d.name as department_name
+                FROM users u
+                LEFT JOIN departments d ON u.department_id = d.id
+                WHERE u.id = ?
+            ''', (user_id,))
+            
+            user_data = cursor.fetchone()
+            conn.commit()
+            conn.close()
+            
+            if user_data:
+                user = {
+                    'id': str(user_data[0]),
+                    'name': user_data[1],
+                    'email': user_data[2],
+                    'role': user_data[3],
+                    'department_id': str(user_data[4]) if user_data[4] else None,
+                    'staff_role': user_data[5],
+                    'subjects_selected': user_data[6].split(',') if user_data[6] else [],
+                    'subjects_locked': bool(user_data[7]),
+                    'username': user_data[8],
+                    'employee_id': user_data[9],
+                    'department_name': user_data[10]
+                }
+                
+                return jsonify({'success': True, 'data': user}), 200
+            
+            return jsonify({'error': 'Failed to retrieve updated user'}), 500
         
     except Exception as e:
         logger.error(f"Update user error: {str(e)}")
@@ -277,7 +278,7 @@ def update_user(user_id):
 @jwt_required()
 def get_departments():
     try:
-        conn = sqlite3.connect('timetable_enhanced.db')
+        conn = get_db_connection('timetable_enhanced.db', row_factory=None)
         cursor = conn.cursor()
         
         cursor.execute('SELECT id, name, code FROM departments ORDER BY name')
@@ -305,31 +306,30 @@ def create_department():
         data = request.get_json()
         
         # Verify main admin
-        conn = sqlite3.connect('timetable_enhanced.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role[0] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        if not data.get('name') or not data.get('code'):
-            return jsonify({'error': 'Name and code are required'}), 400
-        
-        cursor.execute('INSERT INTO departments (name, code) VALUES (?, ?)', 
-                      (data['name'], data['code']))
-        dept_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'id': str(dept_id),
-                'name': data['name'],
-                'code': data['code']
-            }
-        }), 201
+        with get_db_connection('timetable_enhanced.db', row_factory=None) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
+            user_role = cursor.fetchone()
+            
+            if not user_role or user_role[0] != 'main_admin':
+                return jsonify({'error': 'Access denied'}), 403
+            
+            if not data.get('name') or not data.get('code'):
+                return jsonify({'error': 'Name and code are required'}), 400
+            
+            cursor.execute('INSERT INTO departments (name, code) VALUES (?, ?)', 
+                          (data['name'], data['code']))
+            dept_id = cursor.lastrowid
+            conn.commit()
+            
+            return jsonify({
+                'success': True,
+                'data': {
+                    'id': str(dept_id),
+                    'name': data['name'],
+                    'code': data['code']
+                }
+            }), 201
         
     except Exception as e:
         logger.error(f"Create department error: {str(e)}")
@@ -0,0 +1,161 @@
+# Role and department claims in the access token
+#
+# Almost every route began with SELECT role / department_id FROM users WHERE
+# id = ? before doing any work. Login now puts the user's role, department
+# and token version into the JWT, and @role_required authorizes from those
+# claims. A trigger (migration 14) bumps users.token_version whenever role, department,
+# approval or active status changes (and logs it in token_version_log);
+# TokenVersions keeps every worker's in-memory copy of the changed versions
+# in sync with one indexed range read per TOKEN_SYNC_INTERVAL, so a token
+# minted before such a change is refused within that interval.
+#
+#   @app.route('/api/staff/pending')
+#   @role_required('main_admin')
+#   def get_pending_staff():
+#       user = current_user()   # {'id', 'role', 'department_id'}
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from flask import g, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv('TOKEN_SYNC_INTERVAL', '1'))
+
+# Logged as the version of a deleted user, which no token carries
+DELETED_VERSION = -1
+
+
+def create_user_token(user) -> str:
+    """Access token for a users row carrying id, role, department_id and token_version"""
+    return create_access_token(identity=str(user['id']), additional_claims={
+        'role': user['role'],
+        'department_id': user['department_id'],
+        'ver': user['token_version']
+    })
+
+
+class TokenVersions:
+    """user id -> current token version, for users whose version is not 0"""
+
+    def __init__(self, interval: float = SYNC_INTERVAL):
+        self.interval = interval
+        self._versions: Dict[int, int] = {}
+        self._last_seq: Optional[int] = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Optional[int]], None]] = []
+
+    def subscribe(self, listener: Callable[[Optional[int]], None]):
+        """Call listener(user_id) for every logged change, listener(None) after a full reload"""
+        self._listeners.append(listener)
+
+    def _notify(self, user_id: Optional[int]):
+        for listener in self._listeners:
+            listener(user_id)
+
+    def _load(self, cursor):
+        # Read the log position first; entries after it are re-applied in order
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM token_version_log')
+        last_seq = cursor.fetchone()[0]
+        cursor.execute('SELECT id, token_version FROM users WHERE token_version != 0')
+        versions = dict(cursor.fetchall())
+        cursor.execute('SELECT user_id, version FROM token_version_log WHERE version = ?', (DELETED_VERSION,))
+        versions.update(cursor.fetchall())
+        self._versions, self._last_seq = versions, last_seq
+        self._notify(None)
+
+    def sync(self, db_path: Optional[str] = None):
+        conn = get_db_connection(db_path, row_factory=None)
+        try:
+            cursor = conn.cursor()
+            if self._last_seq is not None:
+                cursor.execute('SELECT MIN(id) FROM token_version_log')
+                oldest = cursor.fetchone()[0]
+                if oldest is not None and oldest > self._last_seq + 1:
+                    # Retention pruned entries this process never saw
+                    self._last_seq = None
+            if self._last_seq is None:
+                self._load(cursor)
+            else:
+                cursor.execute('''
+                    SELECT id, user_id, version FROM token_version_log WHERE id > ? ORDER BY id
+                ''', (self._last_seq,))
+                for seq, user_id, version in cursor.fetchall():
+                    self._versions[user_id] = version
+                    self._last_seq = seq
+                    self._notify(user_id)
+        finally:
+            conn.close()
+        self._synced_at = time.monotonic()
+
+    def maybe_sync(self):
+        if time.monotonic() - self._synced_at >= self.interval and self._lock.acquire(blocking=False):
+            # One thread refreshes; the others use the copy they already have
+            try:
+                self.sync()
+            finally:
+                self._lock.release()
+
+    def current(self, user_id: int) -> int:
+        self.maybe_sync()
+        return self._versions.get(user_id, 0)
+
+    def expire(self):
+        """Refresh on the next check, e.g. right after this process changed a user"""
+        self._synced_at = 0.0
+
+
+token_versions = TokenVersions()
+
+
+def _user_from_claims() -> Optional[Dict]:
+    user_id = int(get_jwt_identity())
+    claims = get_jwt()
+    if 'ver' not in claims:
+        # Issued before tokens carried claims: look the user up once
+        conn = get_db_connection()
+        try:
+            row = conn.execute('SELECT role, department_id FROM users WHERE id = ?', (user_id,)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        return {'id': user_id, 'role': row['role'], 'department_id': row['department_id']}
+
+    if token_versions.current(user_id) != claims['ver']:
+        return None
+    return {'id': user_id, 'role': claims['role'], 'department_id': claims['department_id']}
+
+
+def role_required(*roles):
+    """jwt_required() that also authorizes from the token claims
+
+    With no roles any signed-in user passes. Tokens issued before the user's
+    role, department or status changed are refused with 401.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            user = _user_from_claims()
+            if user is None:
+                return jsonify({'error': 'Session expired, please log in again'}), 401
+            if roles and user['role'] not in roles:
+                return jsonify({'error': 'Access denied'}), 403
+            g.current_user = user
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_user() -> Dict:
+    """{'id', 'role', 'department_id'} of the user authorized by @role_required"""
+    return g.current_user
@@ -0,0 +1,64 @@
+# Compressed, content-addressed storage for large JSON documents
+#
+# Each enhanced generation stores four timetable views and a copy of the
+# constraints; as plain TEXT columns in generated_timetables that grew the
+# database by megabytes per click, even when a regeneration produced exactly
+# the same output. Documents are now zlib-compressed into timetable_blobs,
+# keyed by the SHA-256 of their uncompressed text, and rows reference them by
+# hash: identical documents are stored once, however often they are saved.
+import hashlib
+import zlib
+from typing import Dict, Iterable, Optional
+
+COMPRESSION_LEVEL = 6
+
+
+def put_blob(cursor, text: Optional[str]) -> Optional[str]:
+    """Store a document unless an identical one exists; returns its hash"""
+    if text is None:
+        return None
+    raw = text.encode('utf-8')
+    digest = hashlib.sha256(raw).hexdigest()
+    cursor.execute('''
+        INSERT OR IGNORE INTO timetable_blobs (hash, data, size)
+        VALUES (?, ?, ?)
+    ''', (digest, zlib.compress(raw, COMPRESSION_LEVEL), len(raw)))
+    return digest
+
+
+def decompress(data: Optional[bytes]) -> Optional[str]:
+    return None if data is None else zlib.decompress(data).decode('utf-8')
+
+
+def get_blobs(cursor, hashes: Iterable[str]) -> Dict[str, str]:
+    """Hash -> document text for every stored hash in `hashes`"""
+    wanted = list({h for h in hashes if h})
+    if not wanted:
+        return {}
+    cursor.execute(f'''
+        SELECT hash, data FROM timetable_blobs
+        WHERE hash IN ({','.join('?' * len(wanted))})
+    ''', wanted)
+    return {digest: decompress(data) for digest, data in cursor.fetchall()}
+
+
+def prune_blobs(cursor, hashes: Optional[Iterable[str]] = None) -> int:
+    """Delete blobs no generated timetable or entity view refers to, optionally only among `hashes`"""
+    unreferenced = '''
+        hash NOT IN (SELECT data_hash FROM generated_timetables WHERE data_hash IS NOT NULL)
+        AND hash NOT IN (SELECT constraints_hash FROM generated_timetables
+                         WHERE constraints_hash IS NOT NULL)
+        AND hash NOT IN (SELECT view_hash FROM timetable_entity_views)
+    '''
+    if hashes is None:
+        cursor.execute(f'DELETE FROM timetable_blobs WHERE {unreferenced}')
+        return cursor.rowcount
+
+    candidates = list({h for h in hashes if h})
+    if not candidates:
+        return 0
+    cursor.execute(f'''
+        DELETE FROM timetable_blobs
+        WHERE hash IN ({','.join('?' * len(candidates))}) AND {unreferenced}
+    ''', candidates)
+    return cursor.rowcount
@@ -1,6 +1,6 @@
-import sqlite3
+from database import get_db_connection
 
-conn = sqlite3.connect('timetable.db')
+conn = get_db_connection(row_factory=None)
 cursor = conn.cursor()
 
 cursor.execute("SELECT id, name, email FROM users")
@@ -0,0 +1,86 @@
+# Trigger-maintained counters for the analytics endpoints
+#
+# The main admin dashboards refetch their analytics every 30 seconds per open
+# tab, and each fetch ran seven COUNT(*) queries, one of them a
+# COUNT(DISTINCT department_id) over every timetable entry. The counts now
+# live in the single row of analytics_counters, kept current by SQLite
+# triggers on the counted tables (created by migration 11), so reading them
+# is one primary-key lookup however large the tables get. Triggers run inside
+# the writing statement's transaction, so the counters can never drift from a
+# rolled-back write.
+#
+#   python -m counters --db timetable.db            # show the counters
+#   python -m counters --db timetable.db --rebuild  # recount from the tables
+import argparse
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# (counter, table, predicate over the row as {row}); the triggers that keep
+# them current are created by migration 11
+COUNTERS = [
+    ('departments', 'departments', '1'),
+    ('staff', 'users', "{row}.role = 'staff'"),
+    ('dept_admins', 'users', "{row}.role = 'dept_admin'"),
+    ('pending_users', 'users', "{row}.approval_status = 'pending'"),
+    ('pending_credentials', 'credentials_export', '{row}.exported = FALSE'),
+    ('notifications', 'notifications', '1'),
+    ('timetable_logs', 'timetable_logs', '1'),
+    ('pending_syllabus', 'syllabus_uploads', "{row}.status = 'pending'"),
+]
+
+# Departments with at least one timetable entry, tracked through
+# timetable_departments so no trigger has to count timetables
+DISTINCT_COUNTER = 'timetable_departments'
+
+
+def rebuild_counters(cursor):
+    """Recount every counter from its table; run inside a write transaction"""
+    assignments = [
+        f"{name} = (SELECT COUNT(*) FROM {table} WHERE {predicate.format(row=table)})"
+        for name, table, predicate in COUNTERS
+    ]
+    cursor.execute('DELETE FROM timetable_departments')
+    cursor.execute('''
+        INSERT INTO timetable_departments (department_id)
+        SELECT DISTINCT department_id FROM timetables
+    ''')
+    assignments.append(f'{DISTINCT_COUNTER} = (SELECT COUNT(*) FROM timetable_departments)')
+    cursor.execute(f"UPDATE analytics_counters SET {', '.join(assignments)} WHERE id = 1")
+
+
+def read_counters(cursor) -> Dict[str, int]:
+    cursor.execute('SELECT * FROM analytics_counters WHERE id = 1')
+    row = cursor.fetchone()
+    names = [d[0] for d in cursor.description]
+    return {name: value for name, value in zip(names, row) if name != 'id'}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='counters', description='Show or rebuild the analytics counters')
+    parser.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                        help='Path to the SQLite database')
+    parser.add_argument('--rebuild', action='store_true', help='Recount every counter from its table')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    conn = get_db_connection(args.db, row_factory=None)
+    try:
+        if args.rebuild:
+            conn.execute('BEGIN IMMEDIATE')
+            rebuild_counters(conn.cursor())
+            conn.commit()
+        for name, value in read_counters(conn.cursor()).items():
+            print(f"{value:8d}  {name}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# Credential generation pipeline for approved staff and department admins
+#
+# generate_credentials used to SELECT, hash and write two statements per user
+# on the request thread; a thousand users timed the request out. The
+# pipeline is now one query for the users still without credentials, PBKDF2
+# hashing fanned out over a process pool, and one batched write transaction
+# that re-checks the set under the write lock. Batches above ASYNC_THRESHOLD
+# run on a background thread and the request returns a job handle, recorded
+# in credential_jobs so any worker process can report its progress. Large
+# staff imports run through the same jobs (kind 'staff_import'), with their
+# report stored as the job's result.
+#
+# A running job heartbeats every JOB_HEARTBEAT seconds. One that has not for
+# JOB_TIMEOUT minutes (its process crashed or was restarted) is marked failed
+# the next time jobs are looked up, so it never blocks a new generation, and
+# a failed job is never moved back to running or done.
+#
+#   python -m credentials --db timetable.db --workers 8
+#   POST /api/credentials/generate       -> 200 {count} or 202 {job}
+#   GET  /api/credentials/jobs/<job_id>
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import get_db_connection, transaction
+from staff_import import WORKERS, generate_password, generate_username, hash_passwords
+
+logger = logging.getLogger(__name__)
+
+# Larger batches are generated in the background
+ASYNC_THRESHOLD = int(os.getenv('CREDENTIALS_ASYNC_THRESHOLD', '50'))
+# Seconds between heartbeats of a running job
+JOB_HEARTBEAT = float(os.getenv('CREDENTIALS_JOB_HEARTBEAT', '30'))
+# Minutes without a heartbeat after which a queued or running job is failed
+JOB_TIMEOUT = int(os.getenv('CREDENTIALS_JOB_TIMEOUT', '10'))
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_CREDENTIALS = 'credentials'
+JOB_STAFF_IMPORT = 'staff_import'
+
+PENDING_USERS_QUERY = '''
+    SELECT u.id, u.email FROM users u
+    WHERE u.role IN ('staff', 'dept_admin')
+      AND u.approval_status = 'approved'
+      AND NOT EXISTS (SELECT 1 FROM credentials_export ce WHERE ce.user_id = u.id)
+'''
+
+
+def pending_users(cursor) -> List[tuple]:
+    """(id, email) of approved users who never received credentials"""
+    cursor.execute(PENDING_USERS_QUERY + ' ORDER BY u.id')
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def generate(conn, users: List[tuple], workers: int = WORKERS) -> int:
+    """Hash new passwords for `users` and store them in one write; returns the count"""
+    if not users:
+        return 0
+    passwords = [generate_password() for _ in users]
+    if workers > 1 and len(users) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(users))) as executor:
+            hashes = hash_passwords(passwords, executor, workers)
+    else:
+        hashes = hash_passwords(passwords)
+
+    cursor = conn.cursor()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another request may have covered some of these while we hashed
+        cursor.execute(PENDING_USERS_QUERY)
+        still_pending = {row[0] for row in cursor.fetchall()}
+        batch = [(user_id, generate_username(email), password, password_hash)
+                 for (user_id, email), password, password_hash in zip(users, passwords, hashes)
+                 if user_id in still_pending]
+        cursor.executemany('UPDATE users SET password_hash = ? WHERE id = ?',
+                           [(password_hash, user_id) for user_id, _, _, password_hash in batch])
+        cursor.executemany('''
+            INSERT INTO credentials_export (user_id, username, plain_password)
+            VALUES (?, ?, ?)
+        ''', [(user_id, username, password) for user_id, username, password, _ in batch])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(batch)
+
+
+def _set_job(db_path: Optional[str], job_id: str, **fields) -> bool:
+    """Update a queued or running job; False if it already finished or was failed as stale"""
+    assignments = [f'{column} = ?' for column in fields] + ['heartbeat_at = CURRENT_TIMESTAMP']
+    if fields.get('status') in (JOB_DONE, JOB_FAILED):
+        assignments.append('finished_at = CURRENT_TIMESTAMP')
+    with transaction(db_path, row_factory=None) as conn:
+        return conn.execute(f'''
+            UPDATE credential_jobs SET {', '.join(assignments)} WHERE id = ? AND status IN (?, ?)
+        ''', tuple(fields.values()) + (job_id, JOB_QUEUED, JOB_RUNNING)).rowcount > 0
+
+
+def _heartbeat(db_path: Optional[str], job_id: str, stop: threading.Event):
+    while not stop.wait(JOB_HEARTBEAT):
+        try:
+            if not _set_job(db_path, job_id):
+                return
+        except Exception as e:
+            logger.warning(f"Job {job_id} heartbeat failed: {e}")
+
+
+def _run_job(db_path: Optional[str], job_id: str, work: Callable[..., Tuple[int, Optional[Dict]]]):
+    if not _set_job(db_path, job_id, status=JOB_RUNNING):
+        return
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(db_path, job_id, stop),
+                     name=f'job-{job_id[:8]}-heartbeat', daemon=True).start()
+    conn = get_db_connection(db_path, row_factory=None)
+    try:
+        count, result = work(conn)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        _set_job(db_path, job_id, status=JOB_FAILED, error=str(e))
+        return
+    finally:
+        stop.set()
+        conn.close()
+    logger.info("Job %s finished with %d item(s)", job_id, count)
+    _set_job(db_path, job_id, status=JOB_DONE, generated=count,
+             result=json.dumps(result) if result is not None else None)
+
+
+STALE_JOBS = '''
+    status IN (?, ?) AND COALESCE(heartbeat_at, created_at) < datetime('now', ?)
+'''
+
+
+def fail_stale_jobs(conn) -> int:
+    """Fail queued or running jobs that stopped heartbeating; returns how many"""
+    params = (JOB_QUEUED, JOB_RUNNING, f'-{JOB_TIMEOUT} minutes')
+    # Read first, so the common case of no stale job takes no write lock
+    if not conn.execute(f'SELECT 1 FROM credential_jobs WHERE {STALE_JOBS} LIMIT 1', params).fetchone():
+        return 0
+    failed = conn.execute(f'''
+        UPDATE credential_jobs SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+        WHERE {STALE_JOBS}
+    ''', (JOB_FAILED, f'No heartbeat for {JOB_TIMEOUT} minutes') + params).rowcount
+    conn.commit()
+    logger.warning("Marked %d stale credential job(s) as failed", failed)
+    return failed
+
+
+def active_job(conn, kind: str = JOB_CREDENTIALS) -> Optional[Dict]:
+    """The newest queued or running job of a kind that is still alive, or None"""
+    fail_stale_jobs(conn)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT * FROM credential_jobs WHERE status IN (?, ?) AND kind = ?
+        ORDER BY created_at DESC LIMIT 1
+    ''', (JOB_QUEUED, JOB_RUNNING, kind))
+    row = cursor.fetchone()
+    return _job_dict(cursor, row) if row else None
+
+
+def get_job(conn, job_id: str) -> Optional[Dict]:
+    fail_stale_jobs(conn)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM credential_jobs WHERE id = ?', (job_id,))
+    row = cursor.fetchone()
+    return _job_dict(cursor, row) if row else None
+
+
+def _job_dict(cursor, row) -> Dict:
+    job = dict(zip([d[0] for d in cursor.description], row))
+    job['result'] = json.loads(job['result']) if job.get('result') else None
+    return job
+
+
+def start_background_job(conn, kind: str, total: int, created_by, work: Callable,
+                         db_path: Optional[str] = None) -> Dict:
+    """Record a job and run `work(conn) -> (count, result)` on a background thread
+
+    `result` is stored as JSON and returned with the job once it is done.
+    """
+    job_id = uuid.uuid4().hex
+    conn.execute('''
+        INSERT INTO credential_jobs (id, kind, status, total, created_by, heartbeat_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (job_id, kind, JOB_QUEUED, total, created_by))
+    conn.commit()
+    threading.Thread(target=_run_job, args=(db_path, job_id, work),
+                     name=f'{kind}-{job_id[:8]}', daemon=True).start()
+    return get_job(conn, job_id)
+
+
+def start_job(conn, users: List[tuple], created_by, db_path: Optional[str] = None,
+              workers: int = WORKERS) -> Dict:
+    """Record a job for `users` and generate it on a background thread"""
+    return start_background_job(conn, JOB_CREDENTIALS, len(users), created_by,
+                                lambda job_conn: (generate(job_conn, users, workers), None), db_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='credentials',
+                                     description='Generate credentials for approved users without any')
+    parser.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                        help='Path to the SQLite database')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Password hashing processes')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    conn = get_db_connection(args.db, row_factory=None)
+    try:
+        count = generate(conn, pending_users(conn.cursor()), args.workers)
+    finally:
+        conn.close()
+    print(f"generated credentials for {count} user(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
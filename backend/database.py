@@ -0,0 +1,259 @@
+# Shared SQLite connection layer
+#
+# Every module gets its connections from here instead of calling
+# sqlite3.connect() itself. Connections are pooled per database file and
+# handed out wrapped in a PooledConnection whose close() returns the
+# connection to the pool (rolling back anything left uncommitted) instead of
+# closing it, so request handlers keep their existing open/close pattern while
+# the connect cost is paid once per pooled connection.
+#
+#   conn = get_db_connection()              # rows are sqlite3.Row
+#   conn = get_db_connection(row_factory=None)  # rows are tuples
+#
+#   with transaction() as conn:             # commit on success, rollback on error
+#       conn.execute('UPDATE ...')
+#
+# Connections run in WAL mode so dashboard reads never wait for a timetable or
+# credential write; writers queue on busy_timeout instead of failing with
+# "database is locked". Each pool runs a background thread that checkpoints
+# the WAL passively every DB_CHECKPOINT_INTERVAL seconds so it does not grow
+# without bound; returning a connection never waits on a checkpoint.
+#
+# auto_vacuum is not set here: it only takes effect on an empty database or
+# through a VACUUM, so switching an existing file is a one-time offline step
+# (python -m retention --enable-incremental-vacuum) rather than something
+# every connection should ask for.
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Overridden by TIMETABLE_DB_PATH, read at connect time so .env files loaded
+# after import still apply
+DB_PATH = 'timetable.db'
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+
+BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+# Page cache per connection, passed to SQLite as a negative (KiB) cache_size
+CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)))
+CHECKPOINT_INTERVAL = float(os.getenv('DB_CHECKPOINT_INTERVAL', '60'))
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', BUSY_TIMEOUT_MS),
+    ('cache_size', -CACHE_SIZE_KB),
+    ('mmap_size', MMAP_SIZE),
+    ('temp_store', 'MEMORY'),
+)
+
+_DEFAULT = object()
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of connections to one database file
+
+    acquire() never blocks: when the pool is empty a new connection is opened,
+    and release() closes connections that do not fit back into the pool.
+    """
+
+    def __init__(self, path: str, max_size: int = POOL_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self.opened = 0
+        self.checkpoints = 0
+        self._checkpointer: Optional[threading.Thread] = None
+        self._checkpointer_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Pooled connections move between request threads, but only one
+        # borrower uses a connection at a time
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        for name, value in PRAGMAS:
+            row = conn.execute(f'PRAGMA {name} = {value}').fetchone()
+            if name == 'journal_mode' and row and str(row[0]).lower() != 'wal':
+                logger.warning("%s is running in %s journal mode, not WAL", self.path, row[0])
+        self.opened += 1
+        return conn
+
+    def checkpoint(self):
+        """Copy committed WAL pages back into the database without blocking anyone"""
+        conn = self.acquire()
+        try:
+            busy, wal_pages, copied = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+            self.checkpoints += 1
+            logger.debug("Checkpointed %s: %s/%s WAL pages copied", self.path, copied, wal_pages)
+        except sqlite3.Error as e:
+            logger.warning("Checkpoint of %s failed: %s", self.path, e)
+        finally:
+            self.release(conn)
+
+    def _checkpoint_loop(self):
+        while not self._stop.wait(CHECKPOINT_INTERVAL):
+            self.checkpoint()
+
+    def _ensure_checkpointer(self):
+        # Also restarts the thread in a worker forked after the pool was made
+        if CHECKPOINT_INTERVAL <= 0 or (self._checkpointer and self._checkpointer.is_alive()):
+            return
+        with self._checkpointer_lock:
+            if self._checkpointer and self._checkpointer.is_alive():
+                return
+            self._checkpointer = threading.Thread(target=self._checkpoint_loop, daemon=True,
+                                                  name=f'checkpoint-{os.path.basename(self.path)}')
+            self._checkpointer.start()
+
+    def acquire(self) -> sqlite3.Connection:
+        self._ensure_checkpointer()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            logger.warning("Discarding broken connection to %s", self.path)
+            conn.close()
+            return
+
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        self._stop.set()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict:
+        return {'path': self.path, 'idle': self._idle.qsize(), 'opened': self.opened,
+                'max_size': self.max_size, 'checkpoints': self.checkpoints}
+
+
+class PooledConnection:
+    """Borrowed pool connection; close() gives it back instead of closing it
+
+    Everything not defined here is delegated to the underlying
+    sqlite3.Connection. The row factory is applied per cursor, so borrowers
+    asking for tuples and for sqlite3.Row can share pooled connections.
+    """
+
+    def __init__(self, pool: ConnectionPool, row_factory=sqlite3.Row):
+        self._pool = pool
+        self._conn = pool.acquire()
+        self.row_factory = row_factory
+        _borrowed().add(self)
+
+    def cursor(self) -> sqlite3.Cursor:
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        cursor = self._conn.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        self._pool.release(conn)
+        _borrowed().discard(self)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Handlers that return early without close() still give the
+        # connection back once the proxy is garbage collected
+        if getattr(self, '_conn', None) is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+
+def _borrowed() -> weakref.WeakSet:
+    if not hasattr(_local, 'borrowed'):
+        _local.borrowed = weakref.WeakSet()
+    return _local.borrowed
+
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    path = os.path.abspath(db_path or os.getenv('TIMETABLE_DB_PATH', DB_PATH))
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path))
+    return pool
+
+
+def get_db_connection(db_path: Optional[str] = None, row_factory=_DEFAULT) -> PooledConnection:
+    """Borrow a pooled connection; rows are sqlite3.Row unless row_factory is given"""
+    return PooledConnection(get_pool(db_path),
+                            sqlite3.Row if row_factory is _DEFAULT else row_factory)
+
+
+@contextmanager
+def transaction(db_path: Optional[str] = None, row_factory=_DEFAULT):
+    """Borrow a connection for one transaction: commit on success, rollback on error"""
+    conn = get_db_connection(db_path, row_factory)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def release_thread_connections(exc=None):
+    """Give back every connection this thread borrowed and did not close"""
+    for conn in list(_borrowed()):
+        conn.close()
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+def init_app(app):
+    """Return leaked connections to the pool at the end of every request"""
+    app.teardown_appcontext(release_thread_connections)
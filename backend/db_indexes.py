@@ -0,0 +1,204 @@
+# Indexes for the hot query paths of the route modules
+#
+# create_indexes() adds every index whose table and columns exist in the
+# database (tables are created lazily by several modules, and the two
+# notifications schemas differ). The migrations create the same indexes from
+# their own frozen lists; INDEXES describes the current schema.
+# check_query_plans() runs EXPLAIN QUERY PLAN over the endpoint queries in
+# HOT_QUERIES, which are the routes' own SQL from queries.py, and reports any
+# that still scan a whole table:
+#
+#   python -m db_indexes --db timetable.db            # create missing indexes
+#   python -m db_indexes --db timetable.db --check    # exit 1 if a full scan remains
+import argparse
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+
+from database import get_db_connection
+from pagination import page_query
+from queries import (APPROVED_ONLY, APPROVED_STAFF_BY_DEPARTMENT, CHOICE_FORMS_BY_DEPARTMENT, CLASSES_BY_DEPARTMENT,
+                     CLASSROOMS_BY_DEPARTMENT, CONSTRAINTS_BY_DEPARTMENT, DEPARTMENT_NOTIFICATIONS,
+                     DEPARTMENT_PREFERENCES, DEPARTMENT_QUERIES, DEPARTMENT_QUERIES_BY_DEPARTMENT,
+                     DEPARTMENT_TIMETABLE, ENTITY_VIEW, GENERATED_TIMETABLES, MAIN_ADMIN_NOTIFICATIONS,
+                     OPEN_CHOICE_FORMS_FOR_STAFF, OPEN_SUBJECT_CHOICE_FORMS_FOR_STAFF, PENDING_STAFF,
+                     STAFF_BY_DEPARTMENT, STAFF_REGISTRATION_REQUESTS, STAFF_WITH_SUBJECT_CHOICES,
+                     SUBJECT_CHOICE_FORMS_BY_DEPARTMENT, SUBJECT_CHOICE_SUBMISSIONS_BY_STAFF,
+                     SUBJECTS_BY_DEPARTMENT, SYLLABUS_UPLOADS, TIMETABLE_CONFIGURATION, TIMETABLE_LOGS,
+                     UNEXPORTED_CREDENTIALS)
+
+logger = logging.getLogger(__name__)
+
+# (index name, table, columns)
+INDEXES = [
+    # Department-scoped staff lists, role/approval dashboards and counters
+    ('idx_users_department_role_status', 'users', ('department_id', 'role', 'approval_status')),
+    ('idx_users_role_status', 'users', ('role', 'approval_status', 'created_at')),
+    ('idx_users_approval_status', 'users', ('approval_status',)),
+
+    ('idx_subjects_department', 'subjects', ('department_id', 'name')),
+    ('idx_classes_department', 'classes', ('department_id', 'year', 'section')),
+    ('idx_classrooms_department', 'classrooms', ('department_id', 'name')),
+
+    ('idx_timetables_department_slot', 'timetables', ('department_id', 'day_idx', 'period_idx')),
+    ('idx_timetables_staff_slot', 'timetables', ('staff_id', 'day_idx', 'period_idx')),
+    ('idx_timetables_classroom_slot', 'timetables', ('classroom_id', 'day_idx', 'period_idx')),
+    ('idx_timetables_class', 'timetables', ('class_id',)),
+
+    ('idx_choice_forms_department', 'choice_forms', ('department_id', 'status')),
+    ('idx_choice_submissions_staff', 'choice_submissions', ('staff_id',)),
+
+    ('idx_notifications_recipient', 'notifications', ('recipient_type', 'department_id', 'created_at')),
+    ('idx_notifications_created', 'notifications', ('created_at',)),
+
+    ('idx_credentials_export_user', 'credentials_export', ('user_id', 'exported')),
+    ('idx_credentials_export_pending', 'credentials_export', ('exported', 'generated_at')),
+    ('idx_credential_jobs_status', 'credential_jobs', ('status', 'created_at')),
+    ('idx_revoked_tokens_expires', 'revoked_tokens', ('expires_at',)),
+    ('idx_refresh_tokens_family', 'refresh_tokens', ('family',)),
+    ('idx_refresh_tokens_expires', 'refresh_tokens', ('expires_at',)),
+
+    ('idx_generated_timetables_lookup', 'generated_timetables',
+     ('department_id', 'timetable_type', 'status', 'created_at')),
+    ('idx_generated_timetables_department', 'generated_timetables', ('department_id', 'created_at')),
+    # Blob reference checks when pruning timetable_blobs
+    ('idx_generated_timetables_data_hash', 'generated_timetables', ('data_hash',)),
+    ('idx_generated_timetables_constraints_hash', 'generated_timetables', ('constraints_hash',)),
+    ('idx_timetable_entity_views_view_hash', 'timetable_entity_views', ('view_hash',)),
+
+    ('idx_subject_choice_forms_department', 'subject_choice_forms', ('department_id', 'status')),
+    ('idx_subject_choice_submissions_staff', 'subject_choice_submissions', ('staff_id', 'submitted_at')),
+
+    # Created by migration 8 for subject -> staff lookups that nothing runs any
+    # more; dropping it takes a new migration. Per-staff lookups use the primary key
+    ('idx_staff_subject_preference_subject', 'staff_subject_preference', ('subject_id', 'source', 'staff_id')),
+
+    ('idx_enhanced_constraints_department', 'enhanced_constraints', ('department_id', 'created_at')),
+    ('idx_timetable_configurations_department', 'timetable_configurations', ('department_id',)),
+    ('idx_department_queries_department', 'department_queries', ('department_id', 'created_at')),
+    ('idx_syllabus_uploads_status', 'syllabus_uploads', ('status', 'uploaded_at')),
+
+    # Newest-first keyset pagination of the unfiltered admin lists
+    ('idx_syllabus_uploads_uploaded', 'syllabus_uploads', ('uploaded_at',)),
+    ('idx_timetable_logs_generated', 'timetable_logs', ('generated_at',)),
+    ('idx_staff_registration_requests_created', 'staff_registration_requests', ('created_at',)),
+    ('idx_department_queries_created', 'department_queries', ('created_at',)),
+]
+
+# Cursor parameters of a keyset page: (sort, id) of the last row seen, limit
+_AFTER = ('2100-01-01', 0, 51)
+
+# (endpoint, query, parameters) for every filtered query a route runs on the
+# hot tables; the SQL is the routes' own, from queries.py
+HOT_QUERIES = [
+    ('GET /api/staff', STAFF_BY_DEPARTMENT, (1,)),
+    ('GET /api/subjects', SUBJECTS_BY_DEPARTMENT, (1,)),
+    ('GET /api/classes', CLASSES_BY_DEPARTMENT, (1,)),
+    ('GET /api/classrooms', CLASSROOMS_BY_DEPARTMENT, (1,)),
+    ('GET /api/timetables', DEPARTMENT_TIMETABLE, (1,)),
+    ('POST /api/timetable/generate (staff load)', APPROVED_STAFF_BY_DEPARTMENT, (1,)),
+    ('POST /api/timetable/generate (staff subjects)', DEPARTMENT_PREFERENCES.format(approval=APPROVED_ONLY),
+     ('choice_form', 1)),
+    ('GET /api/choice-forms (staff)', OPEN_CHOICE_FORMS_FOR_STAFF, (1, 1)),
+    ('GET /api/choice-forms (admin)', CHOICE_FORMS_BY_DEPARTMENT, (1,)),
+    ('GET /api/notifications (main admin)', MAIN_ADMIN_NOTIFICATIONS, ()),
+    ('GET /api/notifications (staff)', DEPARTMENT_NOTIFICATIONS, ('staff', 1)),
+    ('GET /api/staff/pending', page_query(PENDING_STAFF, limit=False), ()),
+    ('GET /api/credentials/export', UNEXPORTED_CREDENTIALS, ()),
+    ('GET /generated-timetables', page_query(GENERATED_TIMETABLES, limit=False), (1,)),
+    ('GET /staff/timetable', ENTITY_VIEW, ('1', 1, 'staff', 'approved')),
+    ('GET /choice-forms/available', OPEN_SUBJECT_CHOICE_FORMS_FOR_STAFF, (1, 1)),
+    ('GET /my-submissions', page_query(SUBJECT_CHOICE_SUBMISSIONS_BY_STAFF, 'submitted_at', limit=False), (1,)),
+    ('POST /generate-timetable (preferences)', STAFF_WITH_SUBJECT_CHOICES, (1,)),
+    ('GET /subject-choice-forms', SUBJECT_CHOICE_FORMS_BY_DEPARTMENT, (1,)),
+    ('GET /constraints (department)', CONSTRAINTS_BY_DEPARTMENT, (1,)),
+    ('GET /queries (department)', page_query(DEPARTMENT_QUERIES_BY_DEPARTMENT, limit=False), (1,)),
+    ('GET /timetable-config', TIMETABLE_CONFIGURATION, (1,)),
+    # Later keyset pages as issued by pagination.fetch_page()
+    ('GET /api/staff/pending (page)', page_query(PENDING_STAFF, after=True), _AFTER),
+    ('GET /syllabus/review (page)', page_query(SYLLABUS_UPLOADS, 'uploaded_at', after=True), _AFTER),
+    ('GET /timetables/logs (page)', page_query(TIMETABLE_LOGS, 'generated_at', after=True), _AFTER),
+    ('GET /staff-requests (page)', page_query(STAFF_REGISTRATION_REQUESTS, after=True), _AFTER),
+    ('GET /queries (page)', page_query(DEPARTMENT_QUERIES, after=True), _AFTER),
+    ('GET /my-submissions (page)', page_query(SUBJECT_CHOICE_SUBMISSIONS_BY_STAFF, 'submitted_at', after=True),
+     (1,) + _AFTER),
+]
+
+
+def _columns(cursor, table: str) -> set:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def create_indexes(conn) -> List[str]:
+    """Create the missing indexes whose table and columns exist; returns their names"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row[0] for row in cursor.fetchall()}
+
+    created = []
+    for name, table, columns in INDEXES:
+        if name in existing:
+            continue
+        if not set(columns) <= _columns(cursor, table):
+            continue
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+        created.append(name)
+
+    if created:
+        logger.info("Created indexes: %s", ', '.join(created))
+    return created
+
+
+def check_query_plans(conn) -> List[Dict]:
+    """EXPLAIN every hot query; report full table scans and queries that cannot run here"""
+    cursor = conn.cursor()
+    results = []
+    for endpoint, query, params in HOT_QUERIES:
+        try:
+            cursor.execute('EXPLAIN QUERY PLAN ' + query, params)
+        except Exception as e:
+            # Table or column created by a module this database has not seen
+            results.append({'endpoint': endpoint, 'skipped': str(e)})
+            continue
+        plan = [row[3] for row in cursor.fetchall()]
+        scans = [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+        results.append({'endpoint': endpoint, 'plan': plan, 'full_scans': scans})
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='db_indexes', description='Create and verify hot-path indexes')
+    parser.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                        help='Path to the SQLite database')
+    parser.add_argument('--check', action='store_true',
+                        help='Only check query plans; exit 1 if a full table scan remains')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print every query plan')
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection(args.db, row_factory=None)
+    try:
+        if not args.check:
+            created = create_indexes(conn)
+            conn.commit()
+            print(f"created {len(created)} indexes" + (f": {', '.join(created)}" if created else ''))
+
+        failures = 0
+        for result in check_query_plans(conn):
+            if 'skipped' in result:
+                print(f"SKIP {result['endpoint']}: {result['skipped']}")
+                continue
+            status = 'SCAN' if result['full_scans'] else 'ok  '
+            failures += bool(result['full_scans'])
+            print(f"{status} {result['endpoint']}")
+            for step in (result['plan'] if args.verbose else result['full_scans']):
+                print(f"       {step}")
+    finally:
+        conn.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
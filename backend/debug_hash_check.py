@@ -1,7 +1,7 @@
 from werkzeug.security import check_password_hash
-import sqlite3
+from database import get_db_connection
 
-conn = sqlite3.connect("timetable.db")
+conn = get_db_connection(row_factory=None)
 cursor = conn.cursor()
 
 cursor.execute("SELECT password_hash FROM users WHERE email = ?", ("srmtt@srmist.edu.in",))
@@ -1,7 +1,14 @@
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
-import sqlite3
+from database import get_db_connection
+from auth_claims import current_user, role_required
+from pagination import PaginationError, fetch_page
+from queries import (CONSTRAINTS_BY_DEPARTMENT, DEPARTMENT_QUERIES, DEPARTMENT_QUERIES_BY_DEPARTMENT,
+                     GENERATED_TIMETABLES, STAFF_REGISTRATION_REQUESTS, STAFF_WITH_SUBJECT_CHOICES,
+                     SUBJECT_CHOICE_FORMS_BY_DEPARTMENT, TIMETABLE_CONFIGURATION)
+from blob_store import get_blobs, put_blob
+from password_auth import hash_password
+from timetable_views import store_views
 import secrets
 import string
 import hashlib
@@ -15,204 +22,31 @@ import requests
 
 enhanced_admin_bp = Blueprint('enhanced_admin', __name__, url_prefix='/api/enhanced-admin')
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('timetable.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_enhanced_tables():
-    """Initialize enhanced tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Staff registration requests table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS staff_registration_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            employee_id TEXT NOT NULL,
-            email TEXT NOT NULL,
-            department_id INTEGER NOT NULL,
-            staff_role TEXT NOT NULL,
-            contact_number TEXT,
-            requested_by INTEGER NOT NULL,
-            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
-            approved_by INTEGER,
-            credentials_generated BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            approved_at TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (requested_by) REFERENCES users (id),
-            FOREIGN KEY (approved_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Enhanced constraints table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS enhanced_constraints (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            department_id INTEGER NOT NULL,
-            role TEXT NOT NULL,
-            max_subjects INTEGER NOT NULL DEFAULT 1,
-            max_hours_per_week INTEGER NOT NULL DEFAULT 8,
-            subject_types TEXT, -- JSON array of allowed subject types
-            lab_faculty_required INTEGER DEFAULT 1,
-            created_by INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (created_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Subject choice forms table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subject_choice_forms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            department_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            open_date TIMESTAMP NOT NULL,
-            close_date TIMESTAMP NOT NULL,
-            status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'open', 'closed')),
-            created_by INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (created_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Subject choices submissions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subject_choice_submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            form_id INTEGER NOT NULL,
-            staff_id INTEGER NOT NULL,
-            subject_preferences TEXT, -- JSON array of subject IDs in preference order
-            additional_notes TEXT,
-            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (form_id) REFERENCES subject_choice_forms (id),
-            FOREIGN KEY (staff_id) REFERENCES users (id),
-            UNIQUE(form_id, staff_id)
-        )
-    ''')
-    
-    # Department queries table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS department_queries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            department_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            priority TEXT DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
-            status TEXT DEFAULT 'open' CHECK (status IN ('open', 'in_progress', 'resolved')),
-            created_by INTEGER NOT NULL,
-            assigned_to INTEGER,
-            resolved_by INTEGER,
-            resolution_notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            resolved_at TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (created_by) REFERENCES users (id),
-            FOREIGN KEY (assigned_to) REFERENCES users (id),
-            FOREIGN KEY (resolved_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Timetable configurations table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS timetable_configurations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            department_id INTEGER NOT NULL,
-            period_duration INTEGER DEFAULT 60, -- minutes
-            periods_per_day INTEGER DEFAULT 7,
-            college_start_time TEXT DEFAULT '09:00',
-            college_end_time TEXT DEFAULT '17:00',
-            break_times TEXT, -- JSON array of break times
-            working_days TEXT DEFAULT '["Monday","Tuesday","Wednesday","Thursday","Friday"]',
-            created_by INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (created_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Generated timetables table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS generated_timetables (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            department_id INTEGER NOT NULL,
-            timetable_type TEXT NOT NULL CHECK (timetable_type IN ('student', 'staff', 'classroom', 'lab')),
-            timetable_data TEXT, -- JSON data
-            status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'approved', 'rejected')),
-            generated_by INTEGER NOT NULL,
-            approved_by INTEGER,
-            generation_constraints TEXT, -- JSON of constraints used
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            approved_at TIMESTAMP,
-            FOREIGN KEY (department_id) REFERENCES departments (id),
-            FOREIGN KEY (generated_by) REFERENCES users (id),
-            FOREIGN KEY (approved_by) REFERENCES users (id)
-        )
-    ''')
-    
-    # Credentials export table (from previous enhancement)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS credentials_export (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            username TEXT NOT NULL,
-            plain_password TEXT NOT NULL,
-            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            exported BOOLEAN DEFAULT FALSE,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-# Initialize tables when module is imported
-init_enhanced_tables()
-
 # Staff Registration Routes
 @enhanced_admin_bp.route('/staff-requests', methods=['GET'])
-@jwt_required()
+@role_required('main_admin')
 def get_staff_requests():
     """Get staff registration requests"""
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Check if main admin
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        cursor.execute('''
-            SELECT sr.*, d.name as department_name, u.name as requested_by_name
-            FROM staff_registration_requests sr
-            JOIN departments d ON sr.department_id = d.id
-            JOIN users u ON sr.requested_by = u.id
-            ORDER BY sr.created_at DESC
-        ''')
-        
-        requests_data = cursor.fetchall()
+        requests_data, pagination = fetch_page(cursor, STAFF_REGISTRATION_REQUESTS, (), request.args)
         conn.close()
         
         return jsonify({
             'success': True,
-            'requests': [dict(row) for row in requests_data]
+            'requests': [dict(row) for row in requests_data],
+            'pagination': pagination
         })
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @enhanced_admin_bp.route('/staff-requests', methods=['POST'])
-@jwt_required()
+@role_required('dept_admin')
 def create_staff_request():
     """Create staff registration request (Department Admin)"""
     try:
@@ -222,12 +56,7 @@ def create_staff_request():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Verify department admin
-        cursor.execute('SELECT role, department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data or user_data['role'] != 'dept_admin':
-            return jsonify({'error': 'Access denied'}), 403
+        user_data = current_user()
         
         cursor.execute('''
             INSERT INTO staff_registration_requests 
@@ -248,81 +77,71 @@ def create_staff_request():
         return jsonify({'error': str(e)}), 500
 
 @enhanced_admin_bp.route('/staff-requests/<int:request_id>/approve', methods=['POST'])
-@jwt_required()
+@role_required('main_admin')
 def approve_staff_request(request_id):
     """Approve staff registration request and generate credentials"""
     try:
         current_user_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verify main admin
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
-        
-        if not user_role or user_role['role'] != 'main_admin':
-            return jsonify({'error': 'Access denied'}), 403
-        
-        # Get request details
-        cursor.execute('SELECT * FROM staff_registration_requests WHERE id = ?', (request_id,))
-        request_data = cursor.fetchone()
-        
-        if not request_data:
-            return jsonify({'error': 'Request not found'}), 404
-        
-        # Generate credentials
-        username = request_data['email'].split('@')[0].lower()
-        password = ''.join(secrets.choice(string.ascii_letters + string.digits + "!@#$%^&*") for _ in range(10))
-        password_hash = generate_password_hash(password)
-        
-        # Create user
-        cursor.execute('''
-            INSERT INTO users (name, email, password_hash, role, department_id, staff_role)
-            VALUES (?, ?, ?, 'staff', ?, ?)
-        ''', (
-            request_data['name'], request_data['email'], password_hash,
-            request_data['department_id'], request_data['staff_role']
-        ))
-        
-        user_id = cursor.lastrowid
-        
-        # Store credentials for export
-        cursor.execute('''
-            INSERT INTO credentials_export (user_id, username, plain_password)
-            VALUES (?, ?, ?)
-        ''', (user_id, username, password))
-        
-        # Update request status
-        cursor.execute('''
-            UPDATE staff_registration_requests 
-            SET status = 'approved', approved_by = ?, approved_at = CURRENT_TIMESTAMP, credentials_generated = TRUE
-            WHERE id = ?
-        ''', (current_user_id, request_id))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Staff approved and credentials generated',
-            'credentials': {'username': username, 'password': password}
-        })
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get request details
+            cursor.execute('SELECT * FROM staff_registration_requests WHERE id = ?', (request_id,))
+            request_data = cursor.fetchone()
+            
+            if not request_data:
+                return jsonify({'error': 'Request not found'}), 404
+            
+            # Generate credentials
+            username = request_data['email'].split('@')[0].lower()
+            password = ''.join(secrets.choice(string.ascii_letters + string.digits + "!@#$%^&*") for _ in range(10))
+            password_hash = hash_password(password)
+            
+            # Create user
+            cursor.execute('''
+                INSERT INTO users (name, email, password_hash, role, department_id, staff_role)
+                VALUES (?, ?, ?, 'staff', ?, ?)
+            ''', (
+                request_data['name'], request_data['email'], password_hash,
+                request_data['department_id'], request_data['staff_role']
+            ))
+            
+            user_id = cursor.lastrowid
+            
+            # Store credentials for export
+            cursor.execute('''
+                INSERT INTO credentials_export (user_id, username, plain_password)
+                VALUES (?, ?, ?)
+            ''', (user_id, username, password))
+            
+            # Update request status
+            cursor.execute('''
+                UPDATE staff_registration_requests 
+                SET status = 'approved', approved_by = ?, approved_at = CURRENT_TIMESTAMP, credentials_generated = TRUE
+                WHERE id = ?
+            ''', (current_user_id, request_id))
+            
+            conn.commit()
+            
+            return jsonify({
+                'success': True,
+                'message': 'Staff approved and credentials generated',
+                'credentials': {'username': username, 'password': password}
+            })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Enhanced Constraints Routes
 @enhanced_admin_bp.route('/constraints', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_enhanced_constraints():
     """Get enhanced constraints for department"""
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id, role FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
         if user_data['role'] == 'main_admin':
             cursor.execute('''
@@ -332,13 +151,7 @@ def get_enhanced_constraints():
                 ORDER BY ec.created_at DESC
             ''')
         else:
-            cursor.execute('''
-                SELECT ec.*, d.name as department_name
-                FROM enhanced_constraints ec
-                JOIN departments d ON ec.department_id = d.id
-                WHERE ec.department_id = ?
-                ORDER BY ec.created_at DESC
-            ''', (user_data['department_id'],))
+            cursor.execute(CONSTRAINTS_BY_DEPARTMENT, (user_data['department_id'],))
         
         constraints = cursor.fetchall()
         conn.close()
@@ -352,7 +165,7 @@ def get_enhanced_constraints():
         return jsonify({'error': str(e)}), 500
 
 @enhanced_admin_bp.route('/constraints', methods=['POST'])
-@jwt_required()
+@role_required('dept_admin', 'main_admin')
 def create_enhanced_constraint():
     """Create enhanced constraint"""
     try:
@@ -362,11 +175,7 @@ def create_enhanced_constraint():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id, role FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
-        
-        if user_data['role'] not in ['dept_admin', 'main_admin']:
-            return jsonify({'error': 'Access denied'}), 403
+        user_data = current_user()
         
         department_id = data.get('department_id') if user_data['role'] == 'main_admin' else user_data['department_id']
         
@@ -390,27 +199,16 @@ def create_enhanced_constraint():
 
 # Subject Choice Forms Routes
 @enhanced_admin_bp.route('/choice-forms', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_choice_forms():
     """Get subject choice forms"""
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        cursor.execute('''
-            SELECT scf.*, u.name as created_by_name,
-                   COUNT(scs.id) as submission_count
-            FROM subject_choice_forms scf
-            JOIN users u ON scf.created_by = u.id
-            LEFT JOIN subject_choice_submissions scs ON scf.id = scs.form_id
-            WHERE scf.department_id = ?
-            GROUP BY scf.id
-            ORDER BY scf.created_at DESC
-        ''', (user_data['department_id'],))
+        cursor.execute(SUBJECT_CHOICE_FORMS_BY_DEPARTMENT, (user_data['department_id'],))
         
         forms = cursor.fetchall()
         conn.close()
@@ -424,7 +222,7 @@ def get_choice_forms():
         return jsonify({'error': str(e)}), 500
 
 @enhanced_admin_bp.route('/choice-forms', methods=['POST'])
-@jwt_required()
+@role_required()
 def create_choice_form():
     """Create subject choice form"""
     try:
@@ -434,8 +232,7 @@ def create_choice_form():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
         cursor.execute('''
             INSERT INTO subject_choice_forms 
@@ -476,51 +273,36 @@ def toggle_choice_form(form_id):
 
 # Department Queries Routes
 @enhanced_admin_bp.route('/queries', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_department_queries():
     """Get department queries"""
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT role FROM users WHERE id = ?', (current_user_id,))
-        user_role = cursor.fetchone()
+        user_data = current_user()
         
-        if user_role['role'] == 'main_admin':
-            cursor.execute('''
-                SELECT dq.*, d.name as department_name, u.name as created_by_name
-                FROM department_queries dq
-                JOIN departments d ON dq.department_id = d.id
-                JOIN users u ON dq.created_by = u.id
-                ORDER BY dq.created_at DESC
-            ''')
+        if user_data['role'] == 'main_admin':
+            queries, pagination = fetch_page(cursor, DEPARTMENT_QUERIES, (), request.args)
         else:
-            cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-            user_data = cursor.fetchone()
-            
-            cursor.execute('''
-                SELECT dq.*, d.name as department_name, u.name as created_by_name
-                FROM department_queries dq
-                JOIN departments d ON dq.department_id = d.id
-                JOIN users u ON dq.created_by = u.id
-                WHERE dq.department_id = ?
-                ORDER BY dq.created_at DESC
-            ''', (user_data['department_id'],))
-        
-        queries = cursor.fetchall()
+            queries, pagination = fetch_page(cursor, DEPARTMENT_QUERIES_BY_DEPARTMENT,
+                                             (user_data['department_id'],), request.args)
+        
         conn.close()
         
         return jsonify({
             'success': True,
-            'queries': [dict(row) for row in queries]
+            'queries': [dict(row) for row in queries],
+            'pagination': pagination
         })
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @enhanced_admin_bp.route('/queries', methods=['POST'])
-@jwt_required()
+@role_required()
 def create_query():
     """Create department query"""
     try:
@@ -530,8 +312,7 @@ def create_query():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
         cursor.execute('''
             INSERT INTO department_queries 
@@ -577,7 +358,7 @@ def resolve_query(query_id):
 
 # AI Timetable Generation Routes
 @enhanced_admin_bp.route('/timetable/generate', methods=['POST'])
-@jwt_required()
+@role_required()
 def generate_ai_timetable():
     """Generate AI-powered timetable"""
     try:
@@ -587,24 +368,17 @@ def generate_ai_timetable():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         department_id = user_data['department_id']
         
         # Get all constraints and data
         cursor.execute('SELECT * FROM enhanced_constraints WHERE department_id = ?', (department_id,))
         constraints = cursor.fetchall()
         
-        cursor.execute('SELECT * FROM timetable_configurations WHERE department_id = ?', (department_id,))
+        cursor.execute(TIMETABLE_CONFIGURATION, (department_id,))
         config = cursor.fetchone()
         
-        cursor.execute('''
-            SELECT u.*, GROUP_CONCAT(scs.subject_preferences) as preferences
-            FROM users u
-            LEFT JOIN subject_choice_submissions scs ON u.id = scs.staff_id
-            WHERE u.department_id = ? AND u.role = 'staff'
-            GROUP BY u.id
-        ''', (department_id,))
+        cursor.execute(STAFF_WITH_SUBJECT_CHOICES, (department_id,))
         staff_data = cursor.fetchall()
         
         cursor.execute('SELECT * FROM subjects WHERE department_id = ?', (department_id,))
@@ -619,16 +393,16 @@ def generate_ai_timetable():
             constraints, config, staff_data, subjects, classrooms
         )
         
-        # Store generated timetables
+        # Store generated timetables; identical documents share one compressed blob
+        constraints_hash = put_blob(cursor, json.dumps([dict(c) for c in constraints]))
         for timetable_type, timetable_data in generated_timetables.items():
+            data_hash = put_blob(cursor, json.dumps(timetable_data))
             cursor.execute('''
                 INSERT INTO generated_timetables 
-                (department_id, timetable_type, timetable_data, generated_by, generation_constraints)
+                (department_id, timetable_type, data_hash, generated_by, constraints_hash)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (
-                department_id, timetable_type, json.dumps(timetable_data),
-                current_user_id, json.dumps([dict(c) for c in constraints])
-            ))
+            ''', (department_id, timetable_type, data_hash, current_user_id, constraints_hash))
+            store_views(cursor, timetable_type, data_hash, timetable_data)
         
         conn.commit()
         conn.close()
@@ -643,33 +417,39 @@ def generate_ai_timetable():
         return jsonify({'error': str(e)}), 500
 
 @enhanced_admin_bp.route('/timetables', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_generated_timetables():
     """Get generated timetables"""
     try:
-        current_user_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
+        user_data = current_user()
         
-        cursor.execute('''
-            SELECT gt.*, u.name as generated_by_name
-            FROM generated_timetables gt
-            JOIN users u ON gt.generated_by = u.id
-            WHERE gt.department_id = ?
-            ORDER BY gt.created_at DESC
-        ''', (user_data['department_id'],))
-        
-        timetables = cursor.fetchall()
+        rows, pagination = fetch_page(cursor, GENERATED_TIMETABLES, (user_data['department_id'],), request.args)
+        
+        timetables = [dict(row) for row in rows]
+        blobs = get_blobs(cursor, [t['data_hash'] for t in timetables] +
+                          [t['constraints_hash'] for t in timetables])
         conn.close()
         
+        # Rows written before compression still carry their JSON inline
+        for timetable in timetables:
+            data_hash = timetable.pop('data_hash')
+            constraints_hash = timetable.pop('constraints_hash')
+            if data_hash:
+                timetable['timetable_data'] = blobs.get(data_hash)
+            if constraints_hash:
+                timetable['generation_constraints'] = blobs.get(constraints_hash)
+        
         return jsonify({
             'success': True,
-            'timetables': [dict(row) for row in timetables]
+            'timetables': timetables,
+            'pagination': pagination
         })
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
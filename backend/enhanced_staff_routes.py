@@ -1,18 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import sqlite3
+from database import get_db_connection
+from auth_claims import current_user, role_required
+from pagination import PaginationError, fetch_page
+from queries import OPEN_SUBJECT_CHOICE_FORMS_FOR_STAFF, SUBJECT_CHOICE_SUBMISSIONS_BY_STAFF
+from staff_preferences import SOURCE_SUBJECT_CHOICE_FORM, replace_preferences
+from timetable_views import get_entity_view
 import json
 
 staff_bp = Blueprint('enhanced_staff', __name__, url_prefix='/api/enhanced-staff')
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('timetable.db')
-    conn.row_factory = sqlite3.Row
-    return conn
 
 @staff_bp.route('/choice-forms/available', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_available_choice_forms():
     """Get available choice forms for staff"""
     try:
@@ -21,21 +21,10 @@ def get_available_choice_forms():
         cursor = conn.cursor()
         
         # Get user's department
-        cursor.execute('SELECT department_id FROM users WHERE id = ?', (current_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            return jsonify({'error': 'User not found'}), 404
+        user_data = current_user()
         
         # Get available forms
-        cursor.execute('''
-            SELECT scf.*, 
-                   CASE WHEN scs.id IS NOT NULL THEN 1 ELSE 0 END as has_submitted
-            FROM subject_choice_forms scf
-            LEFT JOIN subject_choice_submissions scs ON scf.id = scs.form_id AND scs.staff_id = ?
-            WHERE scf.department_id = ? AND scf.status = 'open'
-            ORDER BY scf.close_date ASC
-        ''', (current_user_id, user_data['department_id']))
+        cursor.execute(OPEN_SUBJECT_CHOICE_FORMS_FOR_STAFF, (current_user_id, user_data['department_id']))
         
         forms = cursor.fetchall()
         conn.close()
@@ -56,31 +45,32 @@ def submit_choice_form(form_id):
         current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if form is still open
-        cursor.execute('SELECT status FROM subject_choice_forms WHERE id = ?', (form_id,))
-        form_data = cursor.fetchone()
-        
-        if not form_data or form_data['status'] != 'open':
-            return jsonify({'error': 'Form is not available for submission'}), 400
-        
-        # Insert or update submission
-        cursor.execute('''
-            INSERT OR REPLACE INTO subject_choice_submissions 
-            (form_id, staff_id, subject_preferences, additional_notes)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            form_id, current_user_id, 
-            json.dumps(data.get('subject_preferences', [])),
-            data.get('additional_notes', '')
-        ))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Preferences submitted successfully'})
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Check if form is still open
+            cursor.execute('SELECT status FROM subject_choice_forms WHERE id = ?', (form_id,))
+            form_data = cursor.fetchone()
+            
+            if not form_data or form_data['status'] != 'open':
+                return jsonify({'error': 'Form is not available for submission'}), 400
+            
+            # Insert or update submission
+            cursor.execute('''
+                INSERT OR REPLACE INTO subject_choice_submissions 
+                (form_id, staff_id, subject_preferences, additional_notes)
+                VALUES (?, ?, ?, ?)
+            ''', (
+                form_id, current_user_id, 
+                json.dumps(data.get('subject_preferences', [])),
+                data.get('additional_notes', '')
+            ))
+            replace_preferences(cursor, current_user_id, SOURCE_SUBJECT_CHOICE_FORM,
+                                data.get('subject_preferences', []), form_id)
+            
+            conn.commit()
+            
+            return jsonify({'success': True, 'message': 'Preferences submitted successfully'})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -94,27 +84,23 @@ def get_my_submissions():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT scs.*, scf.title as form_title, scf.status as form_status
-            FROM subject_choice_submissions scs
-            JOIN subject_choice_forms scf ON scs.form_id = scf.id
-            WHERE scs.staff_id = ?
-            ORDER BY scs.submitted_at DESC
-        ''', (current_user_id,))
-        
-        submissions = cursor.fetchall()
+        submissions, pagination = fetch_page(cursor, SUBJECT_CHOICE_SUBMISSIONS_BY_STAFF, (current_user_id,),
+                                             request.args, sort_column='submitted_at')
         conn.close()
         
         return jsonify({
             'success': True,
-            'submissions': [dict(row) for row in submissions]
+            'submissions': [dict(row) for row in submissions],
+            'pagination': pagination
         })
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @staff_bp.route('/my-timetable', methods=['GET'])
-@jwt_required()
+@role_required()
 def get_my_timetable():
     """Get staff's personal timetable"""
     try:
@@ -122,23 +108,13 @@ def get_my_timetable():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get from generated timetables
-        cursor.execute('''
-            SELECT gt.timetable_data
-            FROM generated_timetables gt
-            JOIN users u ON gt.department_id = u.department_id
-            WHERE u.id = ? AND gt.timetable_type = 'staff' AND gt.status = 'approved'
-            ORDER BY gt.created_at DESC
-            LIMIT 1
-        ''', (current_user_id,))
-        
-        timetable_data = cursor.fetchone()
+        user_data = current_user()
         
-        if timetable_data:
-            timetable_json = json.loads(timetable_data['timetable_data'])
-            staff_timetable = timetable_json.get(str(current_user_id), {})
-        else:
-            staff_timetable = {}
+        # Only this staff member's entry of the latest approved staff view
+        staff_timetable = {}
+        if user_data:
+            staff_timetable = get_entity_view(cursor, user_data['department_id'], 'staff',
+                                              current_user_id) or {}
         
         conn.close()
         
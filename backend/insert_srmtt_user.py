@@ -1,5 +1,5 @@
 # insert_srmtt_user.py
-import sqlite3
+from database import get_db_connection
 from werkzeug.security import generate_password_hash
 
 DB_PATH = "timetable.db"
@@ -8,7 +8,7 @@ PASSWORD = "srmtt123"
 
 hashed_password = generate_password_hash(PASSWORD)
 
-conn = sqlite3.connect(DB_PATH)
+conn = get_db_connection(DB_PATH, row_factory=None)
 cursor = conn.cursor()
 
 # Optional: Delete if user already exists
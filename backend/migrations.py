@@ -0,0 +1,1033 @@
+# Versioned schema migrations
+#
+# The schema used to be created by init_db() / init_enhanced_tables() /
+# init_enhancement_tables() on every import. It is now applied once per
+# database by this runner, which records each applied migration in
+# schema_version. Every migration runs in its own BEGIN IMMEDIATE
+# transaction, so concurrent runners (several workers, a deploy script)
+# serialize on SQLite's write lock and each migration is applied exactly once.
+#
+#   python -m migrations --db timetable.db            # apply pending migrations
+#   python -m migrations --db timetable.db status     # show applied / pending
+#
+# Add new migrations to the end of MIGRATIONS; never edit or reorder applied ones.
+# The schema is defined only here: each migration carries its own DDL, index
+# list and backfill, so no module can change what an applied migration did.
+# Schema changes go in a new migration.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+from werkzeug.security import generate_password_hash
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _core_schema(cursor):
+    """Users, departments, academic data, timetables, notifications, queries, credentials"""
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            employee_id TEXT UNIQUE NOT NULL,
+            role TEXT NOT NULL CHECK (role IN ('main_admin', 'dept_admin', 'staff')),
+            department_id INTEGER,
+            college TEXT,
+            programme TEXT,
+            type TEXT,
+            contact_number TEXT,
+            staff_role TEXT CHECK (staff_role IN ('assistant_professor', 'associate_professor', 'professor', 'hod')),
+            subjects_selected TEXT,
+            subjects_locked BOOLEAN DEFAULT FALSE,
+            is_active BOOLEAN DEFAULT TRUE,
+            approval_status TEXT DEFAULT 'pending' CHECK (approval_status IN ('pending', 'approved', 'rejected')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Departments table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            code TEXT UNIQUE NOT NULL,
+            college TEXT NOT NULL,
+            programme TEXT NOT NULL CHECK (programme IN ('UG', 'PG')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Subjects table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS subjects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            code TEXT NOT NULL,
+            department_id INTEGER NOT NULL,
+            credits INTEGER DEFAULT 3,
+            hours INTEGER DEFAULT 3,
+            type TEXT DEFAULT 'Core' CHECK (type IN ('Core', 'Elective', 'Skill', 'CDC')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Classes table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            section TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            department_id INTEGER NOT NULL,
+            strength INTEGER DEFAULT 60,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Classrooms table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classrooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            capacity INTEGER NOT NULL,
+            department_id INTEGER NOT NULL,
+            type TEXT DEFAULT 'Classroom' CHECK (type IN ('Classroom', 'Lab')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Choice forms table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS choice_forms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            department_id INTEGER NOT NULL,
+            subjects_data TEXT, -- JSON array of subjects with options
+            open_date TIMESTAMP NOT NULL,
+            close_date TIMESTAMP NOT NULL,
+            status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'open', 'closed')),
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Choice submissions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS choice_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            form_id INTEGER NOT NULL,
+            staff_id INTEGER NOT NULL,
+            subject_preferences TEXT, -- JSON array of selected subjects
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (form_id) REFERENCES choice_forms (id),
+            FOREIGN KEY (staff_id) REFERENCES users (id),
+            UNIQUE(form_id, staff_id)
+        )
+    ''')
+
+    # Timetables table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            time_slot TEXT NOT NULL,
+            subject_id INTEGER NOT NULL,
+            staff_id INTEGER NOT NULL,
+            classroom_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (subject_id) REFERENCES subjects (id),
+            FOREIGN KEY (staff_id) REFERENCES users (id),
+            FOREIGN KEY (classroom_id) REFERENCES classrooms (id)
+        )
+    ''')
+
+    # Notifications table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            sender_id INTEGER NOT NULL,
+            recipient_type TEXT NOT NULL CHECK (recipient_type IN ('staff', 'dept_admin', 'main_admin', 'all')),
+            department_id INTEGER,
+            is_read BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (sender_id) REFERENCES users (id),
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Queries table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            sender_id INTEGER NOT NULL,
+            recipient_id INTEGER,
+            priority TEXT DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
+            status TEXT DEFAULT 'open' CHECK (status IN ('open', 'in_progress', 'resolved')),
+            response TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP,
+            FOREIGN KEY (sender_id) REFERENCES users (id),
+            FOREIGN KEY (recipient_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Credentials export table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS credentials_export (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            plain_password TEXT NOT NULL,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            exported BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _default_main_admin(cursor):
+    """Seed the default main admin account if it does not exist"""
+    cursor.execute('SELECT id FROM users WHERE email = ?', ('srmtt@srmist.edu.in',))
+    if not cursor.fetchone():
+        password_hash = generate_password_hash('mcs2024')
+        cursor.execute('''
+            INSERT INTO users (name, email, password_hash, username, employee_id, role, approval_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ('Main Administrator', 'srmtt@srmist.edu.in', password_hash, 'mainadmin', 'ADMIN001', 'main_admin', 'approved'))
+
+
+def _admin_enhancement_tables(cursor):
+    """Syllabus uploads and timetable generation logs (admin_enhancements)"""
+    # Syllabus uploads table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS syllabus_uploads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            original_filename TEXT NOT NULL,
+            department_id INTEGER,
+            uploaded_by INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+            reviewed_by INTEGER,
+            review_notes TEXT,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            reviewed_at TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (uploaded_by) REFERENCES users (id),
+            FOREIGN KEY (reviewed_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Timetable generation logs table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            generation_type TEXT NOT NULL,
+            generated_by INTEGER NOT NULL,
+            status TEXT DEFAULT 'completed' CHECK (status IN ('completed', 'failed', 'in_progress')),
+            entries_count INTEGER DEFAULT 0,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (generated_by) REFERENCES users (id)
+        )
+    ''')
+
+
+def _unify_notifications(cursor):
+    """Rebuild notifications created with the old admin_enhancements schema
+
+    That schema had created_by instead of sender_id and no department_id or
+    is_read columns; rows are carried over with created_by as the sender.
+    """
+    cursor.execute('PRAGMA table_info(notifications)')
+    columns = {row[1] for row in cursor.fetchall()}
+    if 'sender_id' in columns:
+        return
+
+    cursor.execute('ALTER TABLE notifications RENAME TO notifications_old')
+    cursor.execute('''
+        CREATE TABLE notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            sender_id INTEGER NOT NULL,
+            recipient_type TEXT NOT NULL CHECK (recipient_type IN ('staff', 'dept_admin', 'main_admin', 'all')),
+            department_id INTEGER,
+            is_read BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (sender_id) REFERENCES users (id),
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO notifications (id, title, message, sender_id, recipient_type, created_at)
+        SELECT id, title, message, created_by, recipient_type, created_at FROM notifications_old
+    ''')
+    cursor.execute('DROP TABLE notifications_old')
+
+
+def _enhanced_admin_tables(cursor):
+    """Registration requests, constraints, choice forms, queries and generated timetables"""
+    # Staff registration requests table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS staff_registration_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            employee_id TEXT NOT NULL,
+            email TEXT NOT NULL,
+            department_id INTEGER NOT NULL,
+            staff_role TEXT NOT NULL,
+            contact_number TEXT,
+            requested_by INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+            approved_by INTEGER,
+            credentials_generated BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            approved_at TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (requested_by) REFERENCES users (id),
+            FOREIGN KEY (approved_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Enhanced constraints table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enhanced_constraints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            max_subjects INTEGER NOT NULL DEFAULT 1,
+            max_hours_per_week INTEGER NOT NULL DEFAULT 8,
+            subject_types TEXT, -- JSON array of allowed subject types
+            lab_faculty_required INTEGER DEFAULT 1,
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Subject choice forms table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS subject_choice_forms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            open_date TIMESTAMP NOT NULL,
+            close_date TIMESTAMP NOT NULL,
+            status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'open', 'closed')),
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Subject choices submissions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS subject_choice_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            form_id INTEGER NOT NULL,
+            staff_id INTEGER NOT NULL,
+            subject_preferences TEXT, -- JSON array of subject IDs in preference order
+            additional_notes TEXT,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (form_id) REFERENCES subject_choice_forms (id),
+            FOREIGN KEY (staff_id) REFERENCES users (id),
+            UNIQUE(form_id, staff_id)
+        )
+    ''')
+
+    # Department queries table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS department_queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            priority TEXT DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
+            status TEXT DEFAULT 'open' CHECK (status IN ('open', 'in_progress', 'resolved')),
+            created_by INTEGER NOT NULL,
+            assigned_to INTEGER,
+            resolved_by INTEGER,
+            resolution_notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resolved_at TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (created_by) REFERENCES users (id),
+            FOREIGN KEY (assigned_to) REFERENCES users (id),
+            FOREIGN KEY (resolved_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Timetable configurations table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_configurations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            period_duration INTEGER DEFAULT 60, -- minutes
+            periods_per_day INTEGER DEFAULT 7,
+            college_start_time TEXT DEFAULT '09:00',
+            college_end_time TEXT DEFAULT '17:00',
+            break_times TEXT, -- JSON array of break times
+            working_days TEXT DEFAULT '["Monday","Tuesday","Wednesday","Thursday","Friday"]',
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+
+    # Generated timetables table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generated_timetables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            timetable_type TEXT NOT NULL CHECK (timetable_type IN ('student', 'staff', 'classroom', 'lab')),
+            timetable_data TEXT, -- JSON data
+            status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'approved', 'rejected')),
+            generated_by INTEGER NOT NULL,
+            approved_by INTEGER,
+            generation_constraints TEXT, -- JSON of constraints used
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            approved_at TIMESTAMP,
+            FOREIGN KEY (department_id) REFERENCES departments (id),
+            FOREIGN KEY (generated_by) REFERENCES users (id),
+            FOREIGN KEY (approved_by) REFERENCES users (id)
+        )
+    ''')
+
+
+def _create_indexes(cursor, indexes):
+    """Create `indexes` (name, table, columns) whose table and columns exist
+
+    Each migration passes its own frozen list; db_indexes.INDEXES describes
+    the current schema and is not used here, so editing it cannot change
+    what an applied migration did.
+    """
+    for name, table, columns in indexes:
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in cursor.fetchall()}
+        if set(columns) <= existing:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+
+
+def _hot_path_indexes(cursor):
+    _create_indexes(cursor, [
+        ('idx_users_department_role_status', 'users', ('department_id', 'role', 'approval_status')),
+        ('idx_users_role_status', 'users', ('role', 'approval_status', 'created_at')),
+        ('idx_users_approval_status', 'users', ('approval_status',)),
+        ('idx_subjects_department', 'subjects', ('department_id', 'name')),
+        ('idx_classes_department', 'classes', ('department_id', 'year', 'section')),
+        ('idx_classrooms_department', 'classrooms', ('department_id', 'name')),
+        ('idx_timetables_department', 'timetables', ('department_id', 'day', 'time_slot')),
+        ('idx_timetables_staff', 'timetables', ('staff_id', 'day', 'time_slot')),
+        ('idx_timetables_class', 'timetables', ('class_id',)),
+        ('idx_choice_forms_department', 'choice_forms', ('department_id', 'status')),
+        ('idx_choice_submissions_staff', 'choice_submissions', ('staff_id',)),
+        ('idx_notifications_recipient', 'notifications', ('recipient_type', 'department_id', 'created_at')),
+        ('idx_notifications_created', 'notifications', ('created_at',)),
+        ('idx_credentials_export_user', 'credentials_export', ('user_id', 'exported')),
+        ('idx_credentials_export_pending', 'credentials_export', ('exported', 'generated_at')),
+        ('idx_generated_timetables_lookup', 'generated_timetables',
+         ('department_id', 'timetable_type', 'status', 'created_at')),
+        ('idx_generated_timetables_department', 'generated_timetables', ('department_id', 'created_at')),
+        ('idx_subject_choice_forms_department', 'subject_choice_forms', ('department_id', 'status')),
+        ('idx_subject_choice_submissions_staff', 'subject_choice_submissions', ('staff_id', 'submitted_at')),
+        ('idx_enhanced_constraints_department', 'enhanced_constraints', ('department_id', 'created_at')),
+        ('idx_timetable_configurations_department', 'timetable_configurations', ('department_id',)),
+        ('idx_department_queries_department', 'department_queries', ('department_id', 'created_at')),
+        ('idx_syllabus_uploads_status', 'syllabus_uploads', ('status', 'uploaded_at')),
+    ])
+
+
+def _timetable_slot_indexes(cursor):
+    """Integer day/period columns so timetables sort in week order straight from an index"""
+    cursor.execute('ALTER TABLE timetables ADD COLUMN day_idx INTEGER')
+    cursor.execute('ALTER TABLE timetables ADD COLUMN period_idx INTEGER')
+
+    # Unknown labels stay NULL
+    cursor.execute('''
+        UPDATE timetables
+        SET day_idx = CASE day
+                WHEN 'Monday' THEN 0 WHEN 'Tuesday' THEN 1 WHEN 'Wednesday' THEN 2
+                WHEN 'Thursday' THEN 3 WHEN 'Friday' THEN 4
+            END,
+            period_idx = CASE time_slot
+                WHEN '9:00-10:00' THEN 0 WHEN '10:00-11:00' THEN 1 WHEN '11:15-12:15' THEN 2
+                WHEN '12:15-1:15' THEN 3 WHEN '2:15-3:15' THEN 4 WHEN '3:15-4:15' THEN 5
+                WHEN '4:30-5:30' THEN 6
+            END
+    ''')
+
+    # Superseded by the department/staff indexes on (day_idx, period_idx)
+    cursor.execute('DROP INDEX IF EXISTS idx_timetables_department')
+    cursor.execute('DROP INDEX IF EXISTS idx_timetables_staff')
+    _create_indexes(cursor, [
+        ('idx_timetables_department_slot', 'timetables', ('department_id', 'day_idx', 'period_idx')),
+        ('idx_timetables_staff_slot', 'timetables', ('staff_id', 'day_idx', 'period_idx')),
+        ('idx_timetables_classroom_slot', 'timetables', ('classroom_id', 'day_idx', 'period_idx')),
+    ])
+
+
+def _legacy_subject_ids(raw) -> List[int]:
+    # Subject IDs, in order, from a JSON list, comma string or list of IDs/dicts
+    if raw is None or raw == '':
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raw = raw.split(',')
+    if not isinstance(raw, (list, tuple)):
+        raw = [raw]
+
+    subject_ids = []
+    for item in raw:
+        if isinstance(item, dict):
+            item = item.get('subject_id', item.get('id'))
+        try:
+            subject_id = int(str(item).strip())
+        except (TypeError, ValueError):
+            continue
+        if subject_id not in subject_ids:
+            subject_ids.append(subject_id)
+    return subject_ids
+
+
+def _staff_subject_preference(cursor):
+    """One row per (staff, subject) eligibility, backfilled from the JSON/CSV columns"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS staff_subject_preference (
+            staff_id INTEGER NOT NULL,
+            subject_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            form_id INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (staff_id, source, form_id, subject_id),
+            FOREIGN KEY (staff_id) REFERENCES users (id)
+        )
+    ''')
+    _create_indexes(cursor, [
+        ('idx_staff_subject_preference_subject', 'staff_subject_preference', ('subject_id', 'source', 'staff_id')),
+    ])
+
+    rows = []
+    cursor.execute('SELECT form_id, staff_id, subject_preferences FROM choice_submissions')
+    rows += [(staff_id, 'choice_form', form_id or 0, raw) for form_id, staff_id, raw in cursor.fetchall()]
+    cursor.execute('SELECT form_id, staff_id, subject_preferences FROM subject_choice_submissions')
+    rows += [(staff_id, 'subject_choice_form', form_id or 0, raw) for form_id, staff_id, raw in cursor.fetchall()]
+    cursor.execute("SELECT id, subjects_selected FROM users WHERE subjects_selected IS NOT NULL AND subjects_selected != ''")
+    rows += [(staff_id, 'selection', 0, raw) for staff_id, raw in cursor.fetchall()]
+    for staff_id, source, form_id, raw in rows:
+        cursor.execute('''
+            DELETE FROM staff_subject_preference WHERE staff_id = ? AND source = ? AND form_id = ?
+        ''', (staff_id, source, form_id))
+        cursor.executemany('''
+            INSERT INTO staff_subject_preference (staff_id, subject_id, rank, source, form_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(staff_id, subject_id, rank, source, form_id)
+              for rank, subject_id in enumerate(_legacy_subject_ids(raw), 1)])
+
+
+def _generated_timetable_entities(cursor):
+    """Per-entity rows of generated views, so one staff schedule is one primary-key read"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generated_timetable_entities (
+            timetable_id INTEGER NOT NULL,
+            entity_key TEXT NOT NULL,
+            view_data TEXT NOT NULL, -- JSON of this entity's view
+            PRIMARY KEY (timetable_id, entity_key),
+            FOREIGN KEY (timetable_id) REFERENCES generated_timetables (id)
+        )
+    ''')
+
+    cursor.execute('SELECT id, timetable_data FROM generated_timetables')
+    for timetable_id, data in cursor.fetchall():
+        try:
+            view = json.loads(data) if data else {}
+        except ValueError:
+            continue
+        if isinstance(view, dict):
+            cursor.execute('DELETE FROM generated_timetable_entities WHERE timetable_id = ?', (timetable_id,))
+            cursor.executemany('''
+                INSERT INTO generated_timetable_entities (timetable_id, entity_key, view_data)
+                VALUES (?, ?, ?)
+            ''', [(timetable_id, str(key), json.dumps(value)) for key, value in view.items()])
+
+
+def _timetable_blobs(cursor):
+    """Move generated timetable JSON into compressed, content-addressed blobs"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_blobs (
+            hash TEXT PRIMARY KEY, -- SHA-256 of the uncompressed text
+            data BLOB NOT NULL, -- zlib-compressed UTF-8 text
+            size INTEGER NOT NULL -- uncompressed size in bytes
+        )
+    ''')
+    cursor.execute('ALTER TABLE generated_timetables ADD COLUMN data_hash TEXT')
+    cursor.execute('ALTER TABLE generated_timetables ADD COLUMN constraints_hash TEXT')
+
+    def put(text):
+        if text is None:
+            return None
+        raw = text.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        cursor.execute('INSERT OR IGNORE INTO timetable_blobs (hash, data, size) VALUES (?, ?, ?)',
+                       (digest, zlib.compress(raw, 6), len(raw)))
+        return digest
+
+    cursor.execute('SELECT id, timetable_data, generation_constraints FROM generated_timetables')
+    for timetable_id, data, constraints in cursor.fetchall():
+        cursor.execute('''
+            UPDATE generated_timetables
+            SET data_hash = ?, constraints_hash = ?, timetable_data = NULL, generation_constraints = NULL
+            WHERE id = ?
+        ''', (put(data), put(constraints), timetable_id))
+    _create_indexes(cursor, [
+        ('idx_generated_timetables_data_hash', 'generated_timetables', ('data_hash',)),
+        ('idx_generated_timetables_constraints_hash', 'generated_timetables', ('constraints_hash',)),
+    ])
+
+
+def _analytics_counters(cursor):
+    """Trigger-maintained analytics counts, seeded from the current tables"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            departments INTEGER NOT NULL DEFAULT 0,
+            staff INTEGER NOT NULL DEFAULT 0,
+            dept_admins INTEGER NOT NULL DEFAULT 0,
+            pending_users INTEGER NOT NULL DEFAULT 0,
+            pending_credentials INTEGER NOT NULL DEFAULT 0,
+            notifications INTEGER NOT NULL DEFAULT 0,
+            timetable_logs INTEGER NOT NULL DEFAULT 0,
+            pending_syllabus INTEGER NOT NULL DEFAULT 0,
+            timetable_departments INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO analytics_counters (id) VALUES (1)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_departments (
+            department_id INTEGER PRIMARY KEY
+        )
+    ''')
+
+    # (table, {counter: predicate over the row as {row}}, columns the predicates read)
+    counted = [
+        ('departments', {'departments': '1'}, ()),
+        ('users', {'staff': "{row}.role = 'staff'", 'dept_admins': "{row}.role = 'dept_admin'",
+                   'pending_users': "{row}.approval_status = 'pending'"}, ('approval_status', 'role')),
+        ('credentials_export', {'pending_credentials': '{row}.exported = FALSE'}, ('exported',)),
+        ('notifications', {'notifications': '1'}, ()),
+        ('timetable_logs', {'timetable_logs': '1'}, ()),
+        ('syllabus_uploads', {'pending_syllabus': "{row}.status = 'pending'"}, ('status',)),
+    ]
+
+    def delta(predicate, row):
+        return f"(CASE WHEN {predicate.format(row=row)} THEN 1 ELSE 0 END)"
+
+    for table, counters, watched in counted:
+        for event, row, sign in (('INSERT', 'NEW', '+'), ('DELETE', 'OLD', '-')):
+            assignments = ', '.join(f'{name} = {name} {sign} {delta(predicate, row)}'
+                                    for name, predicate in counters.items())
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_counters_{event.lower()}')
+            cursor.execute(f'''
+                CREATE TRIGGER trg_{table}_counters_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE analytics_counters SET {assignments} WHERE id = 1;
+                END
+            ''')
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_counters_update')
+        if watched:
+            assignments = ', '.join(f"{name} = {name} + {delta(predicate, 'NEW')} - {delta(predicate, 'OLD')}"
+                                    for name, predicate in counters.items())
+            cursor.execute(f'''
+                CREATE TRIGGER trg_{table}_counters_update
+                AFTER UPDATE OF {', '.join(watched)} ON {table}
+                BEGIN
+                    UPDATE analytics_counters SET {assignments} WHERE id = 1;
+                END
+            ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS trg_timetables_counters_insert')
+    cursor.execute('''
+        CREATE TRIGGER trg_timetables_counters_insert
+        AFTER INSERT ON timetables
+        WHEN NOT EXISTS (SELECT 1 FROM timetable_departments WHERE department_id = NEW.department_id)
+        BEGIN
+            INSERT INTO timetable_departments (department_id) VALUES (NEW.department_id);
+            UPDATE analytics_counters SET timetable_departments = timetable_departments + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_timetables_counters_delete')
+    cursor.execute('''
+        CREATE TRIGGER trg_timetables_counters_delete
+        AFTER DELETE ON timetables
+        WHEN NOT EXISTS (SELECT 1 FROM timetables WHERE department_id = OLD.department_id)
+        BEGIN
+            DELETE FROM timetable_departments WHERE department_id = OLD.department_id;
+            UPDATE analytics_counters SET timetable_departments = timetable_departments - changes() WHERE id = 1;
+        END
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_timetables_counters_update')
+    cursor.execute('''
+        CREATE TRIGGER trg_timetables_counters_update
+        AFTER UPDATE OF department_id ON timetables
+        WHEN NEW.department_id IS NOT OLD.department_id
+        BEGIN
+            INSERT OR IGNORE INTO timetable_departments (department_id) VALUES (NEW.department_id);
+            UPDATE analytics_counters SET timetable_departments = timetable_departments + changes() WHERE id = 1;
+            DELETE FROM timetable_departments
+            WHERE department_id = OLD.department_id
+              AND NOT EXISTS (SELECT 1 FROM timetables WHERE department_id = OLD.department_id);
+            UPDATE analytics_counters SET timetable_departments = timetable_departments - changes() WHERE id = 1;
+        END
+    ''')
+
+    cursor.execute('DELETE FROM timetable_departments')
+    cursor.execute('INSERT INTO timetable_departments (department_id) SELECT DISTINCT department_id FROM timetables')
+    cursor.execute('''
+        UPDATE analytics_counters SET
+            departments = (SELECT COUNT(*) FROM departments),
+            staff = (SELECT COUNT(*) FROM users WHERE users.role = 'staff'),
+            dept_admins = (SELECT COUNT(*) FROM users WHERE users.role = 'dept_admin'),
+            pending_users = (SELECT COUNT(*) FROM users WHERE users.approval_status = 'pending'),
+            pending_credentials = (SELECT COUNT(*) FROM credentials_export WHERE credentials_export.exported = FALSE),
+            notifications = (SELECT COUNT(*) FROM notifications),
+            timetable_logs = (SELECT COUNT(*) FROM timetable_logs),
+            pending_syllabus = (SELECT COUNT(*) FROM syllabus_uploads WHERE syllabus_uploads.status = 'pending'),
+            timetable_departments = (SELECT COUNT(*) FROM timetable_departments)
+        WHERE id = 1
+    ''')
+
+
+def _pagination_indexes(cursor):
+    _create_indexes(cursor, [
+        ('idx_syllabus_uploads_uploaded', 'syllabus_uploads', ('uploaded_at',)),
+        ('idx_timetable_logs_generated', 'timetable_logs', ('generated_at',)),
+        ('idx_staff_registration_requests_created', 'staff_registration_requests', ('created_at',)),
+        ('idx_department_queries_created', 'department_queries', ('created_at',)),
+    ])
+
+
+def _credential_jobs(cursor):
+    """Background credential generation jobs, readable from every worker process"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS credential_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            total INTEGER NOT NULL,
+            generated INTEGER,
+            error TEXT,
+            created_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+    _create_indexes(cursor, [
+        ('idx_credential_jobs_status', 'credential_jobs', ('status', 'created_at')),
+    ])
+
+
+def _token_versions(cursor):
+    """users.token_version and its change log, bumped by trigger on role/department/status changes"""
+    cursor.execute('ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS token_version_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_users_token_version_update')
+    cursor.execute('''
+        CREATE TRIGGER trg_users_token_version_update
+        AFTER UPDATE OF role, department_id, approval_status, is_active ON users
+        WHEN NEW.role IS NOT OLD.role OR NEW.department_id IS NOT OLD.department_id
+          OR NEW.approval_status IS NOT OLD.approval_status OR NEW.is_active IS NOT OLD.is_active
+        BEGIN
+            UPDATE users SET token_version = OLD.token_version + 1 WHERE id = NEW.id;
+            INSERT INTO token_version_log (user_id, version) VALUES (NEW.id, OLD.token_version + 1);
+        END
+    ''')
+    # A deleted user is logged at version -1, which no token carries
+    cursor.execute('DROP TRIGGER IF EXISTS trg_users_token_version_delete')
+    cursor.execute('''
+        CREATE TRIGGER trg_users_token_version_delete
+        AFTER DELETE ON users
+        BEGIN
+            INSERT INTO token_version_log (user_id, version) VALUES (OLD.id, -1);
+        END
+    ''')
+
+
+def _principal_change_log(cursor):
+    """Log profile and department name changes to token_version_log for the principal cache"""
+    cursor.execute('DROP TRIGGER IF EXISTS trg_users_principal_update')
+    cursor.execute('''
+        CREATE TRIGGER trg_users_principal_update
+        AFTER UPDATE OF name, email, staff_role, subjects_selected, subjects_locked, username, employee_id ON users
+        WHEN NEW.name IS NOT OLD.name OR NEW.email IS NOT OLD.email OR NEW.staff_role IS NOT OLD.staff_role
+          OR NEW.subjects_selected IS NOT OLD.subjects_selected OR NEW.subjects_locked IS NOT OLD.subjects_locked
+          OR NEW.username IS NOT OLD.username OR NEW.employee_id IS NOT OLD.employee_id
+        BEGIN
+            INSERT INTO token_version_log (user_id, version)
+            VALUES (NEW.id, (SELECT token_version FROM users WHERE id = NEW.id));
+        END
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_departments_principal_update')
+    cursor.execute('''
+        CREATE TRIGGER trg_departments_principal_update
+        AFTER UPDATE OF name ON departments
+        WHEN NEW.name IS NOT OLD.name
+        BEGIN
+            INSERT INTO token_version_log (user_id, version)
+            SELECT id, token_version FROM users WHERE department_id = NEW.id;
+        END
+    ''')
+
+
+def _revoked_tokens(cursor):
+    """jti of access tokens revoked by logout, kept until the token expires"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT NOT NULL UNIQUE,
+            user_id INTEGER,
+            expires_at INTEGER NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    _create_indexes(cursor, [
+        ('idx_revoked_tokens_expires', 'revoked_tokens', ('expires_at',)),
+    ])
+
+
+def _refresh_tokens(cursor):
+    """Hashed, single-use refresh tokens grouped into rotation families"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token_hash TEXT NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            family TEXT NOT NULL,
+            expires_at INTEGER NOT NULL,
+            used_at INTEGER,
+            revoked INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    _create_indexes(cursor, [
+        ('idx_refresh_tokens_family', 'refresh_tokens', ('family',)),
+        ('idx_refresh_tokens_expires', 'refresh_tokens', ('expires_at',)),
+    ])
+
+
+def _timetable_entity_views(cursor):
+    """Staff entity views keyed by view hash and stored as blobs, replacing generated_timetable_entities"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_entity_views (
+            data_hash TEXT NOT NULL, -- hash of the whole view in timetable_blobs
+            entity_key TEXT NOT NULL,
+            view_hash TEXT NOT NULL, -- hash of this entity's JSON in timetable_blobs
+            PRIMARY KEY (data_hash, entity_key)
+        ) WITHOUT ROWID
+    ''')
+    _create_indexes(cursor, [
+        ('idx_timetable_entity_views_view_hash', 'timetable_entity_views', ('view_hash',)),
+    ])
+
+    def put(text):
+        raw = text.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        cursor.execute('INSERT OR IGNORE INTO timetable_blobs (hash, data, size) VALUES (?, ?, ?)',
+                       (digest, zlib.compress(raw, 6), len(raw)))
+        return digest
+
+    # Only the staff view is read per entity
+    cursor.execute('''
+        SELECT DISTINCT b.hash, b.data
+        FROM generated_timetables gt
+        JOIN timetable_blobs b ON b.hash = gt.data_hash
+        WHERE gt.timetable_type = 'staff'
+    ''')
+    for data_hash, data in cursor.fetchall():
+        try:
+            view = json.loads(zlib.decompress(data).decode('utf-8'))
+        except ValueError:
+            continue
+        if isinstance(view, dict):
+            cursor.executemany('''
+                INSERT OR IGNORE INTO timetable_entity_views (data_hash, entity_key, view_hash)
+                VALUES (?, ?, ?)
+            ''', [(data_hash, str(key), put(json.dumps(value))) for key, value in view.items()])
+    cursor.execute('DROP TABLE IF EXISTS generated_timetable_entities')
+
+
+def _credential_job_heartbeat(cursor):
+    """Heartbeat of running credential jobs, so a job whose process died can be failed"""
+    cursor.execute('ALTER TABLE credential_jobs ADD COLUMN heartbeat_at TIMESTAMP')
+
+
+def _background_job_kinds(cursor):
+    """Job kind and JSON result, so staff imports run as credential_jobs too"""
+    cursor.execute("ALTER TABLE credential_jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'credentials'")
+    cursor.execute('ALTER TABLE credential_jobs ADD COLUMN result TEXT')
+
+
+# (version, description, migration); versions are applied in order
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'core schema', _core_schema),
+    (2, 'default main admin', _default_main_admin),
+    (3, 'admin enhancement tables', _admin_enhancement_tables),
+    (4, 'unify notifications schema', _unify_notifications),
+    (5, 'enhanced admin tables', _enhanced_admin_tables),
+    (6, 'hot path indexes', _hot_path_indexes),
+    (7, 'timetables day_idx / period_idx', _timetable_slot_indexes),
+    (8, 'staff_subject_preference', _staff_subject_preference),
+    (9, 'generated_timetable_entities', _generated_timetable_entities),
+    (10, 'compressed timetable blobs', _timetable_blobs),
+    (11, 'analytics counters', _analytics_counters),
+    (12, 'pagination indexes', _pagination_indexes),
+    (13, 'credential generation jobs', _credential_jobs),
+    (14, 'token versions', _token_versions),
+    (15, 'principal change log', _principal_change_log),
+    (16, 'revoked tokens', _revoked_tokens),
+    (17, 'refresh tokens', _refresh_tokens),
+    (18, 'timetable entity views by hash', _timetable_entity_views),
+    (19, 'credential job heartbeat', _credential_job_heartbeat),
+    (20, 'background job kinds', _background_job_kinds),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def applied_versions(conn) -> List[int]:
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if not cursor.fetchone():
+        return []
+    return [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+
+
+def pending_migrations(db_path: Optional[str] = None) -> List[Tuple[int, str]]:
+    """Migrations not yet applied to the database; read-only"""
+    conn = get_db_connection(db_path, row_factory=None)
+    try:
+        applied = set(applied_versions(conn))
+    finally:
+        conn.close()
+    return [(version, description) for version, description, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(db_path: Optional[str] = None, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: all); returns the versions applied"""
+    conn = get_db_connection(db_path, row_factory=None)
+    applied = []
+    try:
+        _ensure_version_table(conn)
+        for version, description, migrate in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            # Take the write lock before checking, so a runner that waited
+            # for another one sees its work and skips the migration
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                    conn.rollback()
+                    continue
+                migrate(conn.cursor())
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                             (version, description))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logger.info("Applied migration %s: %s", version, description)
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+def warn_if_pending(db_path: Optional[str] = None):
+    """Log pending migrations at startup instead of applying them"""
+    try:
+        pending = pending_migrations(db_path)
+    except Exception as e:
+        logger.warning("Could not read schema version: %s", e)
+        return
+    if pending:
+        logger.warning("Database schema is behind by %d migration(s) (%s); run 'python -m migrations'",
+                       len(pending), ', '.join(str(version) for version, _ in pending))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='migrations', description='Apply database schema migrations')
+    parser.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                        help='Path to the SQLite database')
+    parser.add_argument('command', nargs='?', default='upgrade', choices=['upgrade', 'status'])
+    parser.add_argument('--target', type=int, help='Stop after this version')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'status':
+        conn = get_db_connection(args.db, row_factory=None)
+        try:
+            applied = set(applied_versions(conn))
+        finally:
+            conn.close()
+        for version, description, _ in MIGRATIONS:
+            print(f"{'applied' if version in applied else 'pending'}  {version:3d}  {description}")
+        return 0
+
+    applied = upgrade(args.db, args.target)
+    print(f"applied {len(applied)} migration(s)" + (f": {', '.join(map(str, applied))}" if applied else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
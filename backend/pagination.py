@@ -0,0 +1,108 @@
+# Keyset pagination for list endpoints
+#
+# List endpoints used to return every row in one response. fetch_page()
+# returns one page ordered newest first by (sort column, id) and an opaque
+# cursor for the next page. The next page starts strictly after the last row
+# seen, with a (sort, id) < (?, ?) range on the index, instead of an OFFSET
+# that would re-read every skipped row. Rows inserted while a client pages
+# through the list never cause duplicates or gaps.
+#
+# Paging is opt-in: without ?limit= or ?cursor= the endpoint returns the
+# whole list, newest first, as it always did, so existing clients that never
+# follow next_cursor are not cut off at the first page.
+#
+#   GET /api/staff/pending                      # every row
+#   GET /api/staff/pending?limit=50
+#   GET /api/staff/pending?limit=50&cursor=<pagination.next_cursor>
+import base64
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+# Page size for a ?cursor= request without ?limit=
+DEFAULT_PAGE_SIZE = int(os.getenv('PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+
+def decode_cursor(token: str) -> Tuple:
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    return sort_value, row_id
+
+
+def page_args(args) -> Tuple[Optional[int], Optional[Tuple]]:
+    """(limit, decoded cursor or None) from request query arguments; limit None means no paging"""
+    token = args.get('cursor')
+    if args.get('limit') is None and not token:
+        return None, None
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE), decode_cursor(token) if token else None
+
+
+def page_query(query: str, sort_column: str = 'created_at', id_column: str = 'id',
+               after: bool = False, limit: bool = True) -> str:
+    """The SQL fetch_page() runs for `query`: newest first, optionally after a cursor and limited
+
+    Parameters are the query's own, then the cursor's (sort, id) if `after`,
+    then the limit.
+    """
+    keyset = f'WHERE ({sort_column}, {id_column}) < (?, ?)' if after else ''
+    return f'''
+        SELECT * FROM ({query})
+        {keyset}
+        ORDER BY {sort_column} DESC, {id_column} DESC
+        {'LIMIT ?' if limit else ''}
+    '''
+
+
+def fetch_page(cursor, query: str, params: tuple, args, sort_column: str = 'created_at',
+               id_column: str = 'id') -> Tuple[list, Dict]:
+    """One page of `query` (no ORDER BY) newest first, plus its pagination info
+
+    Without a limit or cursor in `args`, every row is returned as one page.
+
+    `sort_column` and `id_column` name columns of the query's result. The query
+    is wrapped as a subquery, which SQLite flattens, so the keyset range and
+    ORDER BY are served from the underlying table's (sort column) index.
+    """
+    limit, after = page_args(args)
+    if limit is None:
+        cursor.execute(page_query(query, sort_column, id_column, limit=False), tuple(params))
+        rows = cursor.fetchall()
+        return rows, {'limit': None, 'has_more': False, 'next_cursor': None, 'total_estimate': len(rows)}
+
+    page_params = tuple(params) + (tuple(after) if after else ())
+    cursor.execute(page_query(query, sort_column, id_column, after=bool(after)), page_params + (limit + 1,))
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    pagination = {
+        'limit': limit,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(rows[-1][sort_column], rows[-1][id_column]) if has_more else None
+    }
+    # Counted once, on the first page; rows added or removed while paging
+    # make it drift, hence an estimate
+    if after is None:
+        if has_more:
+            cursor.execute(f'SELECT COUNT(*) FROM ({query})', tuple(params))
+            pagination['total_estimate'] = cursor.fetchone()[0]
+        else:
+            pagination['total_estimate'] = len(rows)
+    return rows, pagination
@@ -0,0 +1,171 @@
+# Multi-objective timetable generation
+#
+# Runs weighted solver variants in parallel processes and keeps the
+# non-dominated timetables, so admins can choose their own trade-off between
+# staff workload balance, student gaps and room utilization.
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from timetable_generator import AITimetableGenerator
+from timetable_model import CompactTimetable, DepartmentModel
+
+# Bounds of the time budget the route accepts, in seconds; below the minimum
+# no variant gets through a single solve
+MIN_TIME_BUDGET = 1.0
+MAX_TIME_BUDGET = 60.0
+
+# Objectives, all minimised
+OBJECTIVES = ('unassigned', 'workload_imbalance', 'student_gaps', 'room_waste')
+
+# Weight variants spread over the balance / gaps / rooms simplex
+DEFAULT_VARIANTS = [
+    {'balance': 1.0, 'gaps': 0.0, 'rooms': 0.0},
+    {'balance': 0.0, 'gaps': 1.0, 'rooms': 0.0},
+    {'balance': 0.0, 'gaps': 0.0, 'rooms': 1.0},
+    {'balance': 1.0, 'gaps': 1.0, 'rooms': 0.0},
+    {'balance': 1.0, 'gaps': 0.0, 'rooms': 1.0},
+    {'balance': 0.0, 'gaps': 1.0, 'rooms': 1.0},
+    {'balance': 1.0, 'gaps': 1.0, 'rooms': 1.0},
+    {'balance': 0.5, 'gaps': 0.5, 'rooms': 0.5},
+]
+
+
+def evaluate(timetable: CompactTimetable, unassigned: int) -> Dict:
+    """Compute the objective vector of a solved timetable"""
+    model = timetable.model
+    periods = len(model.time_slots)
+
+    # Workload balance: spread of teaching hours across staff who can teach
+    hours = [0] * len(model.staff_ids)
+    for staff_idx in timetable.staff_idx:
+        hours[staff_idx] += 1
+    imbalance = statistics.pstdev(hours) if hours else 0.0
+
+    # Student gaps: idle periods between a class's first and last session of a day
+    days_used = {}
+    for slot, class_idx in zip(timetable.slot, timetable.class_idx):
+        day_idx, period_idx = divmod(slot, periods)
+        days_used.setdefault((class_idx, day_idx), []).append(period_idx)
+    gaps = sum(max(p) - min(p) + 1 - len(p) for p in days_used.values())
+
+    # Room waste: share of booked seats left empty
+    booked = used = 0
+    for class_idx, room_idx in zip(timetable.class_idx, timetable.room_idx):
+        booked += model.room_capacity[room_idx]
+        used += min(model.classes[model.class_ids[class_idx]]['strength'], model.room_capacity[room_idx])
+    waste = 1 - used / booked if booked else 0.0
+
+    return {
+        'unassigned': unassigned,
+        'workload_imbalance': round(imbalance, 4),
+        'student_gaps': gaps,
+        'room_waste': round(waste, 4)
+    }
+
+
+def dominates(a: Dict, b: Dict) -> bool:
+    """True if objective vector `a` is no worse than `b` everywhere and better somewhere"""
+    return (all(a[k] <= b[k] for k in OBJECTIVES) and
+            any(a[k] < b[k] for k in OBJECTIVES))
+
+
+def pareto_front(candidates: List[Dict], max_size: Optional[int] = None) -> List[Dict]:
+    """Keep the candidates whose objective vectors are not dominated by any other"""
+    front = []
+    for candidate in candidates:
+        objectives = candidate['objectives']
+        if any(dominates(other['objectives'], objectives) or other['objectives'] == objectives
+               for other in front):
+            continue
+        front = [other for other in front if not dominates(objectives, other['objectives'])]
+        front.append(candidate)
+
+    front.sort(key=lambda c: tuple(c['objectives'][k] for k in OBJECTIVES))
+    if max_size and len(front) > max_size:
+        # Keep the best solution for each objective, then fill in order
+        keep = {id(min(front, key=lambda c: c['objectives'][k])) for k in OBJECTIVES}
+        extremes = [c for c in front if id(c) in keep]
+        rest = [c for c in front if id(c) not in keep]
+        front = (extremes + rest)[:max_size]
+    return front
+
+
+def _run_variant(data: Dict, weights: Dict, seed: Optional[int], deadline: float,
+                 time_slice: float) -> List[Dict]:
+    """Solve repeatedly with one weight variant for its time slice (process pool worker)"""
+    deadline = min(deadline, time.time() + time_slice)
+    model = DepartmentModel(data['classes'], data['staff_subjects'], data['subjects'], data['classrooms'])
+    candidates = []
+    run = 0
+
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        generator = AITimetableGenerator(
+            seed=None if seed is None else seed + run, time_budget=remaining, weights=weights
+        )
+        solved = generator._solve(model)
+        candidates.append({
+            'weights': weights,
+            'objectives': evaluate(solved, generator.unassigned_count),
+            'solution': solved
+        })
+        candidates = pareto_front(candidates)
+        run += 1
+
+    # Serialize only the survivors
+    return [{
+        'weights': c['weights'],
+        'objectives': c['objectives'],
+        'timetable': c['solution'].to_dicts()
+    } for c in candidates]
+
+
+def generate_pareto_front(data: Dict, time_budget: float = 10.0, workers: int = 4,
+                          variants: Optional[List[Dict]] = None, seed: Optional[int] = None,
+                          max_size: int = 6) -> List[Dict]:
+    """Run weighted variants in parallel and return the non-dominated timetables
+
+    `data` is the output of AITimetableGenerator.load_department_data(). The
+    whole front is computed within `time_budget` seconds of wall time; variants
+    that have not reported back by then are dropped and their worker processes
+    terminated.
+    """
+    if time_budget <= 0:
+        raise ValueError('time_budget must be positive')
+    variants = variants or DEFAULT_VARIANTS
+    started = time.time()
+    # Leave room for serializing and shipping results back to this process
+    deadline = started + time_budget * 0.8
+    workers = max(1, workers)
+    rounds = -(-len(variants) // workers)
+    time_slice = (deadline - started) / rounds
+
+    candidates = []
+    pending = []
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(_run_variant, data, weights,
+                            None if seed is None else seed + 1000 * i, deadline, time_slice)
+            for i, weights in enumerate(variants)
+        ]
+        done, pending = wait(futures, timeout=max(0.0, started + time_budget - time.time()))
+        for future in done:
+            if future.exception() is None:
+                candidates.extend(future.result())
+    finally:
+        # shutdown() forgets the worker processes, so take them first
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            # Variants still running past the budget would keep a CPU busy
+            # after the request has returned
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+    return pareto_front(candidates, max_size=max_size)
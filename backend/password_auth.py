@@ -0,0 +1,153 @@
+# Password hashing and a bounded verification pool for logins
+#
+# A PBKDF2 check costs about a third of a second of CPU. login used to run it
+# on the request thread, so a semester-start login burst occupied every Flask
+# worker thread and all other endpoints queued behind it. Verification now
+# runs on a small dedicated thread pool (hashlib releases the GIL while it
+# hashes). A check is only admitted while a worker is free; otherwise login
+# answers 503 with Retry-After at once, so no request thread is ever parked
+# waiting behind other logins' checks. The hash
+# method is configurable per deployment, and a successful login whose stored
+# hash uses another method is rehashed in the background.
+#
+#   PASSWORD_HASH_METHOD=pbkdf2:sha256:600000   # werkzeug method string
+#   PASSWORD_VERIFY_WORKERS=4                   # concurrent verifications
+#   GET /api/auth/metrics                       # pool counters (main admin)
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Optional
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from database import transaction
+
+logger = logging.getLogger(__name__)
+
+HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}')
+VERIFY_WORKERS = int(os.getenv('PASSWORD_VERIFY_WORKERS', str(os.cpu_count() or 1)))
+VERIFY_TIMEOUT = float(os.getenv('PASSWORD_VERIFY_TIMEOUT', '10'))
+
+
+class VerifierBusy(Exception):
+    """Raised when every verification worker is busy"""
+
+
+def _normalized(method: str) -> str:
+    # generate_password_hash records the iteration count even when the
+    # method string leaves it out
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2' and len(parts) == 2:
+        parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ':'.join(parts)
+
+
+CURRENT_METHOD = _normalized(HASH_METHOD)
+
+
+def hash_password(password: str) -> str:
+    """Hash with the deployment's configured method"""
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    return _normalized(password_hash.split('$', 1)[0]) != CURRENT_METHOD
+
+
+class PasswordVerifier:
+    """Thread pool for password checks that admits work only while a worker is free"""
+
+    def __init__(self, workers: int = VERIFY_WORKERS, timeout: float = VERIFY_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-verify')
+        # One slot per worker: a check that would have to wait is rejected instead
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._counters = {'completed': 0, 'verified': 0, 'rehashed': 0, 'rejected_busy': 0,
+                          'timed_out': 0, 'wait_seconds': 0.0, 'verify_seconds': 0.0}
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters['rejected_busy'] += 1
+            raise VerifierBusy()
+        submitted = time.monotonic()
+
+        def run():
+            started = time.monotonic()
+            with self._lock:
+                self._running += 1
+                self._counters['wait_seconds'] += started - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._counters['completed'] += 1
+                    self._counters['verify_seconds'] += time.monotonic() - started
+                self._slots.release()
+
+        return self._executor.submit(run)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """check_password_hash on the pool; raises VerifierBusy when every worker is busy"""
+        future = self._submit(check_password_hash, password_hash, password)
+        try:
+            valid = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._counters['timed_out'] += 1
+            raise VerifierBusy()
+        with self._lock:
+            self._counters['verified'] += 1
+        return valid
+
+    def rehash_if_needed(self, user_id, password_hash: str, password: str,
+                         db_path: Optional[str] = None):
+        """After a successful login, upgrade an old-method hash in the background"""
+        if not needs_rehash(password_hash):
+            return
+        try:
+            self._submit(self._rehash, user_id, password_hash, password, db_path)
+        except VerifierBusy:
+            # Logins are saturating the pool; the next login will retry
+            pass
+
+    def _rehash(self, user_id, old_hash: str, password: str, db_path: Optional[str]):
+        new_hash = hash_password(password)
+        try:
+            with transaction(db_path, row_factory=None) as conn:
+                # Only replace the hash we verified; a password change wins
+                updated = conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                                       (new_hash, user_id, old_hash)).rowcount
+        except Exception as e:
+            logger.warning("Rehash for user %s failed: %s", user_id, e)
+            return
+        if updated:
+            with self._lock:
+                self._counters['rehashed'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            running = self._running
+        completed = counters['completed'] or 1
+        return {
+            'workers': self.workers,
+            'hash_method': CURRENT_METHOD,
+            'running': running,
+            'verified': counters['verified'],
+            'rehashed': counters['rehashed'],
+            'rejected_busy': counters['rejected_busy'],
+            'timed_out': counters['timed_out'],
+            'avg_wait_ms': round(counters['wait_seconds'] * 1000 / completed, 2),
+            'avg_verify_ms': round(counters['verify_seconds'] * 1000 / completed, 2)
+        }
+
+
+verifier = PasswordVerifier()
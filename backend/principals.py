@@ -0,0 +1,121 @@
+# In-process cache of user principals for /api/auth/verify
+#
+# The frontend calls /api/auth/verify on every page load, and each call read
+# the users row joined with its department. The principal (the user payload
+# verify returns) is now kept in a per-process LRU + TTL cache keyed by user
+# id. Entries are dropped in this process as soon as it writes the user, and
+# in every other worker within TOKEN_SYNC_INTERVAL: triggers (migration 15)
+# log profile changes to token_version_log next to the role/department/status changes
+# already logged there, and TokenVersions hands each logged user id to the
+# cache as it syncs.
+#
+#   PRINCIPAL_CACHE_SIZE=4096   # users kept per process
+#   PRINCIPAL_CACHE_TTL=300     # seconds before an entry is re-read anyway
+#
+#   principal = principal_cache.get(user_id)      # None if missing / inactive / unapproved
+#   principal_cache.invalidate(user_id)           # after this process changed the user
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from auth_claims import token_versions
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', '4096'))
+CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '300'))
+
+PRINCIPAL_QUERY = '''
+    SELECT u.id, u.name, u.email, u.role, u.department_id,
+           u.staff_role, u.subjects_selected, u.subjects_locked, u.username,
+           u.employee_id, d.name as department_name
+    FROM users u
+    LEFT JOIN departments d ON u.department_id = d.id
+    WHERE u.id = ? AND u.is_active = 1 AND u.approval_status = 'approved'
+'''
+
+
+def _principal(row) -> Dict:
+    return {
+        'id': str(row['id']),
+        'name': row['name'],
+        'email': row['email'],
+        'role': row['role'],
+        'department_id': str(row['department_id']) if row['department_id'] else None,
+        'staff_role': row['staff_role'],
+        'subjects_selected': row['subjects_selected'].split(',') if row['subjects_selected'] else [],
+        'subjects_locked': bool(row['subjects_locked']),
+        'username': row['username'],
+        'employee_id': row['employee_id'],
+        'department_name': row['department_name']
+    }
+
+
+class PrincipalCache:
+    """LRU + TTL cache of user id -> verify payload"""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a read that raced one is not stored
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id: int, db_path: Optional[str] = None) -> Optional[Dict]:
+        token_versions.maybe_sync()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and time.monotonic() - entry['loaded_at'] < self.ttl:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return entry['principal']
+            self._misses += 1
+            generation = self._generation
+
+        conn = get_db_connection(db_path)
+        try:
+            row = conn.execute(PRINCIPAL_QUERY, (user_id,)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+
+        principal = _principal(row)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[user_id] = {'principal': principal, 'loaded_at': time.monotonic()}
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Drop one user, or everyone when user_id is None"""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def invalidate_many(self, user_ids: Iterable[int]):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'ttl': self.ttl,
+                    'hits': self._hits, 'misses': self._misses}
+
+
+principal_cache = PrincipalCache()
+token_versions.subscribe(principal_cache.invalidate)
@@ -0,0 +1,254 @@
+# SQL of the hot read paths
+#
+# Each query a route (or the helper it calls) runs against an indexed table
+# is defined once here. The route executes the constant and
+# db_indexes.HOT_QUERIES explains the very same string, so the query plan
+# check cannot drift from what the endpoints actually run. Route modules
+# import Flask and build blueprints; keeping the SQL in its own module lets
+# db_indexes and the tests import it without them.
+#
+# Queries passed to pagination.fetch_page() have no ORDER BY; fetch_page()
+# adds it, and the keyset range, around them.
+
+# GET /api/staff
+STAFF_BY_DEPARTMENT = '''
+    SELECT u.id, u.name, u.email, u.staff_role, u.subjects_selected, u.subjects_locked
+    FROM users u
+    WHERE u.department_id = ? AND u.role = 'staff'
+    ORDER BY u.name
+'''
+
+# GET /api/subjects
+SUBJECTS_BY_DEPARTMENT = '''
+    SELECT id, name, code, credits
+    FROM subjects
+    WHERE department_id = ?
+    ORDER BY name
+'''
+
+# GET /api/classes
+CLASSES_BY_DEPARTMENT = '''
+    SELECT id, name, section, year, strength
+    FROM classes
+    WHERE department_id = ?
+    ORDER BY year, section
+'''
+
+# GET /api/classrooms
+CLASSROOMS_BY_DEPARTMENT = '''
+    SELECT id, name, capacity
+    FROM classrooms
+    WHERE department_id = ?
+    ORDER BY name
+'''
+
+# GET /api/timetables
+DEPARTMENT_TIMETABLE = '''
+    SELECT t.id, t.day, t.time_slot, s.name as subject_name, s.code as subject_code,
+           u.name as staff_name, c.name as classroom_name, t.subject_id, t.staff_id, t.classroom_id
+    FROM timetables t
+    JOIN subjects s ON t.subject_id = s.id
+    JOIN users u ON t.staff_id = u.id
+    JOIN classrooms c ON t.classroom_id = c.id
+    WHERE t.department_id = ?
+    ORDER BY t.day_idx, t.period_idx
+'''
+
+# POST /api/timetable/generate: staff the generator may schedule
+APPROVED_STAFF_BY_DEPARTMENT = '''
+    SELECT id, name, staff_role FROM users
+    WHERE department_id = ? AND role = 'staff' AND approval_status = 'approved'
+'''
+
+# POST /api/timetable/generate: each staff member's latest ranked subjects
+# (staff_preferences.department_preferences); {approval} is '' or APPROVED_ONLY
+DEPARTMENT_PREFERENCES = '''
+    SELECT p.staff_id, p.subject_id
+    FROM users u
+    JOIN staff_subject_preference p ON p.staff_id = u.id AND p.source = ?
+    WHERE u.department_id = ? AND u.role = 'staff'
+          {approval}
+      AND p.form_id = (
+          SELECT MAX(form_id) FROM staff_subject_preference
+          WHERE staff_id = p.staff_id AND source = p.source
+      )
+    ORDER BY p.staff_id, p.rank
+'''
+APPROVED_ONLY = "AND u.approval_status = 'approved'"
+
+# GET /api/choice-forms as staff: open forms and whether they were answered
+OPEN_CHOICE_FORMS_FOR_STAFF = '''
+    SELECT cf.id, cf.title, cf.description, cf.subjects_data, cf.open_date,
+           cf.close_date, cf.status,
+           CASE WHEN cs.id IS NOT NULL THEN 1 ELSE 0 END as has_submitted
+    FROM choice_forms cf
+    LEFT JOIN choice_submissions cs ON cf.id = cs.form_id AND cs.staff_id = ?
+    WHERE cf.department_id = ? AND cf.status = 'open'
+    ORDER BY cf.close_date ASC
+'''
+
+# GET /api/choice-forms as department admin
+CHOICE_FORMS_BY_DEPARTMENT = '''
+    SELECT cf.id, cf.title, cf.description, cf.subjects_data, cf.open_date,
+           cf.close_date, cf.status, cf.created_at,
+           COUNT(cs.id) as submission_count
+    FROM choice_forms cf
+    LEFT JOIN choice_submissions cs ON cf.id = cs.form_id
+    WHERE cf.department_id = ?
+    GROUP BY cf.id
+    ORDER BY cf.created_at DESC
+'''
+
+# GET /api/notifications as main admin
+MAIN_ADMIN_NOTIFICATIONS = '''
+    SELECT n.id, n.title, n.message, n.created_at, n.is_read,
+           u.name as sender_name
+    FROM notifications n
+    JOIN users u ON n.sender_id = u.id
+    WHERE n.recipient_type IN ('main_admin', 'all')
+    ORDER BY n.created_at DESC
+    LIMIT 50
+'''
+
+# GET /api/notifications as department admin or staff; the first parameter
+# is the caller's role
+DEPARTMENT_NOTIFICATIONS = '''
+    SELECT n.id, n.title, n.message, n.created_at, n.is_read,
+           u.name as sender_name
+    FROM notifications n
+    JOIN users u ON n.sender_id = u.id
+    WHERE (n.recipient_type IN (?, 'all') AND
+           (n.department_id = ? OR n.department_id IS NULL))
+    ORDER BY n.created_at DESC
+    LIMIT 50
+'''
+
+# GET /api/staff/pending (paged)
+PENDING_STAFF = '''
+    SELECT u.id, u.name, u.email, u.employee_id, u.staff_role, u.contact_number,
+           u.created_at, d.name as department_name
+    FROM users u
+    LEFT JOIN departments d ON u.department_id = d.id
+    WHERE u.role = 'staff' AND u.approval_status = 'pending'
+'''
+
+# GET /api/credentials/export and /admin/credentials/export
+UNEXPORTED_CREDENTIALS = '''
+    SELECT ce.username, ce.plain_password, u.name, u.email, u.role,
+           d.name as department_name, ce.generated_at
+    FROM credentials_export ce
+    JOIN users u ON ce.user_id = u.id
+    LEFT JOIN departments d ON u.department_id = d.id
+    WHERE ce.exported = FALSE
+    ORDER BY ce.generated_at DESC
+'''
+
+# GET /admin/syllabus/review (paged by uploaded_at)
+SYLLABUS_UPLOADS = '''
+    SELECT su.*, u.name as uploaded_by_name, d.name as department_name,
+           r.name as reviewed_by_name
+    FROM syllabus_uploads su
+    JOIN users u ON su.uploaded_by = u.id
+    LEFT JOIN departments d ON su.department_id = d.id
+    LEFT JOIN users r ON su.reviewed_by = r.id
+'''
+
+# GET /admin/timetables/logs (paged by generated_at)
+TIMETABLE_LOGS = '''
+    SELECT tl.*, d.name as department_name, u.name as generated_by_name
+    FROM timetable_logs tl
+    JOIN departments d ON tl.department_id = d.id
+    JOIN users u ON tl.generated_by = u.id
+'''
+
+# GET /api/enhanced-admin/staff-requests (paged)
+STAFF_REGISTRATION_REQUESTS = '''
+    SELECT sr.*, d.name as department_name, u.name as requested_by_name
+    FROM staff_registration_requests sr
+    JOIN departments d ON sr.department_id = d.id
+    JOIN users u ON sr.requested_by = u.id
+'''
+
+# GET /api/enhanced-admin/constraints for one department
+CONSTRAINTS_BY_DEPARTMENT = '''
+    SELECT ec.*, d.name as department_name
+    FROM enhanced_constraints ec
+    JOIN departments d ON ec.department_id = d.id
+    WHERE ec.department_id = ?
+    ORDER BY ec.created_at DESC
+'''
+
+# GET /api/enhanced-admin/choice-forms
+SUBJECT_CHOICE_FORMS_BY_DEPARTMENT = '''
+    SELECT scf.*, u.name as created_by_name,
+           COUNT(scs.id) as submission_count
+    FROM subject_choice_forms scf
+    JOIN users u ON scf.created_by = u.id
+    LEFT JOIN subject_choice_submissions scs ON scf.id = scs.form_id
+    WHERE scf.department_id = ?
+    GROUP BY scf.id
+    ORDER BY scf.created_at DESC
+'''
+
+# GET /api/enhanced-admin/queries as main admin (paged)
+DEPARTMENT_QUERIES = '''
+    SELECT dq.*, d.name as department_name, u.name as created_by_name
+    FROM department_queries dq
+    JOIN departments d ON dq.department_id = d.id
+    JOIN users u ON dq.created_by = u.id
+'''
+
+# GET /api/enhanced-admin/queries for one department (paged)
+DEPARTMENT_QUERIES_BY_DEPARTMENT = DEPARTMENT_QUERIES + '''
+    WHERE dq.department_id = ?
+'''
+
+# POST /api/enhanced-admin/timetable/generate
+TIMETABLE_CONFIGURATION = 'SELECT * FROM timetable_configurations WHERE department_id = ?'
+STAFF_WITH_SUBJECT_CHOICES = '''
+    SELECT u.*, GROUP_CONCAT(scs.subject_preferences) as preferences
+    FROM users u
+    LEFT JOIN subject_choice_submissions scs ON u.id = scs.staff_id
+    WHERE u.department_id = ? AND u.role = 'staff'
+    GROUP BY u.id
+'''
+
+# GET /api/enhanced-admin/timetables (paged)
+GENERATED_TIMETABLES = '''
+    SELECT gt.*, u.name as generated_by_name
+    FROM generated_timetables gt
+    JOIN users u ON gt.generated_by = u.id
+    WHERE gt.department_id = ?
+'''
+
+# GET /api/enhanced-staff/choice-forms/available
+OPEN_SUBJECT_CHOICE_FORMS_FOR_STAFF = '''
+    SELECT scf.*,
+           CASE WHEN scs.id IS NOT NULL THEN 1 ELSE 0 END as has_submitted
+    FROM subject_choice_forms scf
+    LEFT JOIN subject_choice_submissions scs ON scf.id = scs.form_id AND scs.staff_id = ?
+    WHERE scf.department_id = ? AND scf.status = 'open'
+    ORDER BY scf.close_date ASC
+'''
+
+# GET /api/enhanced-staff/my-submissions (paged by submitted_at)
+SUBJECT_CHOICE_SUBMISSIONS_BY_STAFF = '''
+    SELECT scs.*, scf.title as form_title, scf.status as form_status
+    FROM subject_choice_submissions scs
+    JOIN subject_choice_forms scf ON scs.form_id = scf.id
+    WHERE scs.staff_id = ?
+'''
+
+# GET /api/enhanced-staff/my-timetable: one staff member's view of the
+# department's latest timetable (timetable_views.get_entity_view)
+ENTITY_VIEW = '''
+    SELECT b.data
+    FROM timetable_entity_views v
+    JOIN timetable_blobs b ON b.hash = v.view_hash
+    WHERE v.entity_key = ? AND v.data_hash = (
+        SELECT data_hash FROM generated_timetables
+        WHERE department_id = ? AND timetable_type = ? AND status = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    )
+'''
@@ -0,0 +1,99 @@
+# Rotating refresh tokens
+#
+# Access tokens lived 24 hours and could only be replaced by logging in
+# again, which costs a PBKDF2 verification. Login now also returns an opaque
+# refresh token; POST /api/auth/refresh trades it for a new access token and
+# a new refresh token. Only the SHA-256 of a refresh token is stored. The
+# tokens are 256 random bits, so a fast hash is enough, and renewal is one
+# indexed lookup instead of a password check. That lets access tokens be
+# short-lived (ACCESS_TOKEN_EXPIRES_MINUTES).
+#
+# Each refresh token can be used once. Its replacement joins the same
+# family. If an already-used token comes back after REFRESH_REUSE_GRACE
+# seconds, it was copied: the whole family is revoked and that session has
+# to log in again.
+#
+#   token = issue(user_id)                     # at login
+#   user, token = rotate(token)                # POST /api/auth/refresh
+#   revoke(token)                              # at logout
+import hashlib
+import logging
+import os
+import secrets
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from database import transaction
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRES_DAYS', '14'))
+REUSE_GRACE = int(os.getenv('REFRESH_REUSE_GRACE', '10'))
+
+
+class RefreshTokenError(Exception):
+    """Raised for an unknown, expired, reused or revoked refresh token"""
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _insert(conn, user_id: int, family: str, now: int) -> str:
+    token = secrets.token_urlsafe(32)
+    conn.execute('''
+        INSERT INTO refresh_tokens (token_hash, user_id, family, expires_at) VALUES (?, ?, ?, ?)
+    ''', (_digest(token), user_id, family, now + REFRESH_TOKEN_DAYS * 86400))
+    return token
+
+
+def issue(user_id: int, db_path: Optional[str] = None) -> str:
+    """Start a new refresh token family for a fresh login"""
+    now = int(time.time())
+    with transaction(db_path, row_factory=None) as conn:
+        # Logins keep the table down to tokens that could still be presented
+        conn.execute('DELETE FROM refresh_tokens WHERE expires_at <= ?', (now,))
+        return _insert(conn, user_id, uuid.uuid4().hex, now)
+
+
+def rotate(token: str, db_path: Optional[str] = None) -> Tuple[Dict, str]:
+    """Spend a refresh token; returns the user row for the new access token and its successor"""
+    now = int(time.time())
+    reused = None
+    with transaction(db_path) as conn:
+        row = conn.execute('''
+            SELECT id, user_id, family, expires_at, used_at, revoked FROM refresh_tokens WHERE token_hash = ?
+        ''', (_digest(token),)).fetchone()
+        if not row or row['revoked'] or row['expires_at'] <= now:
+            raise RefreshTokenError('Invalid refresh token')
+
+        # Compare-and-set, so two requests racing with one token cannot both win
+        claimed = conn.execute('''
+            UPDATE refresh_tokens SET used_at = ? WHERE id = ? AND used_at IS NULL AND revoked = 0
+        ''', (now, row['id'])).rowcount
+        if not claimed:
+            if row['used_at'] is not None and now - row['used_at'] > REUSE_GRACE:
+                conn.execute('UPDATE refresh_tokens SET revoked = 1 WHERE family = ?', (row['family'],))
+                reused = row
+        else:
+            user = conn.execute('''
+                SELECT id, role, department_id, token_version FROM users
+                WHERE id = ? AND is_active = 1 AND approval_status = 'approved'
+            ''', (row['user_id'],)).fetchone()
+            if user:
+                return dict(user), _insert(conn, user['id'], row['family'], now)
+            conn.execute('UPDATE refresh_tokens SET revoked = 1 WHERE family = ?', (row['family'],))
+
+    if reused:
+        logger.warning("Refresh token reused for user %s; revoked its session", reused['user_id'])
+    raise RefreshTokenError('Invalid refresh token')
+
+
+def revoke(token: str, db_path: Optional[str] = None) -> bool:
+    """Revoke the session a refresh token belongs to"""
+    with transaction(db_path, row_factory=None) as conn:
+        return conn.execute('''
+            UPDATE refresh_tokens SET revoked = 1
+            WHERE family = (SELECT family FROM refresh_tokens WHERE token_hash = ?)
+        ''', (_digest(token),)).rowcount > 0
@@ -0,0 +1,271 @@
+# Retention for the generation history tables
+#
+# generated_timetables, timetable_logs and credentials_export only ever grew.
+# run_retention() keeps the newest rows of every group (department and
+# timetable type, department and generation type, user) plus anything
+# protected (approved timetables, credentials not yet exported), and moves the
+# rest into an archive database attached next to the main one. Candidates are
+# found with a read-only pass; they are then archived and deleted in small
+# BEGIN IMMEDIATE batches, so the write lock is only held for a moment at a
+# time. Freed pages are returned to the file system with incremental vacuum,
+# once the database has been switched to it with --enable-incremental-vacuum
+# (connections never set auto_vacuum themselves).
+#
+#   python -m retention --db timetable.db                    # archive and compact
+#   python -m retention --db timetable.db --dry-run          # only count candidates
+#   python -m retention --db timetable.db --enable-incremental-vacuum   # once, offline
+import argparse
+import logging
+import os
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from blob_store import prune_blobs
+from database import get_db_connection
+from timetable_views import drop_unreferenced_views
+
+logger = logging.getLogger(__name__)
+
+KEEP_VERSIONS = int(os.getenv('RETENTION_KEEP_VERSIONS', '5'))
+KEEP_LOGS = int(os.getenv('RETENTION_KEEP_LOGS', '100'))
+BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '100'))
+# Pages released per incremental_vacuum step
+VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', '256'))
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class Policy:
+    """Keep the newest `keep` rows per `partition`, and every row matching `protect`
+
+    `redact` maps columns to the SQL expression archived in their place.
+    `on_delete(cursor, ids)` handles dependent rows before a batch is deleted
+    and may return a callable to run once the batch's rows are gone.
+    """
+
+    def __init__(self, table: str, partition: Tuple[str, ...], order: str, keep: int,
+                 protect: str = '0', redact: Optional[Dict[str, str]] = None,
+                 on_delete: Optional[Callable] = None):
+        self.table = table
+        self.partition = partition
+        self.order = order
+        self.keep = keep
+        self.protect = protect
+        self.redact = redact or {}
+        self.on_delete = on_delete
+
+
+def _delete_generated_views(cursor, ids: List[int]):
+    """Archive the blobs of deleted timetables, then drop entity views nothing else uses"""
+    placeholders = ','.join('?' * len(ids))
+    cursor.execute(f'''
+        SELECT data_hash, constraints_hash FROM generated_timetables WHERE id IN ({placeholders})
+    ''', ids)
+    hashes = [h for row in cursor.fetchall() for h in row if h]
+    if hashes:
+        _ensure_archive_table(cursor, 'timetable_blobs')
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO archive.timetable_blobs (hash, data, size)
+            SELECT hash, data, size FROM main.timetable_blobs WHERE hash IN ({','.join('?' * len(hashes))})
+        ''', hashes)
+    # Blobs and entity views may still be shared with kept timetables until
+    # the rows are gone; the archived view blob holds every entity's schedule
+    def prune():
+        return prune_blobs(cursor, hashes + drop_unreferenced_views(cursor, hashes))
+    return prune
+
+
+POLICIES = [
+    Policy('generated_timetables', ('department_id', 'timetable_type'), 'created_at', KEEP_VERSIONS,
+           protect="status = 'approved'", on_delete=_delete_generated_views),
+    Policy('timetable_logs', ('department_id', 'generation_type'), 'generated_at', KEEP_LOGS,
+           protect="status = 'in_progress'"),
+    # The newest row per user stays: credential generation treats a user
+    # without one as never having received a password. Archived copies never
+    # carry the plain-text password.
+    Policy('credentials_export', ('user_id',), 'generated_at', 1,
+           protect='exported = FALSE', redact={'plain_password': "''"}),
+    Policy('credential_jobs', ('created_by',), 'created_at', KEEP_LOGS,
+           protect="status IN ('queued', 'running')"),
+    # Only the newest version per user matters to token checks
+    Policy('token_version_log', ('user_id',), 'id', 1),
+]
+
+
+def _table_exists(cursor, table: str, schema: str = 'main') -> bool:
+    cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def _ensure_archive_table(cursor, table: str) -> List[str]:
+    """Create or widen archive.<table> to the main table's columns; returns them"""
+    cursor.execute(f'PRAGMA main.table_info({table})')
+    info = cursor.fetchall()
+    columns = [row[1] for row in info]
+    if not _table_exists(cursor, table, 'archive'):
+        primary_key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+        cursor.execute(f'''
+            CREATE TABLE archive.{table} (
+                {', '.join(f'{row[1]} {row[2]}' for row in info)},
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY ({', '.join(primary_key)})
+            )
+        ''')
+    else:
+        cursor.execute(f'PRAGMA archive.table_info({table})')
+        archived = {row[1] for row in cursor.fetchall()}
+        for row in info:
+            if row[1] not in archived:
+                cursor.execute(f'ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}')
+    return columns
+
+
+def find_candidates(cursor, policy: Policy) -> List[int]:
+    """IDs outside the newest `keep` rows of their group and not protected; read-only"""
+    if not _table_exists(cursor, policy.table):
+        return []
+    cursor.execute(f'''
+        SELECT id FROM (
+            SELECT id, ({policy.protect}) AS protected,
+                   ROW_NUMBER() OVER (PARTITION BY {', '.join(policy.partition)}
+                                      ORDER BY {policy.order} DESC, id DESC) AS version
+            FROM {policy.table}
+        )
+        WHERE version > ? AND NOT protected
+        ORDER BY id
+    ''', (policy.keep,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _archive_batch(conn, policy: Policy, ids: List[int]) -> int:
+    """Move one batch to the archive in a single short write transaction"""
+    cursor = conn.cursor()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        columns = _ensure_archive_table(cursor, policy.table)
+        placeholders = ','.join('?' * len(ids))
+        # Re-check protection under the write lock; rows may have been approved since
+        where = f'id IN ({placeholders}) AND NOT ({policy.protect})'
+        cursor.execute(f'SELECT id FROM main.{policy.table} WHERE {where}', ids)
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            conn.rollback()
+            return 0
+        placeholders = ','.join('?' * len(ids))
+
+        after_delete = policy.on_delete(cursor, ids) if policy.on_delete else None
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO archive.{policy.table} ({', '.join(columns)})
+            SELECT {', '.join(policy.redact.get(c, c) for c in columns)}
+            FROM main.{policy.table} WHERE id IN ({placeholders})
+        ''', ids)
+        cursor.execute(f'DELETE FROM main.{policy.table} WHERE id IN ({placeholders})', ids)
+        if after_delete:
+            after_delete()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids)
+
+
+def incremental_vacuum(conn, max_steps: Optional[int] = None) -> int:
+    """Release free pages in VACUUM_PAGES steps; returns pages released"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        logger.info("auto_vacuum is not INCREMENTAL; run 'python -m retention --enable-incremental-vacuum' "
+                    "once to let retention shrink the file")
+        return 0
+    released = 0
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        # execute() would step the pragma once and free a single page;
+        # executescript() runs it to completion
+        conn.executescript(f'PRAGMA incremental_vacuum({VACUUM_PAGES})')
+        released += min(free, VACUUM_PAGES)
+        steps += 1
+    return released
+
+
+def archive_path_for(db_path: str) -> str:
+    root, ext = os.path.splitext(db_path)
+    return os.getenv('RETENTION_ARCHIVE_PATH', f'{root}_archive{ext or ".db"}')
+
+
+def run_retention(db_path: Optional[str] = None, archive_path: Optional[str] = None,
+                  batch_size: int = BATCH_SIZE, dry_run: bool = False,
+                  policies: Optional[List[Policy]] = None) -> Dict:
+    """Archive and delete rows outside the retention policies; returns counts per table"""
+    db_path = db_path or os.getenv('TIMETABLE_DB_PATH', 'timetable.db')
+    archive_path = archive_path or archive_path_for(db_path)
+    result = {'archived': {}, 'archive_path': archive_path, 'pages_released': 0}
+
+    conn = get_db_connection(db_path, row_factory=None)
+    attached = False
+    try:
+        candidates = {p.table: find_candidates(conn.cursor(), p) for p in policies or POLICIES}
+        if dry_run:
+            result['archived'] = {table: len(ids) for table, ids in candidates.items()}
+            return result
+
+        conn.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+        attached = True
+        for policy in policies or POLICIES:
+            ids = candidates[policy.table]
+            moved = 0
+            for start in range(0, len(ids), batch_size):
+                moved += _archive_batch(conn, policy, ids[start:start + batch_size])
+            result['archived'][policy.table] = moved
+            if moved:
+                logger.info("Archived %d row(s) of %s to %s", moved, policy.table, archive_path)
+
+        result['pages_released'] = incremental_vacuum(conn)
+    finally:
+        # Pooled connections are reused, so never hand one back still attached
+        if attached:
+            conn.execute('DETACH DATABASE archive')
+        conn.close()
+    return result
+
+
+def enable_incremental_vacuum(db_path: str):
+    """Switch an existing database to auto_vacuum=INCREMENTAL; rewrites the file"""
+    conn = get_db_connection(db_path, row_factory=None)
+    try:
+        conn.execute(f'PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='retention',
+                                     description='Archive old generation history and compact the database')
+    parser.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                        help='Path to the SQLite database')
+    parser.add_argument('--archive', help='Archive database (default: <db>_archive.db)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows moved per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Only count rows that would be archived')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Switch the database to incremental auto-vacuum (runs VACUUM; stop the backend first)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        print(f"{args.db} now uses incremental auto-vacuum")
+        return 0
+
+    result = run_retention(args.db, args.archive, args.batch_size, args.dry_run)
+    verb = 'would archive' if args.dry_run else 'archived'
+    for table, count in result['archived'].items():
+        print(f"{verb} {count:6d}  {table}")
+    if not args.dry_run:
+        print(f"released {result['pages_released']} page(s); archive: {result['archive_path']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
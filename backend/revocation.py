@@ -0,0 +1,82 @@
+# Revoked access tokens, checked in memory on every request
+#
+# /api/auth/logout used to leave the token valid until it expired 24 hours
+# later. Logout now records the token's jti in revoked_tokens, and the JWT
+# blocklist loader checks it against a per-process set. Each worker picks up
+# other workers' revocations with one indexed range read (id > last seen)
+# per REVOCATION_SYNC_INTERVAL, so the per-request check is a set lookup.
+# A revoked jti is only needed until the token itself expires; expired
+# entries are dropped from memory on sync and from the table on revoke.
+#
+#   @jwt.token_in_blocklist_loader
+#   def check_revoked(jwt_header, jwt_payload):
+#       return revoked_tokens.is_revoked(jwt_payload['jti'])
+#
+#   revoked_tokens.revoke(get_jwt())   # on logout
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from database import get_db_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv('REVOCATION_SYNC_INTERVAL', os.getenv('TOKEN_SYNC_INTERVAL', '1')))
+PRUNE_INTERVAL = float(os.getenv('REVOCATION_PRUNE_INTERVAL', '300'))
+
+
+class RevokedTokens:
+    """jti -> expiry (unix seconds) of revoked, not yet expired tokens"""
+
+    def __init__(self, interval: float = SYNC_INTERVAL, prune_interval: float = PRUNE_INTERVAL):
+        self.interval = interval
+        self.prune_interval = prune_interval
+        self._revoked: Dict[str, int] = {}
+        self._last_seq: Optional[int] = None
+        self._synced_at = 0.0
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def sync(self, db_path: Optional[str] = None):
+        now = int(time.time())
+        conn = get_db_connection(db_path, row_factory=None)
+        try:
+            # AUTOINCREMENT never reuses ids and pruning only removes expired
+            # rows, so reading past the last id seen never misses a revocation
+            rows = conn.execute('SELECT id, jti, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id',
+                                (self._last_seq or 0,)).fetchall()
+        finally:
+            conn.close()
+        for seq, jti, expires_at in rows:
+            if expires_at > now:
+                self._revoked[jti] = expires_at
+            self._last_seq = seq
+
+        if time.monotonic() - self._pruned_at >= self.prune_interval:
+            self._revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+            self._pruned_at = time.monotonic()
+        self._synced_at = time.monotonic()
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() - self._synced_at >= self.interval and self._lock.acquire(blocking=False):
+            # One thread refreshes; the others use the set they already have
+            try:
+                self.sync()
+            finally:
+                self._lock.release()
+        return jti in self._revoked
+
+    def revoke(self, claims: Dict, db_path: Optional[str] = None):
+        """Revoke the token with these decoded claims until it expires"""
+        jti, expires_at = claims['jti'], claims['exp']
+        with transaction(db_path, row_factory=None) as conn:
+            conn.execute('INSERT OR IGNORE INTO revoked_tokens (jti, user_id, expires_at) VALUES (?, ?, ?)',
+                         (jti, int(claims['sub']), expires_at))
+            # Writers keep the table down to tokens that could still be presented
+            conn.execute('DELETE FROM revoked_tokens WHERE expires_at <= ?', (int(time.time()),))
+        self._revoked[jti] = expires_at
+
+
+revoked_tokens = RevokedTokens()
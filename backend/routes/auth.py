@@ -1,13 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-import sqlite3
+from database import get_db_connection
 
 auth_bp = Blueprint('auth', __name__)
 
-def get_db_connection():
-    conn = sqlite3.connect('timetable.db')
-    conn.row_factory = sqlite3.Row
-    return conn
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -0,0 +1,304 @@
+# Bulk staff import from an Excel workbook or CSV file
+#
+# register_staff onboards one person per request and hashes their password
+# (PBKDF2, about a third of a second) on the request thread. import_staff()
+# streams the rows of an uploaded sheet (openpyxl read_only mode, or csv),
+# validates them a chunk at a time against the file and the database, hashes
+# the chunk's generated passwords across a process pool and inserts it with
+# executemany in one short write transaction. Imported staff are pending
+# approval, exactly as if registered one by one. The API parses the file on
+# the request; files over ASYNC_THRESHOLD rows are imported as a background
+# job (see credentials.py) and the request returns the job handle.
+#
+#   python -m staff_import --db timetable.db --department-code CSE staff.xlsx
+#   python -m staff_import --db timetable.db --department 3 --workers 8 staff.csv
+#   POST /api/staff/import  (multipart: file=staff.xlsx)  -> 201/200 {data} or 202 {job}
+#   GET  /api/staff/import/jobs/<job_id>
+import argparse
+import csv
+import io
+import logging
+import os
+import secrets
+import string
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from database import get_db_connection
+from password_auth import hash_password
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '500'))
+WORKERS = int(os.getenv('IMPORT_WORKERS', str(os.cpu_count() or 1)))
+# Larger files are imported in the background
+ASYNC_THRESHOLD = int(os.getenv('IMPORT_ASYNC_THRESHOLD', '20'))
+
+# Same fields register_staff requires
+REQUIRED_COLUMNS = ('name', 'employee_id', 'email', 'staff_role', 'contact_number')
+STAFF_ROLES = ('assistant_professor', 'associate_professor', 'professor', 'hod')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def generate_username(email: str) -> str:
+    return email.split('@')[0].lower()
+
+
+def generate_password() -> str:
+    return ''.join(secrets.choice(string.ascii_letters + string.digits + "!@#$%^&*") for _ in range(10))
+
+
+def _header(cells) -> List[str]:
+    # "Employee ID" and "employee_id" name the same column
+    return ['_'.join(str(cell or '').strip().lower().split()) for cell in cells]
+
+
+def _check_header(header: List[str]):
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFormatError(f"Missing column(s): {', '.join(missing)}")
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ''
+    # Excel stores numeric IDs and phone numbers as floats
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_rows(stream, filename: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (sheet row number, row) from a .xlsx or .csv file without loading it whole"""
+    if filename.lower().endswith('.csv'):
+        if isinstance(stream, io.TextIOBase):
+            text = stream
+        else:
+            text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        try:
+            header = _header(next(reader, []))
+            _check_header(header)
+            for number, values in enumerate(reader, start=2):
+                if any(v.strip() for v in values):
+                    yield number, dict(zip(header, (_cell(v) for v in values)))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise ImportFormatError(f'Not a readable UTF-8 CSV file: {e}')
+        return
+
+    if not filename.lower().endswith(('.xlsx', '.xlsm')):
+        raise ImportFormatError('Upload an .xlsx or .csv file')
+
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        # KeyError: a zip archive without the parts every workbook has
+        raise ImportFormatError(f'Not a valid .xlsx workbook: {e}')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        _check_header(header)
+        for number, values in enumerate(rows, start=2):
+            if any(v is not None and str(v).strip() for v in values):
+                yield number, dict(zip(header, (_cell(v) for v in values)))
+    finally:
+        workbook.close()
+
+
+def _chunks(rows: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _existing(cursor, column: str, values: List[str]) -> set:
+    if not values:
+        return set()
+    cursor.execute(f'''
+        SELECT {column} FROM users WHERE {column} IN ({','.join('?' * len(values))})
+    ''', values)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def validate_chunk(cursor, chunk: List[Tuple[int, Dict]], seen: Dict[str, set]) -> Tuple[List, List]:
+    """Split a chunk into (valid rows, errors); `seen` tracks values across chunks"""
+    valid, errors = [], []
+    for number, row in chunk:
+        missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+        if missing:
+            errors.append({'row': number, 'error': f"Missing {', '.join(missing)}"})
+            continue
+        row['email'] = row['email'].lower()
+        row['staff_role'] = row['staff_role'].lower().replace(' ', '_')
+        if '@' not in row['email']:
+            errors.append({'row': number, 'error': 'Invalid email'})
+            continue
+        if row['staff_role'] not in STAFF_ROLES:
+            errors.append({'row': number, 'error': f"staff_role must be one of {', '.join(STAFF_ROLES)}"})
+            continue
+        row['username'] = generate_username(row['email'])
+        duplicate = next((c for c in ('email', 'employee_id', 'username') if row[c] in seen[c]), None)
+        if duplicate:
+            errors.append({'row': number, 'error': f"Duplicate {duplicate} in file: {row[duplicate]}"})
+            continue
+        for column in seen:
+            seen[column].add(row[column])
+        valid.append((number, row))
+
+    # One IN query per unique column instead of three lookups per row
+    taken = {column: _existing(cursor, column, [row[column] for _, row in valid])
+             for column in ('email', 'employee_id', 'username')}
+    accepted = []
+    for number, row in valid:
+        clash = next((c for c in taken if row[c] in taken[c]), None)
+        if clash:
+            errors.append({'row': number, 'error': f"{clash} already registered: {row[clash]}"})
+        else:
+            accepted.append((number, row))
+    return accepted, errors
+
+
+def hash_passwords(passwords: List[str], executor: Optional[ProcessPoolExecutor] = None,
+                    workers: int = 1) -> List[str]:
+    if executor is None:
+        return [hash_password(password) for password in passwords]
+    # A few batches per worker keeps them all busy without pickling per password
+    return list(executor.map(hash_password, passwords,
+                             chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _insert_chunk(conn, rows: List[Dict], department_id: int) -> List[Tuple[int, str]]:
+    """Insert one validated chunk and its credentials; returns (user id, email) pairs"""
+    cursor = conn.cursor()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.executemany('''
+            INSERT INTO users (name, email, password_hash, username, employee_id, role,
+                             department_id, staff_role, contact_number, approval_status)
+            VALUES (?, ?, ?, ?, ?, 'staff', ?, ?, ?, 'pending')
+        ''', [(row['name'], row['email'], row['password_hash'], row['username'], row['employee_id'],
+               department_id, row['staff_role'], row['contact_number']) for row in rows])
+        emails = [row['email'] for row in rows]
+        cursor.execute(f'''
+            SELECT id, email FROM users WHERE email IN ({','.join('?' * len(emails))})
+        ''', emails)
+        ids = {row[1]: row[0] for row in cursor.fetchall()}
+        cursor.executemany('''
+            INSERT INTO credentials_export (user_id, username, plain_password)
+            VALUES (?, ?, ?)
+        ''', [(ids[row['email']], row['username'], row['password']) for row in rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [(ids[row['email']], row['email']) for row in rows]
+
+
+def import_staff(conn, rows: Iterator[Tuple[int, Dict]], department_id: int,
+                 sender_id: Optional[int] = None, workers: int = WORKERS,
+                 chunk_size: int = CHUNK_SIZE) -> Dict:
+    """Validate, hash and insert staff rows chunk by chunk
+
+    Invalid rows are reported and skipped; every valid row is imported.
+    `sender_id` gets the main admin notification, as register_staff does.
+    """
+    started = time.perf_counter()
+    seen = {'email': set(), 'employee_id': set(), 'username': set()}
+    imported: List[Tuple[int, str]] = []
+    errors: List[Dict] = []
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            valid, chunk_errors = validate_chunk(conn.cursor(), chunk, seen)
+            errors.extend(chunk_errors)
+            if not valid:
+                continue
+            staff = [row for _, row in valid]
+            for row in staff:
+                row['password'] = generate_password()
+            for row, password_hash in zip(staff, hash_passwords([r['password'] for r in staff], executor, workers)):
+                row['password_hash'] = password_hash
+            imported.extend(_insert_chunk(conn, staff, department_id))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if imported and sender_id is not None:
+        conn.execute('''
+            INSERT INTO notifications (title, message, sender_id, recipient_type)
+            VALUES (?, ?, ?, ?)
+        ''', ('New Staff Registration Requests',
+              f'{len(imported)} staff registration request(s) imported for approval',
+              sender_id, 'main_admin'))
+        conn.commit()
+
+    elapsed = time.perf_counter() - started
+    logger.info("Imported %d staff into department %s (%d rejected) in %.1fs",
+                len(imported), department_id, len(errors), elapsed)
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'imported': len(imported),
+        'rejected': len(errors),
+        'staff_ids': [str(user_id) for user_id, _ in imported],
+        'errors': errors,
+        'elapsed': round(elapsed, 3)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='staff_import', description='Import staff from an .xlsx or .csv file')
+    parser.add_argument('file', help='Workbook or CSV with name, employee_id, email, staff_role, contact_number')
+    parser.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                        help='Path to the SQLite database')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--department', type=int, help='Department ID')
+    target.add_argument('--department-code', help='Department code, e.g. CSE')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Password hashing processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows validated and inserted per batch')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    conn = get_db_connection(args.db, row_factory=None)
+    try:
+        cursor = conn.cursor()
+        if args.department_code:
+            cursor.execute('SELECT id FROM departments WHERE code = ?', (args.department_code,))
+        else:
+            cursor.execute('SELECT id FROM departments WHERE id = ?', (args.department,))
+        department = cursor.fetchone()
+        if not department:
+            print(f"Unknown department: {args.department_code or args.department}")
+            return 1
+
+        with open(args.file, 'rb') as stream:
+            try:
+                result = import_staff(conn, iter_rows(stream, args.file), department[0],
+                                      workers=args.workers, chunk_size=args.chunk_size)
+            except ImportFormatError as e:
+                print(e)
+                return 1
+    finally:
+        conn.close()
+
+    for error in result['errors']:
+        print(f"row {error['row']}: {error['error']}")
+    print(f"imported {result['imported']}, rejected {result['rejected']} in {result['elapsed']}s")
+    return 0 if not result['rejected'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Normalized staff-subject eligibility
+#
+# Which subjects a staff member can teach used to live in three encodings:
+# choice_submissions.subject_preferences (JSON), subject_choice_submissions
+# .subject_preferences (JSON) and users.subjects_selected (comma string).
+# The submit endpoints now also write one staff_subject_preference row per
+# (staff, subject), and generators read that table instead of re-parsing
+# the blobs. The original columns are still written for existing readers.
+import json
+from typing import Dict, List, Optional
+
+from queries import APPROVED_ONLY, DEPARTMENT_PREFERENCES
+
+# Where a preference came from; form_id is 0 for SOURCE_SELECTION
+SOURCE_CHOICE_FORM = 'choice_form'
+SOURCE_SUBJECT_CHOICE_FORM = 'subject_choice_form'
+SOURCE_SELECTION = 'selection'
+
+
+def parse_subject_ids(raw) -> List[int]:
+    """Subject IDs, in order, from a JSON list, comma string or list of IDs/dicts"""
+    if raw is None or raw == '':
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raw = raw.split(',')
+    if not isinstance(raw, (list, tuple)):
+        raw = [raw]
+
+    subject_ids = []
+    for item in raw:
+        if isinstance(item, dict):
+            item = item.get('subject_id', item.get('id'))
+        try:
+            subject_id = int(str(item).strip())
+        except (TypeError, ValueError):
+            continue
+        if subject_id not in subject_ids:
+            subject_ids.append(subject_id)
+    return subject_ids
+
+
+def replace_preferences(cursor, staff_id: int, source: str, subject_ids,
+                        form_id: Optional[int] = None):
+    """Replace one staff member's preferences from one source (and form); caller commits
+
+    `subject_ids` takes anything parse_subject_ids() accepts.
+    """
+    form_id = form_id or 0
+    cursor.execute('''
+        DELETE FROM staff_subject_preference
+        WHERE staff_id = ? AND source = ? AND form_id = ?
+    ''', (staff_id, source, form_id))
+    cursor.executemany('''
+        INSERT INTO staff_subject_preference (staff_id, subject_id, rank, source, form_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(staff_id, subject_id, rank, source, form_id)
+          for rank, subject_id in enumerate(parse_subject_ids(subject_ids), 1)])
+
+
+def department_preferences(cursor, department_id: int, source: str,
+                           approved_only: bool = False) -> Dict[int, List[int]]:
+    """Staff ID -> ranked subject IDs for a department, from each staff member's latest form"""
+    cursor.execute(DEPARTMENT_PREFERENCES.format(approval=APPROVED_ONLY if approved_only else ''),
+                   (source, department_id))
+
+    preferences: Dict[int, List[int]] = {}
+    for staff_id, subject_id in cursor.fetchall():
+        preferences.setdefault(staff_id, []).append(subject_id)
+    return preferences
+
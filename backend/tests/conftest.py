@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A fully migrated, empty database"""
+    path = str(tmp_path / 'timetable.db')
+    migrations.upgrade(path)
+    return path
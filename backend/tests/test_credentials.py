@@ -0,0 +1,79 @@
+import time
+
+import credentials
+from database import get_db_connection
+
+
+def _insert_job(conn, job_id, status, age_minutes):
+    conn.execute('''
+        INSERT INTO credential_jobs (id, status, total, created_at, heartbeat_at)
+        VALUES (?, ?, 1, datetime('now', ?), datetime('now', ?))
+    ''', (job_id, status, f'-{age_minutes} minutes', f'-{age_minutes} minutes'))
+    conn.commit()
+
+
+def test_stale_running_job_is_failed_and_not_reused(db_path):
+    conn = get_db_connection(db_path)
+    try:
+        _insert_job(conn, 'crashed', credentials.JOB_RUNNING, credentials.JOB_TIMEOUT + 5)
+
+        assert credentials.active_job(conn) is None
+        job = credentials.get_job(conn, 'crashed')
+        assert job['status'] == credentials.JOB_FAILED
+        assert job['finished_at'] is not None
+    finally:
+        conn.close()
+
+    # The thread of a job already failed as stale cannot revive it
+    assert not credentials._set_job(db_path, 'crashed', status=credentials.JOB_DONE, generated=1)
+    conn = get_db_connection(db_path)
+    try:
+        assert credentials.get_job(conn, 'crashed')['status'] == credentials.JOB_FAILED
+    finally:
+        conn.close()
+
+
+def test_job_with_recent_heartbeat_stays_active(db_path):
+    conn = get_db_connection(db_path)
+    try:
+        _insert_job(conn, 'alive', credentials.JOB_RUNNING, credentials.JOB_TIMEOUT - 5)
+
+        assert credentials.active_job(conn)['id'] == 'alive'
+        assert credentials.fail_stale_jobs(conn) == 0
+    finally:
+        conn.close()
+
+
+def test_heartbeat_keeps_long_job_alive(db_path, monkeypatch):
+    monkeypatch.setattr(credentials, 'JOB_HEARTBEAT', 0.01)
+    seen = {}
+
+    def slow_generate(conn, users, workers):
+        # Age the job past the timeout; only the heartbeat thread can rescue it
+        conn.execute("""
+            UPDATE credential_jobs SET created_at = datetime('now', '-1 hour'), heartbeat_at = datetime('now', '-1 hour')
+            WHERE id = 'long'
+        """)
+        conn.commit()
+        time.sleep(0.2)
+        seen['stale'] = credentials.fail_stale_jobs(conn)
+        return len(users)
+
+    monkeypatch.setattr(credentials, 'generate', slow_generate)
+    conn = get_db_connection(db_path)
+    try:
+        _insert_job(conn, 'long', credentials.JOB_QUEUED, 0)
+    finally:
+        conn.close()
+
+    users = [(1, 'a@example.com')]
+    credentials._run_job(db_path, 'long', lambda conn: (credentials.generate(conn, users, 1), None))
+
+    conn = get_db_connection(db_path)
+    try:
+        job = credentials.get_job(conn, 'long')
+    finally:
+        conn.close()
+    assert seen['stale'] == 0
+    assert job['status'] == credentials.JOB_DONE
+    assert job['generated'] == 1
@@ -0,0 +1,36 @@
+import time
+
+import database
+
+
+def test_wal_is_checkpointed_in_the_background(db_path, monkeypatch):
+    monkeypatch.setattr(database, 'CHECKPOINT_INTERVAL', 0.05)
+    pool = database.ConnectionPool(db_path)
+    try:
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE scratch (x)')
+        conn.execute('INSERT INTO scratch VALUES (1)')
+        conn.commit()
+        pool.release(conn)
+
+        for _ in range(100):
+            if pool.checkpoints:
+                break
+            time.sleep(0.05)
+        assert pool.checkpoints > 0
+    finally:
+        pool.close_all()
+    pool._checkpointer.join(1)
+    assert not pool._checkpointer.is_alive()
+
+
+def test_connections_leave_auto_vacuum_alone(tmp_path):
+    pool = database.ConnectionPool(str(tmp_path / 'new.db'))
+    try:
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE t (x)')
+        # 0 = NONE; switching is retention's one-time --enable-incremental-vacuum
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+        pool.release(conn)
+    finally:
+        pool.close_all()
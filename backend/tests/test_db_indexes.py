@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+from db_indexes import HOT_QUERIES, INDEXES, check_query_plans
+
+# Index each hot query's plan must use
+EXPECTED_INDEXES = {
+    'GET /api/staff': 'idx_users_department_role_status',
+    'GET /api/subjects': 'idx_subjects_department',
+    'GET /api/classes': 'idx_classes_department',
+    'GET /api/classrooms': 'idx_classrooms_department',
+    'GET /api/timetables': 'idx_timetables_department_slot',
+    'POST /api/timetable/generate (staff load)': 'idx_users_department_role_status',
+    'POST /api/timetable/generate (staff subjects)': 'idx_users_department_role_status',
+    'GET /api/choice-forms (staff)': 'idx_choice_forms_department',
+    'GET /api/choice-forms (admin)': 'idx_choice_forms_department',
+    'GET /api/notifications (main admin)': 'idx_notifications_recipient',
+    'GET /api/notifications (staff)': 'idx_notifications_recipient',
+    'GET /api/staff/pending': 'idx_users_role_status',
+    'GET /api/credentials/export': 'idx_credentials_export_pending',
+    'GET /generated-timetables': 'idx_generated_timetables_department',
+    'GET /staff/timetable': 'idx_generated_timetables_lookup',
+    'GET /choice-forms/available': 'idx_subject_choice_forms_department',
+    'GET /my-submissions': 'idx_subject_choice_submissions_staff',
+    'POST /generate-timetable (preferences)': 'idx_users_department_role_status',
+    'GET /subject-choice-forms': 'idx_subject_choice_forms_department',
+    'GET /constraints (department)': 'idx_enhanced_constraints_department',
+    'GET /queries (department)': 'idx_department_queries_department',
+    'GET /timetable-config': 'idx_timetable_configurations_department',
+    'GET /api/staff/pending (page)': 'idx_users_role_status',
+    'GET /syllabus/review (page)': 'idx_syllabus_uploads_uploaded',
+    'GET /timetables/logs (page)': 'idx_timetable_logs_generated',
+    'GET /staff-requests (page)': 'idx_staff_registration_requests_created',
+    'GET /queries (page)': 'idx_department_queries_created',
+    'GET /my-submissions (page)': 'idx_subject_choice_submissions_staff',
+}
+
+
+@pytest.fixture
+def plans(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {result['endpoint']: result for result in check_query_plans(conn)}
+    finally:
+        conn.close()
+
+
+def test_every_hot_query_has_an_expected_index():
+    assert sorted(EXPECTED_INDEXES) == sorted(endpoint for endpoint, _, _ in HOT_QUERIES)
+
+
+def test_migrations_create_every_index(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+    assert {name for name, _, _ in INDEXES} - existing == set()
+
+
+@pytest.mark.parametrize('endpoint', sorted(EXPECTED_INDEXES))
+def test_hot_query_uses_its_index(plans, endpoint):
+    result = plans[endpoint]
+    assert 'skipped' not in result, result.get('skipped')
+    assert result['full_scans'] == [], result['plan']
+    assert any(EXPECTED_INDEXES[endpoint] in step for step in result['plan']), result['plan']
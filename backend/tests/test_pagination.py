@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+
+from pagination import PaginationError, fetch_page
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, created_at TEXT)')
+    conn.executemany('INSERT INTO items (created_at) VALUES (?)',
+                     [(f'2024-01-01 00:{n // 60:02d}:{n % 60:02d}',) for n in range(120)])
+    return conn.cursor()
+
+
+def test_without_paging_arguments_every_row_is_returned(cursor):
+    rows, pagination = fetch_page(cursor, 'SELECT * FROM items', (), {})
+    assert len(rows) == 120
+    assert rows[0]['id'] == 120
+    assert pagination == {'limit': None, 'has_more': False, 'next_cursor': None, 'total_estimate': 120}
+
+
+def test_pages_follow_next_cursor(cursor):
+    seen = []
+    args = {'limit': '50'}
+    while True:
+        rows, pagination = fetch_page(cursor, 'SELECT * FROM items', (), args)
+        seen += [row['id'] for row in rows]
+        if not pagination['has_more']:
+            break
+        args = {'limit': '50', 'cursor': pagination['next_cursor']}
+    assert seen == list(range(120, 0, -1))
+
+
+def test_bad_limit_is_rejected(cursor):
+    with pytest.raises(PaginationError):
+        fetch_page(cursor, 'SELECT * FROM items', (), {'limit': 'all'})
@@ -0,0 +1,30 @@
+import multiprocessing
+import time
+
+import pytest
+
+import pareto
+
+
+def _stuck_variant(data, weights, seed, deadline, time_slice):
+    time.sleep(60)
+    return []
+
+
+def test_variants_past_the_budget_are_terminated(monkeypatch):
+    monkeypatch.setattr(pareto, '_run_variant', _stuck_variant)
+
+    began = time.monotonic()
+    assert pareto.generate_pareto_front({}, time_budget=0.5, workers=2) == []
+    assert time.monotonic() - began < 5
+
+    for _ in range(50):
+        if not multiprocessing.active_children():
+            break
+        time.sleep(0.1)
+    assert multiprocessing.active_children() == []
+
+
+def test_time_budget_must_be_positive():
+    with pytest.raises(ValueError):
+        pareto.generate_pareto_front({}, time_budget=0)
@@ -0,0 +1,40 @@
+import threading
+import time
+
+import pytest
+
+import password_auth
+from password_auth import PasswordVerifier, VerifierBusy
+
+
+def test_saturated_verifier_rejects_without_waiting(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_check(password_hash, password):
+        started.set()
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(password_auth, 'check_password_hash', slow_check)
+    verifier = PasswordVerifier(workers=1, timeout=5)
+    results = []
+    holder = threading.Thread(target=lambda: results.append(verifier.verify('hash', 'first')))
+    holder.start()
+    try:
+        assert started.wait(5)
+
+        # The only worker is busy: the second login is turned away at once
+        began = time.monotonic()
+        with pytest.raises(VerifierBusy):
+            verifier.verify('hash', 'second')
+        assert time.monotonic() - began < 1
+        assert verifier.stats()['rejected_busy'] == 1
+    finally:
+        release.set()
+        holder.join(5)
+
+    assert results == [True]
+    # Once the worker is free again checks are admitted
+    assert verifier.verify('hash', 'third') is True
+    assert verifier.stats()['verified'] == 2
@@ -0,0 +1,34 @@
+import io
+import zipfile
+
+import pytest
+
+from staff_import import ImportFormatError, iter_rows
+
+
+def _zip(entries):
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, 'w') as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    stream.seek(0)
+    return stream
+
+
+@pytest.mark.parametrize('stream, filename', [
+    (io.BytesIO(b'not a workbook'), 'staff.xlsx'),
+    (io.BytesIO(b'PK\x03\x04truncated'), 'staff.xlsx'),
+    (_zip({'readme.txt': 'a zip, but not a workbook'}), 'staff.xlsx'),
+    (io.BytesIO(b'\xff\xfename,email\n'), 'staff.csv'),
+])
+def test_unreadable_upload_is_a_format_error(stream, filename):
+    with pytest.raises(ImportFormatError):
+        list(iter_rows(stream, filename))
+
+
+def test_csv_rows_are_read():
+    stream = io.BytesIO(b'Name,Employee ID,Email,Staff Role,Contact Number\nAda,E1,ada@x.edu,professor,99\n')
+    assert list(iter_rows(stream, 'staff.csv')) == [(2, {
+        'name': 'Ada', 'employee_id': 'E1', 'email': 'ada@x.edu', 'staff_role': 'professor',
+        'contact_number': '99'
+    })]
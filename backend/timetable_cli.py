@@ -0,0 +1,311 @@
+# Command line entry point for offline timetable generation
+#
+#   python -m timetable_cli generate --db timetable.db --department 3 --workers 4
+#   python -m timetable_cli validate --db timetable.db --all
+#   python -m timetable_cli export --db timetable.db --department-code CSE --output cse.xlsx
+#   python -m timetable_cli bench --db timetable.db --department 3 --runs 20
+#   python -m timetable_cli pareto --db timetable.db --department 3 --time-budget 20 --workers 8
+import argparse
+import csv
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from database import get_db_connection
+from pareto import OBJECTIVES, generate_pareto_front
+from timetable_generator import AITimetableGenerator
+from timetable_model import DepartmentModel
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_departments(db_path: str, args) -> List[int]:
+    """Turn --department / --department-code / --all into department IDs"""
+    conn = get_db_connection(db_path, row_factory=None)
+    try:
+        cursor = conn.cursor()
+        if args.all:
+            cursor.execute('SELECT id FROM departments ORDER BY id')
+            return [row[0] for row in cursor.fetchall()]
+
+        department_ids = list(args.department or [])
+        for code in args.department_code or []:
+            cursor.execute('SELECT id FROM departments WHERE code = ?', (code,))
+            row = cursor.fetchone()
+            if not row:
+                raise SystemExit(f"Unknown department code: {code}")
+            department_ids.append(row[0])
+    finally:
+        conn.close()
+
+    if not department_ids:
+        raise SystemExit('Select departments with --department, --department-code or --all')
+    return department_ids
+
+
+def _solve(data: Dict, seed: Optional[int], time_budget: Optional[float]) -> Dict:
+    """Run one solver pass on preloaded department data (process pool worker)"""
+    generator = AITimetableGenerator(seed=seed, time_budget=time_budget)
+    started = time.perf_counter()
+    timetable = generator._optimize_timetable(
+        data['classes'], data['staff_subjects'], data['subjects'], data['classrooms']
+    )
+    return {
+        'seed': seed,
+        'timetable': timetable,
+        'unassigned': generator.unassigned_count,
+        'timed_out': generator.timed_out,
+        'elapsed': time.perf_counter() - started
+    }
+
+
+def _run_attempts(data: Dict, seeds: List[Optional[int]], time_budget: Optional[float],
+                  workers: int) -> List[Dict]:
+    """Run one solver pass per seed, in parallel when more than one worker is requested"""
+    if workers <= 1 or len(seeds) == 1:
+        return [_solve(data, seed, time_budget) for seed in seeds]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_solve, data, seed, time_budget) for seed in seeds]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+
+def _seeds(base_seed: Optional[int], count: int) -> List[Optional[int]]:
+    if base_seed is None:
+        return [None] * count
+    return [base_seed + i for i in range(count)]
+
+
+def cmd_generate(args) -> int:
+    """Generate (and by default save) timetables, keeping the best of --attempts runs"""
+    attempts = args.attempts or args.workers
+    per_attempt_budget = args.time_budget
+    exit_code = 0
+
+    for department_id in resolve_departments(args.db, args):
+        generator = AITimetableGenerator(db_path=args.db)
+        data = generator.load_department_data(department_id)
+        if 'error' in data:
+            print(f"[{department_id}] {data['error']}")
+            exit_code = 1
+            continue
+
+        results = _run_attempts(data, _seeds(args.seed, attempts), per_attempt_budget, args.workers)
+        best = min(results, key=lambda r: (r['unassigned'], r['elapsed']))
+
+        if not args.dry_run:
+            generator._save_timetable(department_id, best['timetable'])
+
+        print(f"[{department_id}] {data['department']}: {len(best['timetable'])} entries, "
+              f"{best['unassigned']} unassigned (seed={best['seed']}, "
+              f"{best['elapsed']:.3f}s, best of {len(results)}"
+              + (', time budget ran out' if best['timed_out'] else '') + ')'
+              + (' [dry run]' if args.dry_run else ''))
+
+        if args.output:
+            path = args.output.format(department_id=department_id)
+            with open(path, 'w') as f:
+                json.dump(best['timetable'], f, indent=2)
+
+    return exit_code
+
+
+def cmd_validate(args) -> int:
+    """Check saved timetables for double-booked staff, classrooms and classes"""
+    generator = AITimetableGenerator(db_path=args.db)
+    exit_code = 0
+
+    for department_id in resolve_departments(args.db, args):
+        conn = generator.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, day, time_slot, class_id, subject_id, staff_id, classroom_id
+                FROM timetables WHERE department_id = ?
+            ''', (department_id,))
+            entries = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        conflicts = generator.find_conflicts(entries)
+        print(f"[{department_id}] {len(entries)} entries, {len(conflicts)} conflicts")
+        for conflict in conflicts:
+            print(f"    {json.dumps(conflict)}")
+        if conflicts:
+            exit_code = 1
+
+    return exit_code
+
+
+def cmd_export(args) -> int:
+    """Export saved timetables as CSV, JSON or Excel"""
+    generator = AITimetableGenerator(db_path=args.db)
+    columns = ['day', 'time_slot', 'class_name', 'subject_code', 'subject_name',
+               'staff_name', 'classroom_name']
+
+    for department_id in resolve_departments(args.db, args):
+        result = generator.get_department_timetable(department_id)
+        if 'error' in result:
+            print(f"[{department_id}] {result['error']}")
+            return 1
+
+        rows = result['timetable']
+        path = args.output.format(department_id=department_id)
+        ext = os.path.splitext(path)[1].lower()
+
+        if ext == '.json':
+            with open(path, 'w') as f:
+                json.dump(rows, f, indent=2)
+        elif ext == '.xlsx':
+            import openpyxl
+            from openpyxl.styles import Font
+
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws.title = "Timetable"
+            ws.append([c.replace('_', ' ').title() for c in columns])
+            for cell in ws[1]:
+                cell.font = Font(bold=True)
+            for row in rows:
+                ws.append([row[c] for c in columns])
+            wb.save(path)
+        else:
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(rows)
+
+        print(f"[{department_id}] exported {len(rows)} entries to {path}")
+
+    return 0
+
+
+def cmd_bench(args) -> int:
+    """Time repeated solver runs without touching the database"""
+    for department_id in resolve_departments(args.db, args):
+        generator = AITimetableGenerator(db_path=args.db)
+
+        started = time.perf_counter()
+        data = generator.load_department_data(department_id)
+        load_time = time.perf_counter() - started
+        if 'error' in data:
+            print(f"[{department_id}] {data['error']}")
+            return 1
+
+        started = time.perf_counter()
+        results = _run_attempts(data, _seeds(args.seed, args.runs), args.time_budget, args.workers)
+        wall_time = time.perf_counter() - started
+
+        elapsed = [r['elapsed'] for r in results]
+        unassigned = [r['unassigned'] for r in results]
+        symmetry = DepartmentModel(data['classes'], data['staff_subjects'], data['subjects'],
+                                   data['classrooms']).symmetry_stats()
+        print(f"[{department_id}] {data['department']}: {args.runs} runs, {args.workers} workers")
+        print(f"    symmetry  {symmetry['rooms']} rooms -> {symmetry['room_classes']} classes, "
+              f"{symmetry['staff']} staff -> {symmetry['staff_classes']} classes")
+        print(f"    load      {load_time * 1000:.1f} ms")
+        print(f"    solve     mean {statistics.mean(elapsed) * 1000:.1f} ms, "
+              f"min {min(elapsed) * 1000:.1f} ms, max {max(elapsed) * 1000:.1f} ms")
+        print(f"    wall      {wall_time:.3f} s")
+        print(f"    entries   {statistics.mean(len(r['timetable']) for r in results):.1f} mean")
+        print(f"    unassigned mean {statistics.mean(unassigned):.1f}, min {min(unassigned)}")
+        timed_out = sum(r['timed_out'] for r in results)
+        if timed_out:
+            print(f"    timed out {timed_out} of {len(results)} runs; their unassigned hours were never tried")
+
+    return 0
+
+
+def cmd_pareto(args) -> int:
+    """Compute a Pareto front of timetables within one time budget"""
+    for department_id in resolve_departments(args.db, args):
+        generator = AITimetableGenerator(db_path=args.db)
+        data = generator.load_department_data(department_id)
+        if 'error' in data:
+            print(f"[{department_id}] {data['error']}")
+            return 1
+
+        started = time.perf_counter()
+        front = generate_pareto_front(data, time_budget=args.time_budget or 10.0,
+                                      workers=args.workers, seed=args.seed)
+        print(f"[{department_id}] {data['department']}: {len(front)} non-dominated timetables "
+              f"in {time.perf_counter() - started:.2f}s")
+        for i, candidate in enumerate(front):
+            objectives = ', '.join(f"{k}={candidate['objectives'][k]}" for k in OBJECTIVES)
+            print(f"    #{i} {objectives}  weights={candidate['weights']}")
+
+        if args.output:
+            path = args.output.format(department_id=department_id)
+            with open(path, 'w') as f:
+                json.dump(front, f, indent=2)
+
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='timetable_cli', description='Offline timetable generation')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log solver warnings')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub):
+        sub.add_argument('--db', default=os.getenv('TIMETABLE_DB_PATH', 'timetable.db'),
+                         help='Path to the SQLite database')
+        selector = sub.add_argument_group('department selection')
+        selector.add_argument('--department', type=int, action='append', help='Department ID (repeatable)')
+        selector.add_argument('--department-code', action='append', help='Department code (repeatable)')
+        selector.add_argument('--all', action='store_true', help='Every department')
+
+    def add_solver(sub):
+        sub.add_argument('--seed', type=int, help='Base random seed; attempt N uses seed + N')
+        sub.add_argument('--time-budget', type=float, help='Seconds allowed per solver run')
+        sub.add_argument('--workers', type=int, default=1, help='Parallel solver processes')
+
+    generate = subparsers.add_parser('generate', help='Generate and save timetables')
+    add_common(generate)
+    add_solver(generate)
+    generate.add_argument('--attempts', type=int, help='Solver runs per department (default: --workers)')
+    generate.add_argument('--dry-run', action='store_true', help='Do not write to the database')
+    generate.add_argument('--output', help='Write the chosen timetable as JSON; may use {department_id}')
+    generate.set_defaults(func=cmd_generate)
+
+    validate = subparsers.add_parser('validate', help='Check saved timetables for conflicts')
+    add_common(validate)
+    validate.set_defaults(func=cmd_validate)
+
+    export = subparsers.add_parser('export', help='Export saved timetables')
+    add_common(export)
+    export.add_argument('--output', default='timetable_dept_{department_id}.csv',
+                        help='.csv, .json or .xlsx path; may use {department_id}')
+    export.set_defaults(func=cmd_export)
+
+    bench = subparsers.add_parser('bench', help='Benchmark the solver')
+    add_common(bench)
+    add_solver(bench)
+    bench.add_argument('--runs', type=int, default=10, help='Solver runs per department')
+    bench.set_defaults(func=cmd_bench)
+
+    pareto = subparsers.add_parser('pareto', help='Compute a Pareto front of timetables')
+    add_common(pareto)
+    add_solver(pareto)
+    pareto.add_argument('--output', help='Write the front as JSON; may use {department_id}')
+    pareto.set_defaults(func=cmd_pareto)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,30 +1,83 @@
 # AI Timetable Generator with conflict resolution
-import sqlite3
-import json
 import random
-from typing import Dict, List, Tuple, Set
+import time
+from typing import Dict, List, Optional, Tuple, Set
 from datetime import datetime
 import logging
+from array import array
+
+from database import get_db_connection
+from queries import APPROVED_STAFF_BY_DEPARTMENT
+from staff_preferences import SOURCE_CHOICE_FORM, department_preferences
+from timetable_store import save_timetable
+from timetable_model import DAYS, TIME_SLOTS, DepartmentModel, CompactTimetable
 
 logger = logging.getLogger(__name__)
 
 class AITimetableGenerator:
-    def __init__(self):
-        self.days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-        self.time_slots = [
-            '9:00-10:00', '10:00-11:00', '11:15-12:15', 
-            '12:15-1:15', '2:15-3:15', '3:15-4:15', '4:30-5:30'
-        ]
+    # Objective weights in [0, 1]: how often the solver favours balanced staff
+    # workload, compact class days (few gaps) and tightly fitting rooms over a
+    # random feasible choice. The defaults reproduce the original behaviour.
+    DEFAULT_WEIGHTS = {'balance': 1.0, 'gaps': 0.0, 'rooms': 0.0}
+    
+    def __init__(self, db_path: Optional[str] = None, seed: Optional[int] = None,
+                 time_budget: Optional[float] = None, weights: Optional[Dict] = None):
+        self.days = list(DAYS)
+        self.time_slots = list(TIME_SLOTS)
+        self.db_path = db_path
+        self.rng = random.Random(seed)
+        self.time_budget = time_budget
+        self.weights = dict(self.DEFAULT_WEIGHTS, **(weights or {}))
+        self.unassigned_count = 0
+        # Whether the last solve hit its time budget; hours it never got to
+        # are counted in unassigned_count alongside the infeasible ones
+        self.timed_out = False
         
     def get_db_connection(self):
-        conn = sqlite3.connect('timetable.db')
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_db_connection(self.db_path)
     
-    def generate_timetable(self, department_id: int) -> Dict:
+    def generate_timetable(self, department_id: int, save: bool = True) -> Dict:
         """Generate optimized timetable for a department"""
         try:
-            conn = self.get_db_connection()
+            data = self.load_department_data(department_id)
+            if 'error' in data:
+                return data
+            
+            classes = data['classes']
+            staff_subjects = data['staff_subjects']
+            subjects = data['subjects']
+            classrooms = data['classrooms']
+            
+            # Generate timetable using AI optimization
+            timetable = self._optimize_timetable(classes, staff_subjects, subjects, classrooms)
+            
+            # Save timetable to database
+            if save:
+                self._save_timetable(department_id, timetable)
+            
+            return {
+                'success': True,
+                'timetable': timetable,
+                'department': data['department'],
+                'generated_at': datetime.now().isoformat(),
+                'stats': {
+                    'total_classes': len(timetable),
+                    'unassigned': self.unassigned_count,
+                    'timed_out': self.timed_out,
+                    'classes_count': len(classes),
+                    'staff_count': len(staff_subjects),
+                    'subjects_count': len(subjects)
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Timetable generation error: {e}")
+            return {'error': str(e)}
+    
+    def load_department_data(self, department_id: int) -> Dict:
+        """Load the classes, staff, subjects and classrooms a generation run needs"""
+        conn = self.get_db_connection()
+        try:
             cursor = conn.cursor()
             
             # Get department data
@@ -41,13 +94,10 @@ class AITimetableGenerator:
             classes_data = cursor.fetchall()
             
             # Get staff and their subjects
-            cursor.execute('''
-                SELECT u.id, u.name, u.staff_role, cs.subject_preferences
-                FROM users u
-                LEFT JOIN choice_submissions cs ON u.id = cs.staff_id
-                WHERE u.department_id = ? AND u.role = 'staff' AND u.approval_status = 'approved'
-            ''', (department_id,))
+            cursor.execute(APPROVED_STAFF_BY_DEPARTMENT, (department_id,))
             staff_data = cursor.fetchall()
+            preferences = department_preferences(cursor, department_id, SOURCE_CHOICE_FORM,
+                                                 approved_only=True)
             
             # Get subjects
             cursor.execute('''
@@ -62,210 +112,155 @@ class AITimetableGenerator:
                 FROM classrooms WHERE department_id = ?
             ''', (department_id,))
             classrooms_data = cursor.fetchall()
-            
+        finally:
             conn.close()
-            
-            if not classes_data or not staff_data or not subjects_data or not classrooms_data:
-                return {'error': 'Insufficient data for timetable generation'}
-            
-            # Process data
-            classes = {c['id']: dict(c) for c in classes_data}
-            subjects = {s['id']: dict(s) for s in subjects_data}
-            classrooms = {c['id']: dict(c) for c in classrooms_data}
-            
-            # Process staff preferences
-            staff_subjects = {}
-            for staff in staff_data:
-                if staff['subject_preferences']:
-                    try:
-                        preferences = json.loads(staff['subject_preferences'])
-                        staff_subjects[staff['id']] = {
-                            'name': staff['name'],
-                            'role': staff['staff_role'],
-                            'subjects': preferences
-                        }
-                    except:
-                        continue
-            
-            # Generate timetable using AI optimization
-            timetable = self._optimize_timetable(classes, staff_subjects, subjects, classrooms)
-            
-            # Save timetable to database
-            self._save_timetable(department_id, timetable)
-            
-            return {
-                'success': True,
-                'timetable': timetable,
-                'department': dept_data['name'],
-                'generated_at': datetime.now().isoformat(),
-                'stats': {
-                    'total_classes': len(timetable),
-                    'classes_count': len(classes),
-                    'staff_count': len(staff_subjects),
-                    'subjects_count': len(subjects)
+        
+        if not classes_data or not staff_data or not subjects_data or not classrooms_data:
+            return {'error': 'Insufficient data for timetable generation'}
+        
+        # Staff without submitted preferences cannot be assigned
+        staff_subjects = {}
+        for staff in staff_data:
+            if staff['id'] in preferences:
+                staff_subjects[staff['id']] = {
+                    'name': staff['name'],
+                    'role': staff['staff_role'],
+                    'subjects': [str(s) for s in preferences[staff['id']]]
                 }
-            }
-            
-        except Exception as e:
-            logger.error(f"Timetable generation error: {e}")
-            return {'error': str(e)}
+        
+        return {
+            'department': dept_data['name'],
+            'classes': {c['id']: dict(c) for c in classes_data},
+            'staff_subjects': staff_subjects,
+            'subjects': {s['id']: dict(s) for s in subjects_data},
+            'classrooms': {c['id']: dict(c) for c in classrooms_data}
+        }
     
     def _optimize_timetable(self, classes: Dict, staff_subjects: Dict, 
                           subjects: Dict, classrooms: Dict) -> List:
         """AI-powered timetable optimization with conflict resolution"""
-        timetable = []
+        model = DepartmentModel(classes, staff_subjects, subjects, classrooms,
+                                self.days, self.time_slots)
+        return self._solve(model).to_dicts()
+    
+    def _solve(self, model: DepartmentModel) -> CompactTimetable:
+        """Place every assignment hour on a free (slot, staff, classroom) triple"""
+        timetable = CompactTimetable(model)
+        slot_count = model.slot_count
+        periods = len(model.time_slots)
+        w_balance = self.weights['balance']
+        w_gaps = self.weights['gaps']
+        w_rooms = self.weights['rooms']
         
-        # Track usage to avoid conflicts
-        staff_schedule = {}  # staff_id: {day: {time_slot: True}}
-        classroom_schedule = {}  # classroom_id: {day: {time_slot: True}}
+        def gap_cost(busy: bytearray, slot: int) -> int:
+            """Idle periods a session at `slot` leaves next to the class's other sessions that day"""
+            day_start = slot - slot % periods
+            taken = [p for p in range(periods) if busy[day_start + p]]
+            if not taken:
+                return 0
+            return min(abs(p - (slot - day_start)) for p in taken) - 1
         
-        # Initialize schedules
-        for staff_id in staff_subjects.keys():
-            staff_schedule[staff_id] = {day: {} for day in self.days}
+        # Track usage to avoid conflicts. Staff and rooms are searched by
+        # equivalence class, so we count free members per (class, slot) and
+        # only pick concrete people and rooms in timetable.expand().
+        staff_free = [array('H', [len(m)]) * slot_count for m in model.staff_classes]
+        room_free = [array('H', [len(m)]) * slot_count for m in model.room_classes]
+        class_busy = [bytearray(slot_count) for _ in model.class_ids]
+        staff_class_size = [len(m) for m in model.staff_classes]
+        workload = array('i', bytes(4 * len(model.staff_classes)))
         
-        for classroom_id in classrooms.keys():
-            classroom_schedule[classroom_id] = {day: {} for day in self.days}
+        # Room classes large enough for a given class strength, computed once per strength
+        rooms_fitting = {}
         
-        # Create assignments for each class-subject combination
-        assignments = []
-        for class_id, class_info in classes.items():
-            for subject_id, subject_info in subjects.items():
-                # Find available staff for this subject
-                available_staff = []
-                for staff_id, staff_info in staff_subjects.items():
-                    if str(subject_id) in staff_info['subjects']:
-                        available_staff.append(staff_id)
-                
-                if not available_staff:
-                    continue
-                
-                # Calculate hours needed based on subject hours
-                hours_needed = subject_info.get('hours', 3)
-                
-                for _ in range(hours_needed):
-                    assignments.append({
-                        'class_id': class_id,
-                        'class_name': class_info['name'],
-                        'subject_id': subject_id,
-                        'subject_name': subject_info['name'],
-                        'subject_code': subject_info['code'],
-                        'available_staff': available_staff,
-                        'class_strength': class_info['strength']
-                    })
+        # One entry per assignment hour; shuffled for better distribution
+        assignments = model.assignments
+        order = [i for i, a in enumerate(assignments) for _ in range(a.hours)]
+        self.rng.shuffle(order)
         
-        # Shuffle assignments for better distribution
-        random.shuffle(assignments)
+        deadline = time.monotonic() + self.time_budget if self.time_budget else None
+        self.unassigned_count = 0
+        self.timed_out = False
+        max_attempts = 100
         
         # Assign time slots using constraint satisfaction
-        for assignment in assignments:
-            assigned = False
-            attempts = 0
-            max_attempts = 100
+        for assignment_idx in order:
+            if deadline is not None and time.monotonic() > deadline:
+                if not self.timed_out:
+                    logger.warning("Time budget of %ss ran out; remaining hours left unplaced", self.time_budget)
+                    self.timed_out = True
+                self.unassigned_count += 1
+                continue
             
-            while not assigned and attempts < max_attempts:
-                day = random.choice(self.days)
-                time_slot = random.choice(self.time_slots)
-                
-                # Select staff with least workload
-                best_staff = None
-                min_workload = float('inf')
-                
-                for staff_id in assignment['available_staff']:
-                    workload = sum(len(slots) for slots in staff_schedule[staff_id].values())
-                    if (workload < min_workload and 
-                        time_slot not in staff_schedule[staff_id][day]):
-                        min_workload = workload
-                        best_staff = staff_id
+            assignment = assignments[assignment_idx]
+            busy_for_class = class_busy[assignment.class_idx]
+            
+            fitting = rooms_fitting.get(assignment.strength)
+            if fitting is None:
+                fitting = [r for r, capacity in enumerate(model.room_class_capacity)
+                           if capacity >= assignment.strength]
+                rooms_fitting[assignment.strength] = fitting
+            
+            assigned = False
+            for _ in range(max_attempts):
+                slot = self.rng.randrange(slot_count)
+                if w_gaps and self.rng.random() < w_gaps:
+                    # Sample a few slots and keep the one that leaves the fewest gaps
+                    candidates = [slot] + [self.rng.randrange(slot_count) for _ in range(3)]
+                    candidates = [c for c in candidates if not busy_for_class[c]]
+                    if candidates:
+                        slot = min(candidates, key=lambda c: gap_cost(busy_for_class, c))
+                if busy_for_class[slot]:
+                    continue
                 
-                if not best_staff:
-                    attempts += 1
+                free_staff = [k for k in assignment.staff_choices if staff_free[k][slot]]
+                if not free_staff:
                     continue
                 
-                # Find suitable classroom
-                suitable_classrooms = [
-                    cid for cid, cinfo in classrooms.items()
-                    if (cinfo['capacity'] >= assignment['class_strength'] and
-                        time_slot not in classroom_schedule[cid][day])
-                ]
+                # Select the staff class with least workload per member
+                if w_balance >= 1 or self.rng.random() < w_balance:
+                    best_staff = min(free_staff, key=lambda k: workload[k] / staff_class_size[k])
+                else:
+                    best_staff = self.rng.choices(
+                        free_staff, weights=[staff_free[k][slot] for k in free_staff])[0]
                 
-                if not suitable_classrooms:
-                    attempts += 1
+                # Find suitable classroom
+                suitable = [r for r in fitting if room_free[r][slot]]
+                if not suitable:
                     continue
                 
-                # Select classroom (prefer regular classrooms for theory, labs for lab subjects)
-                selected_classroom = None
-                subject_type = subjects[assignment['subject_id']].get('type', 'Core')
-                
-                if 'Lab' in assignment['subject_name'] or subject_type == 'Lab':
-                    # Prefer lab classrooms
-                    lab_classrooms = [cid for cid in suitable_classrooms 
-                                    if classrooms[cid]['type'] == 'Lab']
-                    selected_classroom = random.choice(lab_classrooms) if lab_classrooms else random.choice(suitable_classrooms)
+                # Prefer labs for lab subjects and regular classrooms otherwise
+                preferred = [r for r in suitable if model.room_class_is_lab[r] == assignment.prefers_lab]
+                if w_rooms and self.rng.random() < w_rooms:
+                    room_idx = min(preferred or suitable, key=model.room_class_capacity.__getitem__)
                 else:
-                    # Prefer regular classrooms
-                    regular_classrooms = [cid for cid in suitable_classrooms 
-                                        if classrooms[cid]['type'] == 'Classroom']
-                    selected_classroom = random.choice(regular_classrooms) if regular_classrooms else random.choice(suitable_classrooms)
+                    # Weighted by free rooms so every concrete room stays equally likely
+                    pool = preferred or suitable
+                    room_idx = self.rng.choices(pool, weights=[room_free[r][slot] for r in pool])[0]
                 
-                # Add to timetable
-                timetable.append({
-                    'day': day,
-                    'time_slot': time_slot,
-                    'class_id': assignment['class_id'],
-                    'class_name': assignment['class_name'],
-                    'subject_id': assignment['subject_id'],
-                    'subject_name': assignment['subject_name'],
-                    'subject_code': assignment['subject_code'],
-                    'staff_id': best_staff,
-                    'staff_name': staff_subjects[best_staff]['name'],
-                    'classroom_id': selected_classroom,
-                    'classroom_name': classrooms[selected_classroom]['name']
-                })
+                timetable.append(slot, assignment.class_idx, assignment.subject_idx,
+                                 best_staff, room_idx)
                 
                 # Update schedules
-                staff_schedule[best_staff][day][time_slot] = True
-                classroom_schedule[selected_classroom][day][time_slot] = True
+                staff_free[best_staff][slot] -= 1
+                room_free[room_idx][slot] -= 1
+                busy_for_class[slot] = 1
+                workload[best_staff] += 1
                 assigned = True
-                
-                attempts += 1
+                break
             
             if not assigned:
-                logger.warning(f"Could not assign: {assignment['subject_name']} for {assignment['class_name']}")
-        
-        # Sort timetable by day and time
-        day_order = {day: i for i, day in enumerate(self.days)}
-        time_order = {slot: i for i, slot in enumerate(self.time_slots)}
-        
-        timetable.sort(key=lambda x: (day_order[x['day']], time_order[x['time_slot']]))
+                self.unassigned_count += 1
+                logger.warning(
+                    f"Could not assign: {model.subjects[model.subject_ids[assignment.subject_idx]]['name']} "
+                    f"for {model.classes[model.class_ids[assignment.class_idx]]['name']}"
+                )
         
+        timetable.expand()
         return timetable
     
-    def _save_timetable(self, department_id: int, timetable: List):
-        """Save generated timetable to database"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
-        # Clear existing timetable for department
-        cursor.execute('DELETE FROM timetables WHERE department_id = ?', (department_id,))
-        
-        # Insert new timetable
-        for entry in timetable:
-            cursor.execute('''
-                INSERT INTO timetables (department_id, class_id, day, time_slot, 
-                                      subject_id, staff_id, classroom_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                department_id,
-                entry['class_id'],
-                entry['day'],
-                entry['time_slot'],
-                entry['subject_id'],
-                entry['staff_id'],
-                entry['classroom_id']
-            ))
-        
-        conn.commit()
-        conn.close()
+    def _save_timetable(self, department_id: int, timetable: List) -> Dict:
+        """Save generated timetable to database, touching only changed rows"""
+        return save_timetable(department_id, timetable, self.db_path)
     
     def get_staff_timetable(self, staff_id: int) -> Dict:
         """Get timetable for a specific staff member"""
@@ -281,7 +276,7 @@ class AITimetableGenerator:
                 JOIN classes c ON t.class_id = c.id
                 JOIN classrooms cr ON t.classroom_id = cr.id
                 WHERE t.staff_id = ?
-                ORDER BY t.day, t.time_slot
+                ORDER BY t.day_idx, t.period_idx
             ''', (staff_id,))
             
             timetable_data = cursor.fetchall()
@@ -324,7 +319,7 @@ class AITimetableGenerator:
                 JOIN users u ON t.staff_id = u.id
                 JOIN classrooms cr ON t.classroom_id = cr.id
                 WHERE t.department_id = ?
-                ORDER BY t.day, t.time_slot
+                ORDER BY t.day_idx, t.period_idx
             ''', (department_id,))
             
             timetable_data = cursor.fetchall()
@@ -337,4 +332,36 @@ class AITimetableGenerator:
             
         except Exception as e:
             logger.error(f"Department timetable error: {e}")
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
+    
+    def find_conflicts(self, timetable: List) -> List[Dict]:
+        """Find double-booked staff, classrooms and classes in a timetable"""
+        conflicts = []
+        seen = {}
+        
+        for entry in timetable:
+            if entry['day'] not in self.days or entry['time_slot'] not in self.time_slots:
+                conflicts.append({
+                    'type': 'invalid_slot',
+                    'day': entry['day'],
+                    'time_slot': entry['time_slot']
+                })
+                continue
+            
+            for resource in ('staff_id', 'classroom_id', 'class_id'):
+                resource_id = entry.get(resource)
+                if resource_id is None:
+                    continue
+                
+                key = (resource, resource_id, entry['day'], entry['time_slot'])
+                if key in seen:
+                    conflicts.append({
+                        'type': resource[:-3] + '_double_booked',
+                        resource: resource_id,
+                        'day': entry['day'],
+                        'time_slot': entry['time_slot']
+                    })
+                else:
+                    seen[key] = entry
+        
+        return conflicts
@@ -0,0 +1,196 @@
+# Compact in-memory representation used by the timetable solver
+#
+# Departments are indexed once into dense integer IDs; the solver works only
+# on those integers (arrays, bytearrays and __slots__ records) and names are
+# looked up when a timetable is serialized back to dicts.
+#
+# Rooms with the same (type, capacity) and staff with the same (subject set,
+# role) are interchangeable, so the solver searches over their equivalence
+# classes and CompactTimetable.expand() maps bookings back to concrete members.
+from array import array
+from typing import Dict, List, Sequence
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')
+TIME_SLOTS = (
+    '9:00-10:00', '10:00-11:00', '11:15-12:15',
+    '12:15-1:15', '2:15-3:15', '3:15-4:15', '4:30-5:30'
+)
+# Stored alongside the text columns as timetables.day_idx / period_idx
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+PERIOD_INDEX = {slot: i for i, slot in enumerate(TIME_SLOTS)}
+
+
+class Assignment:
+    """One class-subject pairing that needs `hours` weekly sessions
+
+    `staff_choices` holds staff equivalence class indices, not staff indices.
+    """
+    __slots__ = ('class_idx', 'subject_idx', 'staff_choices', 'hours', 'strength', 'prefers_lab')
+
+    def __init__(self, class_idx: int, subject_idx: int, staff_choices: tuple,
+                 hours: int, strength: int, prefers_lab: bool):
+        self.class_idx = class_idx
+        self.subject_idx = subject_idx
+        self.staff_choices = staff_choices
+        self.hours = hours
+        self.strength = strength
+        self.prefers_lab = prefers_lab
+
+
+class DepartmentModel:
+    """Dense integer index over a department's classes, subjects, staff and rooms"""
+
+    def __init__(self, classes: Dict, staff_subjects: Dict, subjects: Dict, classrooms: Dict,
+                 days: Sequence[str] = DAYS, time_slots: Sequence[str] = TIME_SLOTS):
+        self.days = tuple(days)
+        self.time_slots = tuple(time_slots)
+        self.slot_count = len(self.days) * len(self.time_slots)
+
+        # Kept only for name lookups at serialization time
+        self.classes = classes
+        self.staff = staff_subjects
+        self.subjects = subjects
+        self.classrooms = classrooms
+
+        self.class_ids = array('q', classes.keys())
+        self.subject_ids = array('q', subjects.keys())
+        self.staff_ids = array('q', staff_subjects.keys())
+        self.room_ids = array('q', classrooms.keys())
+
+        self.room_capacity = array('i', (c['capacity'] for c in classrooms.values()))
+        self.room_is_lab = bytearray(c.get('type') == 'Lab' for c in classrooms.values())
+
+        # Symmetry classes: members of a class are interchangeable during search
+        self.room_classes = self._group(
+            (c.get('type'), c['capacity']) for c in classrooms.values()
+        )
+        self.room_class_capacity = array('i', (self.room_capacity[m[0]] for m in self.room_classes))
+        self.room_class_is_lab = bytearray(self.room_is_lab[m[0]] for m in self.room_classes)
+
+        self.staff_classes = self._group(
+            (frozenset(str(s) for s in info['subjects']), info.get('role'))
+            for info in staff_subjects.values()
+        )
+
+        self.assignments = self._build_assignments()
+
+    @staticmethod
+    def _group(keys) -> List[tuple]:
+        """Group positions with equal keys, in first-seen order"""
+        groups = {}
+        for idx, key in enumerate(keys):
+            groups.setdefault(key, []).append(idx)
+        return [tuple(members) for members in groups.values()]
+
+    def symmetry_stats(self) -> Dict:
+        return {
+            'rooms': len(self.room_ids),
+            'room_classes': len(self.room_classes),
+            'staff': len(self.staff_ids),
+            'staff_classes': len(self.staff_classes)
+        }
+
+    def _build_assignments(self) -> List[Assignment]:
+        subject_index = {str(sid): i for i, sid in enumerate(self.subject_ids)}
+        teachers = [[] for _ in self.subject_ids]
+        for staff_class, members in enumerate(self.staff_classes):
+            for subject in self.staff[self.staff_ids[members[0]]]['subjects']:
+                subject_idx = subject_index.get(str(subject))
+                if subject_idx is not None and staff_class not in teachers[subject_idx]:
+                    teachers[subject_idx].append(staff_class)
+        teachers = [tuple(t) for t in teachers]
+
+        assignments = []
+        for class_idx, class_info in enumerate(self.classes.values()):
+            for subject_idx, subject_info in enumerate(self.subjects.values()):
+                if not teachers[subject_idx]:
+                    continue
+                prefers_lab = 'Lab' in subject_info['name'] or subject_info.get('type') == 'Lab'
+                assignments.append(Assignment(
+                    class_idx, subject_idx, teachers[subject_idx],
+                    subject_info.get('hours', 3), class_info['strength'], prefers_lab
+                ))
+        return assignments
+
+    def slot_of(self, day_idx: int, period_idx: int) -> int:
+        return day_idx * len(self.time_slots) + period_idx
+
+
+class CompactTimetable:
+    """Placed sessions stored column-wise as integer arrays"""
+    __slots__ = ('model', 'slot', 'class_idx', 'subject_idx', 'staff_idx', 'room_idx')
+
+    def __init__(self, model: DepartmentModel):
+        self.model = model
+        self.slot = array('H')
+        self.class_idx = array('i')
+        self.subject_idx = array('i')
+        self.staff_idx = array('i')
+        self.room_idx = array('i')
+
+    def __len__(self) -> int:
+        return len(self.slot)
+
+    def append(self, slot: int, class_idx: int, subject_idx: int, staff_idx: int, room_idx: int):
+        self.slot.append(slot)
+        self.class_idx.append(class_idx)
+        self.subject_idx.append(subject_idx)
+        self.staff_idx.append(staff_idx)
+        self.room_idx.append(room_idx)
+
+    def expand(self):
+        """Replace staff/room equivalence class indices with concrete members
+
+        Bookings of one room class in a slot take its members in order; bookings
+        of one staff class in a slot go to distinct members, least loaded first,
+        which keeps teaching hours balanced within the class.
+        """
+        model = self.model
+        room_used = {}
+        staff_used = {}
+        staff_load = [0] * len(model.staff_ids)
+
+        for i in sorted(range(len(self.slot)), key=self.slot.__getitem__):
+            slot = self.slot[i]
+
+            room_class = self.room_idx[i]
+            n = room_used.get((room_class, slot), 0)
+            room_used[(room_class, slot)] = n + 1
+            self.room_idx[i] = model.room_classes[room_class][n]
+
+            staff_class = self.staff_idx[i]
+            used = staff_used.setdefault((staff_class, slot), set())
+            member = min((m for m in model.staff_classes[staff_class] if m not in used),
+                         key=staff_load.__getitem__)
+            used.add(member)
+            staff_load[member] += 1
+            self.staff_idx[i] = member
+
+    def to_dicts(self) -> List[Dict]:
+        """Serialize to the API's entry dicts, ordered by day and period"""
+        model = self.model
+        periods = len(model.time_slots)
+        class_names = [c['name'] for c in model.classes.values()]
+        subject_names = [s['name'] for s in model.subjects.values()]
+        subject_codes = [s['code'] for s in model.subjects.values()]
+        staff_names = [s['name'] for s in model.staff.values()]
+        room_names = [c['name'] for c in model.classrooms.values()]
+
+        entries = []
+        for i in sorted(range(len(self.slot)), key=self.slot.__getitem__):
+            day_idx, period_idx = divmod(self.slot[i], periods)
+            c, s, t, r = self.class_idx[i], self.subject_idx[i], self.staff_idx[i], self.room_idx[i]
+            entries.append({
+                'day': model.days[day_idx],
+                'time_slot': model.time_slots[period_idx],
+                'class_id': model.class_ids[c],
+                'class_name': class_names[c],
+                'subject_id': model.subject_ids[s],
+                'subject_name': subject_names[s],
+                'subject_code': subject_codes[s],
+                'staff_id': model.staff_ids[t],
+                'staff_name': staff_names[t],
+                'classroom_id': model.room_ids[r],
+                'classroom_name': room_names[r]
+            })
+        return entries
@@ -0,0 +1,98 @@
+# Persistence for department timetables
+#
+# Saving used to delete a department's rows and re-insert every entry one
+# statement at a time. save_timetable() instead diffs the new entries against
+# the stored rows and applies only the difference with executemany, in one
+# transaction: unchanged sessions are not touched, and a session whose
+# subject or staff changed keeps its row ID, so clients holding IDs stay valid.
+from typing import Dict, List, Optional, Tuple
+
+from database import transaction
+from timetable_model import DAY_INDEX, PERIOD_INDEX
+
+# A session is identified by where and when it happens; subject and staff are
+# its payload and may change in place
+Key = Tuple[Optional[int], str, str, Optional[int]]
+
+
+def _int_or_none(value) -> Optional[int]:
+    if value is None or type(value) is int:
+        return value
+    return None if value == '' else int(value)
+
+
+def diff_timetable(existing_rows, entries: List[Dict]) -> Dict[str, list]:
+    """Split new entries into inserts, updates and deletes against stored rows
+
+    `existing_rows` are (id, class_id, day, time_slot, classroom_id, subject_id,
+    staff_id) tuples. Duplicate keys are matched one to one, preferring a row
+    with the same payload.
+    """
+    stored: Dict[Key, List[Tuple[int, tuple]]] = {}
+    for row_id, class_id, day, time_slot, classroom_id, subject_id, staff_id in existing_rows:
+        key = (class_id, day, time_slot, classroom_id)
+        candidates = stored.get(key)
+        if candidates is None:
+            stored[key] = [(row_id, (subject_id, staff_id))]
+        else:
+            candidates.append((row_id, (subject_id, staff_id)))
+
+    inserts, updates = [], []
+    unchanged = 0
+    for entry in entries:
+        get = entry.get
+        key = (_int_or_none(get('class_id')), entry['day'], entry['time_slot'],
+               _int_or_none(get('classroom_id')))
+        payload = (_int_or_none(get('subject_id')), _int_or_none(get('staff_id')))
+        candidates = stored.get(key)
+        if not candidates:
+            inserts.append((key, payload))
+            continue
+
+        if len(candidates) == 1:
+            row_id, stored_payload = candidates.pop()
+        else:
+            match = next((i for i, (_, p) in enumerate(candidates) if p == payload), 0)
+            row_id, stored_payload = candidates.pop(match)
+        if stored_payload == payload:
+            unchanged += 1
+        else:
+            updates.append((row_id, payload))
+
+    deletes = [row_id for candidates in stored.values() for row_id, _ in candidates]
+    return {'inserts': inserts, 'updates': updates, 'deletes': deletes, 'unchanged': unchanged}
+
+
+def save_timetable(department_id: int, entries: List[Dict], db_path: Optional[str] = None) -> Dict:
+    """Make the department's stored timetable equal to `entries`; returns change counts"""
+    with transaction(db_path, row_factory=None) as conn:
+        # Take the write lock before reading, so the diff cannot go stale
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, class_id, day, time_slot, classroom_id, subject_id, staff_id
+            FROM timetables WHERE department_id = ?
+        ''', (department_id,))
+        diff = diff_timetable(cursor.fetchall(), entries)
+
+        if diff['deletes']:
+            cursor.executemany('DELETE FROM timetables WHERE id = ?',
+                               [(row_id,) for row_id in diff['deletes']])
+        if diff['updates']:
+            cursor.executemany('UPDATE timetables SET subject_id = ?, staff_id = ? WHERE id = ?',
+                               [(subject_id, staff_id, row_id)
+                                for row_id, (subject_id, staff_id) in diff['updates']])
+        if diff['inserts']:
+            cursor.executemany('''
+                INSERT INTO timetables (department_id, class_id, day, time_slot,
+                                        classroom_id, subject_id, staff_id, day_idx, period_idx)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(department_id, *key, *payload, DAY_INDEX.get(key[1]), PERIOD_INDEX.get(key[2]))
+                  for key, payload in diff['inserts']])
+
+    return {
+        'inserted': len(diff['inserts']),
+        'updated': len(diff['updates']),
+        'deleted': len(diff['deletes']),
+        'unchanged': diff['unchanged']
+    }
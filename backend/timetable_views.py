@@ -0,0 +1,57 @@
+# Per-entity storage for generated timetable views
+#
+# Each generated_timetables row holds one view (student / staff / classroom /
+# lab) as a single JSON object keyed by entity: staff ID, classroom ID or day.
+# Reading one staff member's schedule used to load and parse the whole
+# department's staff view. store_views() additionally splits the views that
+# are read per entity (ENTITY_VIEW_TYPES) into timetable_entity_views, keyed
+# by (data_hash, entity_key), so get_entity_view() reads just that entity.
+#
+# Rows are keyed by the hash of the whole view rather than by timetable id and
+# each entity's JSON is a compressed blob in timetable_blobs, so regenerating
+# an identical timetable adds no rows at all, and an entity whose schedule
+# did not change shares the blob it already had.
+import json
+from typing import Dict, Iterable, List, Optional
+
+from blob_store import decompress, put_blob
+from queries import ENTITY_VIEW
+
+# Views some route reads one entity at a time
+ENTITY_VIEW_TYPES = ('staff',)
+
+
+def store_views(cursor, timetable_type: str, data_hash: str, view: Dict):
+    """Index a generated view by entity if its type is read that way; caller commits"""
+    if timetable_type not in ENTITY_VIEW_TYPES or not data_hash:
+        return
+    cursor.execute('SELECT 1 FROM timetable_entity_views WHERE data_hash = ? LIMIT 1', (data_hash,))
+    if cursor.fetchone():
+        return
+    cursor.executemany('''
+        INSERT OR IGNORE INTO timetable_entity_views (data_hash, entity_key, view_hash)
+        VALUES (?, ?, ?)
+    ''', [(data_hash, str(key), put_blob(cursor, json.dumps(value))) for key, value in view.items()])
+
+
+def get_entity_view(cursor, department_id: int, timetable_type: str, entity_key,
+                    status: str = 'approved') -> Optional[Dict]:
+    """One entity's view from the department's latest timetable of a type, or None"""
+    cursor.execute(ENTITY_VIEW, (str(entity_key), department_id, timetable_type, status))
+    row = cursor.fetchone()
+    return json.loads(decompress(row[0])) if row else None
+
+
+def drop_unreferenced_views(cursor, data_hashes: Iterable[str]) -> List[str]:
+    """Delete entity rows of views no timetable uses any more; returns their blob hashes"""
+    candidates = list({h for h in data_hashes if h})
+    if not candidates:
+        return []
+    unreferenced = f'''
+        data_hash IN ({','.join('?' * len(candidates))})
+        AND data_hash NOT IN (SELECT data_hash FROM generated_timetables WHERE data_hash IS NOT NULL)
+    '''
+    cursor.execute(f'SELECT view_hash FROM timetable_entity_views WHERE {unreferenced}', candidates)
+    view_hashes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f'DELETE FROM timetable_entity_views WHERE {unreferenced}', candidates)
+    return view_hashes
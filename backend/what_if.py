@@ -0,0 +1,262 @@
+# What-if simulation over an in-memory copy of a department
+#
+# A department's generation inputs are loaded once and cached. Each scenario
+# applies hypothetical edits on a copy-on-write overlay (only the collections
+# and records that change are copied) and runs a feasibility check or a quick
+# generation, returning deltas against the unedited baseline. Nothing is
+# written to the database.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from pareto import evaluate
+from timetable_generator import AITimetableGenerator
+from timetable_model import DepartmentModel
+
+CACHE_SIZE = int(os.getenv('WHAT_IF_CACHE_SIZE', '32'))
+CACHE_TTL = float(os.getenv('WHAT_IF_CACHE_TTL', '300'))
+
+# Same seed for baseline and scenario so deltas reflect the edits, not the RNG
+SIMULATION_SEED = 1
+
+
+class WhatIfError(ValueError):
+    pass
+
+
+class ModelCache:
+    """LRU + TTL cache of loaded department data and its baseline solve"""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db_path: Optional[str], department_id: int) -> Dict:
+        key = (db_path, department_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry['loaded_at'] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry
+
+        data = AITimetableGenerator(db_path=db_path).load_department_data(department_id)
+        if 'error' in data:
+            raise WhatIfError(data['error'])
+
+        entry = {'data': data, 'baseline': {}, 'loaded_at': time.monotonic()}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, db_path: Optional[str] = None, department_id: Optional[int] = None):
+        with self._lock:
+            for key in list(self._entries):
+                if (db_path is None or key[0] == db_path) and \
+                        (department_id is None or key[1] == department_id):
+                    del self._entries[key]
+
+
+model_cache = ModelCache()
+
+ROOM_TYPES = ('Classroom', 'Lab')
+
+
+def _int_field(edit: Dict, key: str, minimum: Optional[int] = None) -> int:
+    if key not in edit:
+        raise WhatIfError(f"{edit.get('op')} edit requires {key}")
+    value = edit[key]
+    try:
+        value = int(value) if not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        value = None
+    if value is None:
+        raise WhatIfError(f"{key} must be an integer, got {edit[key]!r}")
+    if minimum is not None and value < minimum:
+        raise WhatIfError(f"{key} must be at least {minimum}")
+    return value
+
+
+def apply_edits(data: Dict, edits: List[Dict]) -> Dict:
+    """Return a copy-on-write view of `data` with the edits applied
+
+    Supported edits:
+      {"op": "add_staff", "name": ..., "role": ..., "subjects": [subject_id, ...]}
+      {"op": "remove_staff", "staff_id": ...}
+      {"op": "add_room", "name": ..., "capacity": ..., "type": "Classroom" | "Lab"}
+      {"op": "remove_room", "classroom_id": ...}
+      {"op": "set_subject_hours", "subject_id": ..., "hours": ...}
+    """
+    overlay = dict(data)
+    copied = set()
+
+    def writable(name: str) -> Dict:
+        if name not in copied:
+            overlay[name] = dict(overlay[name])
+            copied.add(name)
+        return overlay[name]
+
+    if not isinstance(edits, list):
+        raise WhatIfError('edits must be a list')
+
+    next_id = -1
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise WhatIfError(f"Each edit must be an object, got {edit!r}")
+        op = edit.get('op')
+        if op == 'add_staff':
+            subjects = edit.get('subjects', [])
+            if not isinstance(subjects, list):
+                raise WhatIfError('add_staff subjects must be a list of subject ids')
+            writable('staff_subjects')[next_id] = {
+                'name': str(edit.get('name', f'New staff {-next_id}')),
+                'role': str(edit.get('role', 'assistant_professor')),
+                'subjects': [str(s) for s in subjects]
+            }
+            next_id -= 1
+        elif op == 'remove_staff':
+            staff_id = _int_field(edit, 'staff_id')
+            if writable('staff_subjects').pop(staff_id, None) is None:
+                raise WhatIfError(f"Unknown staff_id {staff_id}")
+        elif op == 'add_room':
+            room_type = edit.get('type', 'Classroom')
+            if room_type not in ROOM_TYPES:
+                raise WhatIfError(f"Room type must be one of: {', '.join(ROOM_TYPES)}")
+            writable('classrooms')[next_id] = {
+                'id': next_id,
+                'name': str(edit.get('name', f'New room {-next_id}')),
+                'capacity': _int_field(edit, 'capacity', minimum=1),
+                'type': room_type
+            }
+            next_id -= 1
+        elif op == 'remove_room':
+            classroom_id = _int_field(edit, 'classroom_id')
+            if writable('classrooms').pop(classroom_id, None) is None:
+                raise WhatIfError(f"Unknown classroom_id {classroom_id}")
+        elif op == 'set_subject_hours':
+            subjects = writable('subjects')
+            subject_id = _int_field(edit, 'subject_id')
+            if subject_id not in subjects:
+                raise WhatIfError(f"Unknown subject_id {subject_id}")
+            subjects[subject_id] = dict(subjects[subject_id], hours=_int_field(edit, 'hours', minimum=0))
+        else:
+            raise WhatIfError(f"Unknown edit op: {op}")
+
+    return overlay
+
+
+def check_feasibility(data: Dict) -> Dict:
+    """Cheap necessary conditions for a complete timetable, without solving"""
+    model = DepartmentModel(data['classes'], data['staff_subjects'], data['subjects'], data['classrooms'])
+    issues = []
+
+    taught = {a.subject_idx for a in model.assignments}
+    for subject_idx, subject_id in enumerate(model.subject_ids):
+        if subject_idx not in taught:
+            issues.append({'type': 'no_staff', 'subject_id': subject_id})
+
+    demand = sum(a.hours for a in model.assignments)
+    per_class = {}
+    for a in model.assignments:
+        per_class[a.class_idx] = per_class.get(a.class_idx, 0) + a.hours
+    for class_idx, hours in per_class.items():
+        if hours > model.slot_count:
+            issues.append({'type': 'class_overloaded', 'class_id': model.class_ids[class_idx],
+                           'hours': hours, 'available': model.slot_count})
+
+    staff_capacity = len(model.staff_ids) * model.slot_count
+    room_capacity = len(model.room_ids) * model.slot_count
+    if demand > staff_capacity:
+        issues.append({'type': 'staff_capacity', 'hours': demand, 'available': staff_capacity})
+    if demand > room_capacity:
+        issues.append({'type': 'room_capacity', 'hours': demand, 'available': room_capacity})
+
+    return {
+        'feasible': not issues,
+        'issues': issues,
+        'demand_hours': demand,
+        'staff_capacity_hours': staff_capacity,
+        'room_capacity_hours': room_capacity
+    }
+
+
+def _solve(data: Dict, time_budget: float) -> Dict:
+    model = DepartmentModel(data['classes'], data['staff_subjects'], data['subjects'], data['classrooms'])
+    generator = AITimetableGenerator(seed=SIMULATION_SEED, time_budget=time_budget)
+    solved = generator._solve(model)
+
+    staff_hours = {}
+    for staff_idx in solved.staff_idx:
+        staff_id = model.staff_ids[staff_idx]
+        staff_hours[staff_id] = staff_hours.get(staff_id, 0) + 1
+
+    return {
+        'entries': len(solved),
+        'objectives': evaluate(solved, generator.unassigned_count),
+        'timed_out': generator.timed_out,
+        'staff_hours': staff_hours
+    }
+
+
+def _delta(baseline: Dict, scenario: Dict) -> Dict:
+    objectives = {k: round(scenario['objectives'][k] - baseline['objectives'][k], 4)
+                  for k in scenario['objectives']}
+    staff_ids = set(baseline['staff_hours']) | set(scenario['staff_hours'])
+    staff_hours = {
+        str(staff_id): scenario['staff_hours'].get(staff_id, 0) - baseline['staff_hours'].get(staff_id, 0)
+        for staff_id in staff_ids
+        if scenario['staff_hours'].get(staff_id, 0) != baseline['staff_hours'].get(staff_id, 0)
+    }
+    return {
+        'entries': scenario['entries'] - baseline['entries'],
+        'objectives': objectives,
+        'staff_hours': staff_hours
+    }
+
+
+def simulate(db_path: Optional[str], department_id: int, edits: List[Dict], mode: str = 'generate',
+             time_budget: float = 5.0) -> Dict:
+    """Run one what-if scenario against the cached department model"""
+    if mode not in ('check', 'generate'):
+        raise WhatIfError(f"Unknown mode: {mode}")
+
+    entry = model_cache.get(db_path, department_id)
+    scenario_data = apply_edits(entry['data'], edits)
+
+    # A quick generation's result depends on its budget; the feasibility check does not
+    baseline_key = mode if mode == 'check' else (mode, time_budget)
+    baseline = entry['baseline'].get(baseline_key)
+    if baseline is None:
+        if mode == 'check':
+            baseline = check_feasibility(entry['data'])
+        else:
+            baseline = _solve(entry['data'], time_budget)
+        entry['baseline'][baseline_key] = baseline
+
+    if mode == 'check':
+        scenario = check_feasibility(scenario_data)
+        return {
+            'mode': mode,
+            'baseline': baseline,
+            'scenario': scenario,
+            'delta': {
+                'demand_hours': scenario['demand_hours'] - baseline['demand_hours'],
+                'staff_capacity_hours': scenario['staff_capacity_hours'] - baseline['staff_capacity_hours'],
+                'room_capacity_hours': scenario['room_capacity_hours'] - baseline['room_capacity_hours'],
+                'issues': len(scenario['issues']) - len(baseline['issues'])
+            }
+        }
+
+    scenario = _solve(scenario_data, time_budget)
+    return {
+        'mode': mode,
+        'baseline': {k: baseline[k] for k in ('entries', 'objectives', 'timed_out')},
+        'scenario': {k: scenario[k] for k in ('entries', 'objectives', 'timed_out')},
+        'delta': _delta(baseline, scenario)
+    }
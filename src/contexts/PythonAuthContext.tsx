@@ -11,6 +11,9 @@ interface AuthContextType {
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
 
+// Access tokens expire after 15 minutes; renew well before that
+const REFRESH_INTERVAL_MS = 10 * 60 * 1000;
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (context === undefined) {
@@ -37,10 +40,12 @@ export const PythonAuthProvider: React.FC<{ children: React.ReactNode }> = ({ ch
           } else {
             console.warn('❌ Invalid token. Removing...');
             localStorage.removeItem('auth_token');
+            localStorage.removeItem('refresh_token');
           }
         } catch (error) {
           console.error('❌ Auth initialization error:', error);
           localStorage.removeItem('auth_token');
+          localStorage.removeItem('refresh_token');
         }
       }
       setLoading(false);
@@ -49,6 +54,15 @@ export const PythonAuthProvider: React.FC<{ children: React.ReactNode }> = ({ ch
     initializeAuth();
   }, []);
 
+  useEffect(() => {
+    if (!user) return;
+    // Keep the stored access token fresh for components that read it directly
+    const timer = setInterval(() => {
+      backendApi.refreshSession();
+    }, REFRESH_INTERVAL_MS);
+    return () => clearInterval(timer);
+  }, [user]);
+
   const login = async (email: string, password: string): Promise<{ success: boolean; error?: string }> => {
     try {
       setLoading(true);
@@ -74,7 +74,7 @@ class BackendApiService {
 
   /** ======================= Authentication ======================= **/
 
-  async login(credentials: { email: string; password: string }): Promise<ApiResponse<{ user: User; token: string }>> {
+  async login(credentials: { email: string; password: string }): Promise<ApiResponse<{ user: User; token: string; refresh_token: string }>> {
     try {
       const response = await fetch(`${API_BASE_URL}/auth/login`, {
         method: 'POST',
@@ -82,10 +82,11 @@ class BackendApiService {
         body: JSON.stringify(credentials),
       });
 
-      const result = await this.handleResponse<{ user: User; token: string }>(response);
+      const result = await this.handleResponse<{ user: User; token: string; refresh_token: string }>(response);
 
       if (result.success && result.data?.token) {
         localStorage.setItem('auth_token', result.data.token);
+        localStorage.setItem('refresh_token', result.data.refresh_token);
       }
 
       return result;
@@ -97,27 +98,57 @@ class BackendApiService {
     }
   }
 
+  /** Swap the refresh token for a new access token; access tokens expire after minutes. */
+  async refreshSession(): Promise<boolean> {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) return false;
+    try {
+      const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      });
+
+      const result = await this.handleResponse<{ token: string; refresh_token: string }>(response);
+      if (!result.success || !result.data?.token) return false;
+
+      localStorage.setItem('auth_token', result.data.token);
+      localStorage.setItem('refresh_token', result.data.refresh_token);
+      return true;
+    } catch (err) {
+      return false;
+    }
+  }
+
   async logout(): Promise<ApiResponse<void>> {
     try {
       const response = await fetch(`${API_BASE_URL}/auth/logout`, {
         method: 'POST',
         headers: this.getAuthHeaders(),
+        body: JSON.stringify({ refresh_token: localStorage.getItem('refresh_token') }),
       });
 
       const result = await this.handleResponse<void>(response);
       localStorage.removeItem('auth_token');
+      localStorage.removeItem('refresh_token');
       return result;
     } catch (err) {
       localStorage.removeItem('auth_token');
+      localStorage.removeItem('refresh_token');
       return { success: false, error: 'Logout failed' };
     }
   }
 
   async verifyToken(): Promise<ApiResponse<{ user: User }>> {
     try {
-      const response = await fetch(`${API_BASE_URL}/auth/verify`, {
+      let response = await fetch(`${API_BASE_URL}/auth/verify`, {
         headers: this.getAuthHeaders(),
       });
+      if (response.status === 401 && (await this.refreshSession())) {
+        response = await fetch(`${API_BASE_URL}/auth/verify`, {
+          headers: this.getAuthHeaders(),
+        });
+      }
       return this.handleResponse<{ user: User }>(response);
     } catch (err) {
       return { success: false, error: 'Token verification failed' };